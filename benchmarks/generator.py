@@ -0,0 +1,198 @@
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import random
+from typing import Iterator
+
+# Generator of synthetic order history files shaped like the input samples.
+# Run from the project root: python -m benchmarks.generator -n 100k -f 4 -o /tmp/histories
+
+_EVENT_TYPES = ('transition', 'updated', 'created')
+_STATES = (('draft', 'draft', 'Draft'),
+           ('action_required', 'action_required', 'Action Required'),
+           ('processed_by_3pl', 'fulfilling_by_3pl', 'Fulfilling by 3PL'),
+           ('shipped', 'shipped', 'Shipped'),
+           ('delivered', 'delivered', 'Delivered'))
+_ORDER_TYPES = ('in_store', 'online', 'wholesale')
+_THREE_PL_COMPANIES = ('Dallas', 'Sydney', 'Rotterdam', 'Shenzhen')
+_ISSUE_MESSAGES = ('Consignee address line1 is loo long (40 chars max)',
+                   'Consignee phone number is missing',
+                   'Product weight is missing')
+_USERS = ({'pk': 159, 'username': 'kirill@globavendlabs.com', 'email': 'kirill@globavendlabs.com',
+           'first_name': '', 'last_name': '', 'company_name': 'Borderless360'},
+          {'pk': 132, 'username': '', 'email': '', 'first_name': 'Ops', 'last_name': '',
+           'company_name': 'Borderless360'},
+          {'pk': 303, 'username': 'janine@example.com', 'email': 'janine@example.com',
+           'first_name': 'Janine', 'last_name': '', 'company_name': ''})
+
+
+def parse_count(count_str: str) -> int:
+    """
+    Parses an amount with an optional 'k'/'M' suffix, e.g. '10M'.
+    :param str count_str: Amount string
+    :return int: Amount
+    """
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    multiplier = multipliers.get(count_str[-1:].lower())
+    if multiplier:
+        return int(float(count_str[:-1]) * multiplier)
+    return int(count_str)
+
+
+def _build_order_items(rng: random.Random, order_id: int) -> list[dict]:
+    """
+    Builds the order items of a synthetic order.
+    :param random.Random rng: Random generator
+    :param int order_id: Order id
+    :return list[dict]: Order items
+    """
+    order_items = []
+    for item_number in range(rng.randint(1, 3)):
+        product_id = rng.randint(10_000, 99_999)
+        customs_value = f'{rng.uniform(5, 100):.2f}'
+        order_items.append({
+            'id': order_id * 10 + item_number,
+            'product': product_id,
+            'quantity': rng.randint(1, 5),
+            'fulfilment': None,
+            'customs_value': customs_value,
+            'saved_product': {
+                'id': product_id * 10,
+                'sku': f'SKU{product_id}',
+                'image': '',
+                'title': f'Product {product_id}',
+                'width': f'{rng.uniform(5, 40):.3f}',
+                'height': f'{rng.uniform(5, 40):.3f}',
+                'length': f'{rng.uniform(5, 40):.3f}',
+                'weight': f'{rng.uniform(0.1, 5):.3f}',
+                'barcode': '',
+                'hs_code': '481920',
+                'product_type': 'ship_ready',
+                'retail_price': f'{rng.uniform(20, 200):.2f}',
+                'customs_value': customs_value,
+                'declared_price': customs_value,
+                'customs_description': 'Sample Box',
+                'country_of_manufacture': 'AU',
+                'country_of_manufacture_display': 'Australia',
+            },
+            'saved_product_id': product_id * 10,
+        })
+    return order_items
+
+
+def _build_order(rng: random.Random, order_id: int) -> dict:
+    """
+    Builds the model data of a synthetic order, which is then changed from event to event.
+    :param random.Random rng: Random generator
+    :param int order_id: Order id
+    :return dict: Order model data
+    """
+    three_pl_id = rng.randrange(len(_THREE_PL_COMPANIES))
+    return {
+        'id': order_id,
+        'notes': '',
+        'state': 'draft',
+        'status': 'draft',
+        'status_display': 'Draft',
+        'customs': {'id': order_id - 100_000, 'terms_of_trade': None, 'reason_of_export': None,
+                    'brief_description': ''},
+        'three_pl': {'id': three_pl_id, 'country': 'US', 'company_name': _THREE_PL_COMPANIES[three_pl_id],
+                     'is_inventory_enabled': True},
+        'reference': f'GVS{order_id:07d}',
+        'customs_id': order_id - 100_000,
+        'order_type': rng.choice(_ORDER_TYPES),
+        'order_items': _build_order_items(rng, order_id),
+        'three_pl_id': three_pl_id,
+        'fulfillments': [],
+        'order_issues': [],
+    }
+
+
+def iter_events(event_count: int, seed: int = 0, events_per_order: int = 45) -> Iterator[dict]:
+    """
+    Yields synthetic history events, newest first like the history API returns them.
+    Events are grouped into orders, each order's status, issues and errors change along its history.
+    :param int event_count: Amount of events
+    :param int seed: Random generator seed
+    :param int events_per_order: Average amount of events per order
+    :return Iterator[dict]: Event dictionaries
+    """
+    rng = random.Random(seed)
+    event_id = 1_000_000 + event_count
+    event_time = datetime(2020, 7, 28, 20, 3, 2)
+    order_id = 700_000 + seed * 10_000
+    order = None
+    for _ in range(event_count):
+        if order is None or rng.random() < 1 / events_per_order:
+            order_id += 1
+            order = _build_order(rng, order_id)
+        state, status, status_display = rng.choice(_STATES)
+        order.update(state=state, status=status, status_display=status_display)
+        if rng.random() < 0.2:
+            order['order_issues'] = [{'id': rng.randint(90_000, 99_999),
+                                      'display': False,
+                                      'message': rng.choice(_ISSUE_MESSAGES),
+                                      'order_id': order_id,
+                                      'issue_type': 'courier_issue'}
+                                     for _ in range(rng.randint(0, 4))]
+        extra_data = {'action_name': rng.choice(('fulfil', 'ship', 'process_by_3pl', 'require_action'))}
+        if rng.random() < 0.15:
+            extra_data['error'] = rng.choice(_ISSUE_MESSAGES)
+        event_id -= rng.randint(1, 3)
+        event_time -= timedelta(seconds=rng.uniform(0, 600))
+        yield {
+            'id': event_id,
+            'event_time': event_time.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'event_type': rng.choice(_EVENT_TYPES),
+            'user': rng.choice(_USERS) if rng.random() < 0.6 else None,
+            'model_data': order,
+            'extra_data': extra_data,
+        }
+
+
+def generate_history_file(file_path: str, event_count: int, seed: int = 0) -> None:
+    """
+    Writes a synthetic history file, events are encoded one by one, so any amount of them fits into memory.
+    :param str file_path: Destination file path
+    :param int event_count: Amount of events
+    :param int seed: Random generator seed
+    :return None
+    """
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(f'{{"count": {event_count}, "next": null, "previous": null, "results": [')
+        for event_number, event in enumerate(iter_events(event_count, seed)):
+            if event_number:
+                f.write(', ')
+            f.write(json.dumps(event))
+        f.write(']}')
+
+
+def generate_history_files(dest_dir_path: str, event_count: int, file_count: int = 1) -> list[str]:
+    """
+    Writes synthetic history files with the specified amount of events spread across them.
+    :param str dest_dir_path: Destination directory path
+    :param int event_count: Total amount of events
+    :param int file_count: Amount of files
+    :return list[str]: Written file paths
+    """
+    os.makedirs(dest_dir_path, exist_ok=True)
+    file_paths = []
+    for file_number in range(file_count):
+        file_event_count = event_count // file_count + (file_number < event_count % file_count)
+        file_path = os.path.join(dest_dir_path, f'synthetic_{file_number + 1}.json')
+        generate_history_file(file_path, file_event_count, seed=file_number)
+        file_paths.append(file_path)
+    return file_paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--events', type=parse_count, default=1_000,
+                        help='Total amount of events, e.g. 1k or 10M. Default is 1k')
+    parser.add_argument('-f', '--files', type=int, default=1, help='Amount of files the events are spread across')
+    parser.add_argument('-o', '--dest-dir', type=str, required=True, help='Destination directory')
+    args = parser.parse_args()
+
+    for written_file_path in generate_history_files(args.dest_dir, args.events, args.files):
+        print(f'{written_file_path} ({os.path.getsize(written_file_path) / 1024 ** 2:.1f} MB)')
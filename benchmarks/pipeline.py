@@ -0,0 +1,198 @@
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.generator import generate_history_files, parse_count
+from conf import settings
+from modules import printer as printer_module
+from modules.printer import ReportPrinter
+from modules.report import Report
+from modules.stream_reader import EventStreamReader
+
+# End-to-end benchmark of the printing pipeline, every phase is timed separately.
+# Run from the project root:
+#   python -m benchmarks.pipeline -n 100k --file-count 4 --label baseline
+#   python -m benchmarks.pipeline -f 'input/*' --compare output/benchmarks/baseline.json
+
+DEFAULT_RESULTS_DIR_PATH = os.path.join(settings.BASE_DIR, 'output', 'benchmarks')
+PHASES = ('discovery', 'decode', 'build', 'print', 'export')
+
+
+class PhaseTimer:
+    """
+    Accumulates wall and CPU time of the pipeline phases, which are run piece by piece (file by file).
+    """
+
+    def __init__(self) -> None:
+        self.wall_times = dict.fromkeys(PHASES, 0.0)
+        self.cpu_times = dict.fromkeys(PHASES, 0.0)
+        self.peak_rss = dict.fromkeys(PHASES, 0)
+
+    def run(self, phase: str, function: Callable, *args, **kwargs):
+        """
+        Runs passed function as a part of specified phase.
+        :param str phase: Phase name
+        :param Callable function: Function
+        :return: Function's return value
+        """
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = function(*args, **kwargs)
+        self.wall_times[phase] += time.perf_counter() - wall_start
+        self.cpu_times[phase] += time.process_time() - cpu_start
+        self.peak_rss[phase] = _get_peak_rss()
+        return result
+
+
+def _get_peak_rss() -> int:
+    """
+    Returns the peak resident set size of the process.
+    :return int: Peak RSS in bytes
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _consume_stream(file_path: str) -> dict:
+    """
+    Decodes specified file incrementally without building anything from the events.
+    :param str file_path: File path
+    :return dict: Decoded payload without the events
+    """
+    event_payload_stream = EventStreamReader(file_path).read()
+    for _ in event_payload_stream['results']:
+        pass
+    return event_payload_stream
+
+
+def run_pipeline(file_path_patterns: list[str], stream: bool, compact: bool) -> dict:
+    """
+    Runs discovery, decode, Report building, console printing and the HTML export over specified files.
+    Console output goes to the null device, the export into a temporary directory.
+    :param list[str] file_path_patterns: Input file path patterns
+    :param bool stream: Whether the files are decoded incrementally
+    :param bool compact: Whether event metadata is kept in columnar storage
+    :return dict: Benchmark results
+    """
+    timer = PhaseTimer()
+    file_paths = timer.run('discovery', ReportPrinter._get_sorted_abs_path_list_from_pattern_list, file_path_patterns)
+    if not file_paths:
+        # Reported before the console is silenced, the printer would quit without a visible message
+        print(f"No files match the specified file patterns: {' '.join(file_path_patterns)}", file=sys.stderr)
+        sys.exit(1)
+
+    export_dir = tempfile.TemporaryDirectory()
+    console_file = printer_module._console.file
+    printer_module._console.file = open(os.devnull, 'w')
+    try:
+        printer = ReportPrinter(file_path_patterns, True, os.path.join(export_dir.name, 'export.html'),
+                                stream=stream, compact=compact, use_cache=False)
+        report_options = printer._report_options
+        for file_path in file_paths:
+            if stream:
+                # Events are decoded while the report is built, the decode phase is a separate pass
+                timer.run('decode', _consume_stream, file_path)
+                report = timer.run('build', ReportPrinter._build_report_from_stream, file_path, report_options)
+            else:
+                event_payload_full = timer.run('decode', ReportPrinter._read_event_json_data, file_path)
+                event_payload_full['file_path'] = file_path
+                report = timer.run('build', Report, event_payload_full, **report_options)
+                del event_payload_full
+            timer.run('print', printer._print_report_title, file_path)
+            printer._update_context_count_metrics(report)
+            printer._context['report_count'] += 1
+            timer.run('print', printer._print_report, report)
+            timer.run('export', printer._export_report, report)
+            del report
+        timer.run('print', printer._print_final_summary)
+        timer.run('export', printer.export_to_html)
+        event_count = printer._context['event_count']
+    finally:
+        printer_module._console.file.close()
+        printer_module._console.file = console_file
+        export_dir.cleanup()
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {'stream': stream, 'compact': compact},
+        'file_count': len(file_paths),
+        'event_count': event_count,
+        'input_size': sum(os.path.getsize(file_path) for file_path in file_paths),
+        'peak_rss': _get_peak_rss(),
+        'phases': {phase: {'wall_time': timer.wall_times[phase],
+                           'cpu_time': timer.cpu_times[phase],
+                           'events_per_second': event_count / timer.wall_times[phase] if timer.wall_times[phase] else None,
+                           'peak_rss': timer.peak_rss[phase]}
+                   for phase in PHASES},
+    }
+
+
+def print_results(results: dict, reference_results: dict = None) -> None:
+    """
+    Prints the phase table, with the speedup against the reference results if they're passed.
+    :param dict results: Benchmark results
+    :param dict reference_results: Results of a previous run
+    :return None
+    """
+    print(f"{results['file_count']} files, {results['event_count']:,} events, "
+          f"{results['input_size'] / 1024 ** 2:,.1f} MB, options: {results['options']}")
+    print(f"{'phase':<10} {'wall, s':>9} {'cpu, s':>9} {'events/s':>14} {'peak RSS, MB':>13}"
+          f"{'  vs reference' if reference_results else ''}")
+    for phase, phase_results in results['phases'].items():
+        events_per_second = phase_results['events_per_second']
+        line = (f"{phase:<10} {phase_results['wall_time']:>9.3f} {phase_results['cpu_time']:>9.3f} "
+                f"{f'{events_per_second:,.0f}' if events_per_second else '-':>14} "
+                f"{phase_results['peak_rss'] / 1024 ** 2:>13,.1f}")
+        reference_phase_results = reference_results['phases'].get(phase) if reference_results else None
+        if reference_phase_results and phase_results['wall_time']:
+            line += f"  x{reference_phase_results['wall_time'] / phase_results['wall_time']:.2f}"
+        print(line)
+    print(f"{'total':<10} {sum(p['wall_time'] for p in results['phases'].values()):>9.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--files', type=str, nargs='+',
+                        help='Input file patterns. Synthetic files are generated if not specified')
+    parser.add_argument('-n', '--events', type=parse_count, default=10_000,
+                        help='Total amount of generated events, e.g. 1k or 10M. Default is 10k')
+    parser.add_argument('--file-count', type=int, default=1, help='Amount of generated files')
+    parser.add_argument('-s', '--stream', action='store_true', help='Decode the files incrementally')
+    parser.add_argument('-c', '--compact', action='store_true', help='Keep event metadata in columnar storage')
+    parser.add_argument('--label', type=str, help='Name of the results file, the results are not stored if omitted')
+    parser.add_argument('--results-dir', type=str, default=DEFAULT_RESULTS_DIR_PATH, help='Results directory')
+    parser.add_argument('--compare', type=str, help='Results file of a previous run to compare with')
+    args = parser.parse_args()
+
+    input_dir = None
+    file_patterns = args.files
+    if not file_patterns:
+        input_dir = tempfile.TemporaryDirectory()
+        generate_history_files(input_dir.name, args.events, args.file_count)
+        file_patterns = [os.path.join(input_dir.name, '*.json')]
+    try:
+        benchmark_results = run_pipeline(file_patterns, args.stream, args.compact)
+    finally:
+        if input_dir:
+            input_dir.cleanup()
+
+    reference = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            reference = json.loads(f.read())
+    print_results(benchmark_results, reference)
+    if args.label:
+        os.makedirs(args.results_dir, exist_ok=True)
+        results_path = os.path.join(args.results_dir, f'{args.label}.json')
+        with open(results_path, 'w') as f:
+            f.write(json.dumps({'label': args.label, **benchmark_results}, indent=2))
+        print(f'Results were stored in {results_path}')
@@ -0,0 +1,173 @@
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.generator import generate_history_files
+from conf import settings
+
+# Start-up benchmark of the CLI: every scenario is run in a fresh interpreter several times,
+# and the modules it imports are checked, so that a module imported too eagerly is caught.
+# Run from the project root:
+#   python -m benchmarks.startup --label baseline
+#   python -m benchmarks.startup --compare output/benchmarks/baseline.json --max-slowdown 1.2
+# Exits with 1 if a scenario imports a module it shouldn't, or if it's slower than allowed.
+
+DEFAULT_RESULTS_DIR_PATH = os.path.join(settings.BASE_DIR, 'output', 'benchmarks')
+CLI_PATH = os.path.join(settings.BASE_DIR, 'cli.py')
+# Scenario -> (CLI arguments, top-level modules the scenario must not import);
+# '{input}' is replaced by a small generated history file, '{output}' by an export path
+SCENARIOS = {
+    'help': (['print', '--help'],
+             ('rich', 'jinja2', 'natsort', 'asyncio', 'sqlite3', 'multiprocessing')),
+    'summary': (['print', '--no-cache', '--summary-only', '-f', '{input}'],
+                ('jinja2', 'natsort', 'asyncio', 'sqlite3', 'multiprocessing')),
+    'export': (['print', '--no-cache', '--summary-only', '-f', '{input}', '-e', '-d', '{output}'],
+               ('natsort', 'asyncio', 'sqlite3', 'multiprocessing')),
+}
+
+
+def _get_scenario_command(arguments: list[str], input_path: str, output_path: str) -> list[str]:
+    return [sys.executable, CLI_PATH] + [argument.format(input=input_path, output=output_path)
+                                         for argument in arguments]
+
+
+def time_scenario(command: list[str], runs: int) -> list[float]:
+    """
+    Runs specified command the specified amount of times (after a warm-up run) and measures the wall time.
+    :param list[str] command: Command
+    :param int runs: Amount of measured runs
+    :return list[float]: Wall times in seconds
+    """
+    wall_times = []
+    for run in range(runs + 1):
+        wall_start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        if run:
+            wall_times.append(time.perf_counter() - wall_start)
+    return wall_times
+
+
+def get_imports(command: list[str]) -> list[tuple[str, int]]:
+    """
+    Runs specified command with -X importtime.
+    :param list[str] command: Command
+    :return list[tuple[str, int]]: (module name, cumulative import time in microseconds) in the import order
+    """
+    result = subprocess.run([command[0], '-X', 'importtime'] + command[1:],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_time, module_name = line[len('import time:'):].split('|')
+        imports.append((module_name.strip(), int(cumulative_time)))
+    return imports
+
+
+def run_startup_benchmark(runs: int) -> dict:
+    """
+    Times every scenario and checks its imports.
+    :param int runs: Amount of measured runs per scenario
+    :return dict: Benchmark results
+    """
+    scenario_results = {}
+    with tempfile.TemporaryDirectory() as work_dir_path:
+        input_path = generate_history_files(work_dir_path, 100)[0]
+        output_path = os.path.join(work_dir_path, 'export.html')
+        for scenario, (arguments, unexpected_modules) in SCENARIOS.items():
+            command = _get_scenario_command(arguments, input_path, output_path)
+            wall_times = time_scenario(command, runs)
+            imports = get_imports(command)
+            imported_modules = {module_name.split('.')[0] for module_name, _ in imports}
+            scenario_results[scenario] = {
+                'wall_time': statistics.median(wall_times),
+                'min_wall_time': min(wall_times),
+                'module_count': len(imports),
+                'unexpected_imports': [module for module in unexpected_modules if module in imported_modules],
+                'slowest_imports': sorted((module_name for module_name, _ in imports if '.' not in module_name),
+                                          key=dict(imports).get, reverse=True)[:5],
+            }
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': runs,
+        'scenarios': scenario_results,
+    }
+
+
+def print_results(results: dict, reference_results: dict = None) -> None:
+    """
+    Prints the scenario table, with the slowdown against the reference results if they're passed.
+    :param dict results: Benchmark results
+    :param dict reference_results: Results of a previous run
+    :return None
+    """
+    print(f"{'scenario':<10} {'median, ms':>11} {'min, ms':>9} {'modules':>8}"
+          f"{'  vs reference' if reference_results else ''}")
+    for scenario, scenario_results in results['scenarios'].items():
+        line = (f"{scenario:<10} {scenario_results['wall_time'] * 1000:>11.1f} "
+                f"{scenario_results['min_wall_time'] * 1000:>9.1f} {scenario_results['module_count']:>8}")
+        reference_scenario_results = reference_results['scenarios'].get(scenario) if reference_results else None
+        if reference_scenario_results:
+            line += f"  x{scenario_results['wall_time'] / reference_scenario_results['wall_time']:.2f}"
+        print(line)
+        print(f"{'':<10} slowest imports: {', '.join(scenario_results['slowest_imports'])}")
+        if scenario_results['unexpected_imports']:
+            print(f"{'':<10} UNEXPECTED IMPORTS: {', '.join(scenario_results['unexpected_imports'])}")
+
+
+def get_regressions(results: dict, reference_results: dict = None, max_slowdown: float = None) -> list[str]:
+    """
+    Returns the scenarios that import modules they shouldn't or that are slower than allowed.
+    :param dict results: Benchmark results
+    :param dict reference_results: Results of a previous run
+    :param float max_slowdown: Allowed wall time ratio against the reference results
+    :return list[str]: Regression descriptions
+    """
+    regressions = []
+    for scenario, scenario_results in results['scenarios'].items():
+        if scenario_results['unexpected_imports']:
+            regressions.append(f"{scenario} imports {', '.join(scenario_results['unexpected_imports'])}")
+        reference_scenario_results = reference_results['scenarios'].get(scenario) if reference_results else None
+        if reference_scenario_results and max_slowdown:
+            slowdown = scenario_results['wall_time'] / reference_scenario_results['wall_time']
+            if slowdown > max_slowdown:
+                regressions.append(f'{scenario} is x{slowdown:.2f} slower than the reference')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--runs', type=int, default=10, help='Measured runs per scenario. Default is 10')
+    parser.add_argument('--label', type=str, help='Name of the results file, the results are not stored if omitted')
+    parser.add_argument('--results-dir', type=str, default=DEFAULT_RESULTS_DIR_PATH, help='Results directory')
+    parser.add_argument('--compare', type=str, help='Results file of a previous run to compare with')
+    parser.add_argument('--max-slowdown', type=float,
+                        help='Fail if a scenario is slower than the compared run by more than this ratio, e.g. 1.2')
+    args = parser.parse_args()
+
+    benchmark_results = run_startup_benchmark(args.runs)
+    reference = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            reference = json.loads(f.read())
+    print_results(benchmark_results, reference)
+    if args.label:
+        os.makedirs(args.results_dir, exist_ok=True)
+        results_path = os.path.join(args.results_dir, f'{args.label}.json')
+        with open(results_path, 'w') as f:
+            f.write(json.dumps({'label': args.label, **benchmark_results}, indent=2))
+        print(f'Results were stored in {results_path}')
+    regressions = get_regressions(benchmark_results, reference, args.max_slowdown)
+    for regression in regressions:
+        print(f'Regression: {regression}')
+    if regressions:
+        sys.exit(1)
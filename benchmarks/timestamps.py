@@ -0,0 +1,51 @@
+import argparse
+from datetime import datetime, timedelta
+import random
+import timeit
+
+from modules.timestamps import _format_minute_prefix, format_timestamp_string, format_timestamp_string_strptime
+
+# Micro-benchmark of the event timestamp formatting against the strptime/strftime reference.
+# Run from the project root: python -m benchmarks.timestamps
+
+
+def _generate_timestamps(count: int, events_per_minute: int) -> list[str]:
+    """
+    Generates sorted source timestamp strings, with roughly the specified amount of events per minute.
+    :param int count: Amount of timestamps
+    :param int events_per_minute: Average amount of timestamps that share the same minute
+    :return list[str]: Source timestamp strings
+    """
+    rng = random.Random(0)
+    moment = datetime(2020, 6, 1)
+    timestamps = []
+    for _ in range(count):
+        moment += timedelta(seconds=rng.uniform(0, 120 / events_per_minute))
+        timestamps.append(moment.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+    return timestamps
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--count', type=int, default=100_000, help='Amount of timestamps per run')
+    parser.add_argument('-m', '--events-per-minute', type=int, default=5, help='Average events per minute')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Amount of runs, the best one is reported')
+    args = parser.parse_args()
+
+    timestamps = _generate_timestamps(args.count, args.events_per_minute)
+    assert ([format_timestamp_string(ts) for ts in timestamps]
+            == [format_timestamp_string_strptime(ts) for ts in timestamps])
+
+    benchmarks = {
+        'strptime/strftime': lambda: [format_timestamp_string_strptime(ts) for ts in timestamps],
+        'fast path': lambda: [format_timestamp_string(ts) for ts in timestamps],
+    }
+    reference_time = None
+    for name, benchmark in benchmarks.items():
+        # Every run starts with a cold minute cache
+        best_time = min(timeit.repeat(benchmark, setup=_format_minute_prefix.cache_clear,
+                                      number=1, repeat=args.repeat))
+        reference_time = reference_time or best_time
+        print(f'{name:<20} {best_time * 1e9 / args.count:>8.0f} ns/timestamp'
+              f'  {args.count / best_time:>12,.0f} timestamps/s'
+              f'  x{reference_time / best_time:.1f}')
@@ -1,8 +1,11 @@
 import argparse
+import os
 from conf import settings
-from modules.printer import ReportPrinter
+from modules.event_filter import EventFilter
 
 # CLI for the printing program
+# The modules of a command are imported once the command is known, so that e.g. "print --help"
+# or a run without the HTML export doesn't import rich, jinja2 or asyncio for nothing
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -17,6 +20,28 @@ if __name__ == '__main__':
                               help=f'Specify input file pattern.\n'
                                    f'Every file that matches specified file pattern will be read.\n'
                                    f'Supports wildcards. Default path pattern is "{settings.DEFAULT_INPUT_PATH_PATTERNS}"')
+    print_parser.add_argument('-u',
+                              '--url',
+                              type=str,
+                              help='Specify the order history API page URL to read instead of the input files.\n'
+                                   'Every following page is fetched by the "next" links, each page makes a report.')
+    print_parser.add_argument('-i',
+                              '--import-metadata',
+                              type=str,
+                              help='Specify the event metadata file (written with --export-metadata) to load the reports\n'
+                                   'from instead of reading the input files. Nothing is decoded or cleaned again.')
+    print_parser.add_argument('--concurrency',
+                              type=int,
+                              default=settings.FETCH_CONCURRENCY,
+                              help=f'Specify the amount of history pages that are requested at a time. '
+                                   f'Only works with -u. Default is {settings.FETCH_CONCURRENCY}')
+    print_parser.add_argument('-H',
+                              '--header',
+                              type=str,
+                              action='append',
+                              default=[],
+                              help='Specify an HTTP header for the history API requests, e.g. "Authorization: Token ..."\n'
+                                   'Can be used multiple times. Only works with -u.')
     print_parser.add_argument('-e',
                               '--do-export',
                               action='store_true',
@@ -26,16 +51,252 @@ if __name__ == '__main__':
     print_parser.add_argument('-d',
                               '--dest-path',
                               type=str,
-                              default=settings.DEFAULT_OUTPUT_PATH,
                               help=f'Specify output destination file path. Only works in -e(--export) argument is True.\n'
-                                   f'Specified file must be an HTML file. Default path is "{settings.DEFAULT_OUTPUT_PATH}"\n'
+                                   f'Specified file must be an HTML file. Default path is '
+                                   f'"{settings.DEFAULT_OUTPUT_DIR_PATH}{os.sep}DD.MM.YYYY_HH-MM_export.html"\n'
                                    f' (file name depends on the time of command call)')
+    print_parser.add_argument('--split',
+                              action='store_true',
+                              help='Export an index page with the summary and a separate page per report\n'
+                                   '(or per chunk of a big report) next to it. Raw event data is stored in compressed\n'
+                                   'files that are only loaded when "Details" is clicked. Only works with -e.')
+    print_parser.add_argument('--export-metadata',
+                              type=str,
+                              help='Write the cleaned event metadata and the counters of every report\n'
+                                   'into specified SQLite file, which can be loaded back with -i.')
+    print_parser.add_argument('--with-raw-data',
+                              action='store_true',
+                              help='Also write the raw event payloads into the event metadata file.\n'
+                                   'Only works with --export-metadata.')
+    print_parser.add_argument('-s',
+                              '--stream',
+                              action='store_true',
+                              help='Decode input files incrementally, one event at a time,\n'
+                                   'so that memory usage does not grow with the file size.')
+    print_parser.add_argument('-w',
+                              '--workers',
+                              type=int,
+                              default=1,
+                              help='Specify the number of worker processes that read input files in parallel.\n'
+                                   'Reports are still printed in the sorted file order. Default is 1 (no pool).')
+    print_parser.add_argument('--memory-budget',
+                              type=int,
+                              default=settings.READ_AHEAD_MEMORY_BUDGET // 1024 ** 2,
+                              help=f'Specify the size (in MB) of the input files the workers may read ahead\n'
+                                   f'of the printed report. Only works with -w. '
+                                   f'Default is {settings.READ_AHEAD_MEMORY_BUDGET // 1024 ** 2}')
+    print_parser.add_argument('-c',
+                              '--compact',
+                              action='store_true',
+                              help='Keep event metadata in compact columnar storage\n'
+                                   'instead of one object per event, to reduce memory usage.')
+    print_parser.add_argument('--summary-only',
+                              action='store_true',
+                              help='Print only the report summaries and the final summary, without the event lists.')
+    print_parser.add_argument('--no-cache',
+                              action='store_true',
+                              help=f'Do not use the report cache.\n'
+                                   f'By default reports of unchanged files are loaded from "{settings.DEFAULT_CACHE_DIR_PATH}"')
+    print_parser.add_argument('-b',
+                              '--breakdown',
+                              action='store_true',
+                              help='Group the events by 3PL, status, state, order type, event type, user, day and hour,\n'
+                                   'and show the error and order issue rates of every group in the final summary.')
+    print_parser.add_argument('--dedupe',
+                              action='store_true',
+                              help='Drop the events whose ids were already seen in this or a previously read file,\n'
+                                   'e.g. in overlapping history exports. Files are read one after another\n'
+                                   'without the report cache.')
+    print_parser.add_argument('--timeline',
+                              action='store_true',
+                              help="Group the events by order across all files and show every order's timeline:\n"
+                                   'its transitions and the fields every event changed. Files are read one after\n'
+                                   'another without the report cache, the HTML export leaves the raw event data out.')
+    filter_group = print_parser.add_argument_group('event filters',
+                                                   'Only the events that match every specified filter are reported,\n'
+                                                   'a filter with several values matches any of them.')
+    filter_group.add_argument('--event-type',
+                              type=str,
+                              nargs='+',
+                              help='Event types: CREATION, UPDATE, TRANSITION')
+    filter_group.add_argument('--status',
+                              type=str,
+                              nargs='+',
+                              help='Order statuses, e.g. "Action Required"')
+    filter_group.add_argument('--username',
+                              type=str,
+                              nargs='+',
+                              help='Usernames of the users who caused the events')
+    filter_group.add_argument('--serial-number',
+                              type=str,
+                              nargs='+',
+                              help="Orders' serial numbers (references)")
+    filter_group.add_argument('--since',
+                              type=str,
+                              help='Earliest event time (UTC), e.g. "2020-07-28" or "2020-07-28 13:00"')
+    filter_group.add_argument('--until',
+                              type=str,
+                              help='Latest event time (UTC), inclusive, e.g. "2020-07-28" for the whole day')
+    errors_group = filter_group.add_mutually_exclusive_group()
+    errors_group.add_argument('--with-errors',
+                              dest='errors_exist',
+                              action='store_const',
+                              const=True,
+                              help='Only the events with errors')
+    errors_group.add_argument('--without-errors',
+                              dest='errors_exist',
+                              action='store_const',
+                              const=False,
+                              help='Only the events without errors')
+    filter_group.add_argument('--min-order-issues',
+                              type=int,
+                              help='Minimal order issues count')
+    filter_group.add_argument('--max-order-issues',
+                              type=int,
+                              help='Maximal order issues count')
+    print_parser.add_argument('--profile',
+                              action='store_true',
+                              help='Measure the time spent in every phase (decoding, building, printing, export)\n'
+                                   'overall and per file, and print it after the final summary.')
+    print_parser.add_argument('--profile-output',
+                              type=str,
+                              help='Write the measured metrics to specified JSON file. Implies --profile.')
+    print_parser.add_argument('--profile-dump',
+                              type=str,
+                              help='Write cProfile stats of the run to specified file (readable with pstats).\n'
+                                   'Implies --profile.')
+    print_parser.add_argument('--watch',
+                              action='store_true',
+                              help='Keep watching the input file patterns after printing.\n'
+                                   'When a file appears, changes or disappears, only that file is read again\n'
+                                   'and the final summary (and the HTML export) is refreshed. Stop with Ctrl+C.')
+
+    serve_parser = subparser.add_parser('serve')
+    serve_parser.add_argument('--host',
+                              type=str,
+                              default=settings.SERVER_HOST,
+                              help=f'Specify the host to listen on. Default is "{settings.SERVER_HOST}"')
+    serve_parser.add_argument('-p',
+                              '--port',
+                              type=int,
+                              default=settings.SERVER_PORT,
+                              help=f'Specify the port to listen on. Default is {settings.SERVER_PORT}')
+    serve_parser.add_argument('--socket',
+                              type=str,
+                              help='Listen on specified Unix socket path instead of the port.')
+    serve_parser.add_argument('--input-root',
+                              type=str,
+                              default=settings.SERVER_INPUT_ROOT,
+                              help='Specify the directory the requested files are read from,\n'
+                                   'the "files" patterns of the requests are relative to it.\n'
+                                   'Default is the "input" directory')
+    serve_parser.add_argument('--memory-budget',
+                              type=int,
+                              default=settings.SERVER_MEMORY_BUDGET // 1024 ** 2,
+                              help=f'Specify the memory (in MB) the resident reports may take\n'
+                                   f'before the least recently requested ones are dropped.\n'
+                                   f'Default is {settings.SERVER_MEMORY_BUDGET // 1024 ** 2}')
+    serve_parser.add_argument('--quiet',
+                              action='store_true',
+                              help='Do not log the requests.')
 
     args = parser.parse_args()
+    event_filter = None
     if args.command == 'print':
+        try:
+            event_filter = EventFilter(event_types=args.event_type,
+                                       status_displays=args.status,
+                                       usernames=args.username,
+                                       serial_numbers=args.serial_number,
+                                       since=args.since,
+                                       until=args.until,
+                                       errors_exist=args.errors_exist,
+                                       min_order_issues_count=args.min_order_issues,
+                                       max_order_issues_count=args.max_order_issues)
+        except ValueError as ex:
+            print_parser.error(f'invalid --since/--until time ({ex})')
+
+    if args.command == 'print' and args.import_metadata and (args.url or args.watch or args.dedupe
+                                                             or args.timeline or event_filter):
+        print_parser.error('-i can not be used with -u, --watch, --dedupe, --timeline or the event filters')
+
+    if args.command == 'print':
+        args.dest_path = args.dest_path or settings.get_default_output_path()
+
+    if args.command == 'print' and args.watch:
+        from modules.watcher import ReportWatcher
+        if (args.url or args.split or args.dedupe or args.timeline or args.export_metadata
+                or args.profile or args.profile_output or args.profile_dump):
+            print_parser.error('--watch can not be used with -u, --split, --dedupe, --timeline, --export-metadata '
+                               'or the profiling options')
+        watcher = ReportWatcher(file_path_patterns=args.files,
+                                do_export=args.do_export,
+                                export_dest_path=args.dest_path,
+                                stream=args.stream,
+                                workers=args.workers,
+                                compact=args.compact,
+                                use_cache=not args.no_cache,
+                                summary_only=args.summary_only,
+                                event_filter=event_filter,
+                                aggregate=args.breakdown,
+                                memory_budget=args.memory_budget * 1024 ** 2)
+        watcher.watch()
+    elif args.command == 'print':
+        from modules.printer import ReportPrinter
+        page_fetcher = None
+        if args.url:
+            from modules.fetcher import HistoryPageFetcher
+            headers = dict(header.split(':', 1) for header in args.header if ':' in header)
+            page_fetcher = HistoryPageFetcher(args.url,
+                                              concurrency=args.concurrency,
+                                              headers={name.strip(): value.strip() for name, value in headers.items()})
+        metadata_reader = None
+        if args.import_metadata:
+            from modules.metadata_exporter import MetaDataFormatError, MetaDataReader
+            try:
+                metadata_reader = MetaDataReader(args.import_metadata)
+            except MetaDataFormatError as ex:
+                print_parser.error(str(ex))
+        profiler = None
+        if args.profile or args.profile_output or args.profile_dump:
+            from modules.profiler import RunProfiler
+            profiler = RunProfiler(metrics_dest_path=args.profile_output, stats_dump_path=args.profile_dump)
         printer = ReportPrinter(file_path_patterns=args.files,
                                 do_export=args.do_export,
-                                export_dest_path=args.dest_path)
+                                export_dest_path=args.dest_path,
+                                stream=args.stream,
+                                workers=args.workers,
+                                compact=args.compact,
+                                use_cache=not args.no_cache,
+                                split_export=args.split,
+                                summary_only=args.summary_only,
+                                page_fetcher=page_fetcher,
+                                profiler=profiler,
+                                event_filter=event_filter,
+                                aggregate=args.breakdown,
+                                deduplicate=args.dedupe,
+                                timeline=args.timeline,
+                                memory_budget=args.memory_budget * 1024 ** 2,
+                                metadata_reader=metadata_reader,
+                                metadata_dest_path=args.export_metadata,
+                                export_raw_data=args.with_raw_data)
         printer.print()
         if args.do_export:
             printer.export_to_html()
+        printer.finish_profiling()
+    elif args.command == 'serve':
+        from modules.server import ReportServer, create_server
+        http_server = create_server(ReportServer(memory_budget=args.memory_budget * 1024 ** 2,
+                                                 input_root=args.input_root),
+                                    host=args.host,
+                                    port=args.port,
+                                    socket_path=args.socket,
+                                    quiet=args.quiet)
+        server_address = args.socket or f'http://{args.host}:{http_server.server_port}/'
+        print(f'Serving reports at {server_address} (GET /text, /json, /html, /status)')
+        try:
+            http_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            http_server.server_close()
@@ -1,17 +1,77 @@
 from datetime import datetime
 import os
-from pathlib import Path
-
-from modules.default_theme import DefaultConsoleTheme
 
 # Paths
-BASE_DIR = Path(os.getcwd()).absolute()
+BASE_DIR = os.path.abspath(os.getcwd())
 DEFAULT_INPUT_PATH_PATTERNS = [
     os.path.join(BASE_DIR, 'input', '*')
 ]
-DEFAULT_OUTPUT_PATH = os.path.join(BASE_DIR, 'output', f"{datetime.now().strftime('%d.%m.%Y_%H-%M')}_export.html")
+DEFAULT_OUTPUT_DIR_PATH = os.path.join(BASE_DIR, 'output')
+# strftime format of the default export file name, which depends on the time of the command call
+DEFAULT_OUTPUT_FILENAME_FORMAT = '%d.%m.%Y_%H-%M_export.html'
 DEFAULT_TEMPLATES_DIR_PATH = os.path.join(BASE_DIR, 'templates')
+DEFAULT_CACHE_DIR_PATH = os.path.join(BASE_DIR, '.cache', 'reports')
+# Compiled templates, shared by the runs so that the templates are not compiled again every time
+TEMPLATE_CACHE_DIR_PATH = os.path.join(BASE_DIR, '.cache', 'templates')
+
+
+def get_default_output_path() -> str:
+    """
+    Returns the default export file path for the current time.
+    :return str: Export file path
+    """
+    return os.path.join(DEFAULT_OUTPUT_DIR_PATH, datetime.now().strftime(DEFAULT_OUTPUT_FILENAME_FORMAT))
+
 
 # Console settings
 DEFAULT_CONSOLE_WIDTH = 40
-DEFAULT_CONSOLE_THEME = DefaultConsoleTheme
+# Dotted path of the rich console theme class, imported by the printer
+DEFAULT_CONSOLE_THEME = 'modules.default_theme.DefaultConsoleTheme'
+
+# Reading settings
+STREAM_READ_CHUNK_SIZE = 64 * 1024
+# Size of the input files the worker processes may read ahead of the printed report,
+# so that the reports they build faster than they're printed don't pile up in memory
+READ_AHEAD_MEMORY_BUDGET = 1024 ** 3
+
+# History API fetching settings
+# Amount of pages that are requested at a time
+FETCH_CONCURRENCY = 8
+# Request timeout in seconds
+FETCH_TIMEOUT = 30
+
+# Cleaning settings
+# Amount of distinct event minutes whose formatted timestamps are memoized
+TIMESTAMP_CACHE_SIZE = 64 * 1024
+
+# Aggregation settings
+# Amount of groups per dimension shown in the console breakdown
+BREAKDOWN_MAX_GROUP_COUNT = 10
+
+# Timeline settings
+# Amount of field changes per event shown in the console timelines
+TIMELINE_MAX_CHANGE_COUNT = 20
+
+# Export settings
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Amount of events per report page of the split export
+SPLIT_EXPORT_PAGE_SIZE = 500
+
+# Report cache settings
+CACHE_MAX_SIZE = 1024 ** 3
+CACHE_MAX_AGE = 7 * 24 * 60 * 60
+# Rendered report fragments, reused by the exports as long as the reports and the report template are the same
+FRAGMENT_CACHE_DIR_PATH = os.path.join(BASE_DIR, '.cache', 'fragments')
+FRAGMENT_CACHE_MAX_SIZE = 1024 ** 3
+
+# Watch settings
+# Seconds between two checks of the watched files for changes
+WATCH_POLL_INTERVAL = 0.25
+
+# Server settings
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8361
+# Directory the server reads the requested files from, file patterns of the requests are relative to it
+SERVER_INPUT_ROOT = os.path.join(BASE_DIR, 'input')
+# Memory the resident reports of the server may take before the least recently requested ones are dropped
+SERVER_MEMORY_BUDGET = 512 * 1024 ** 2
@@ -0,0 +1,140 @@
+from array import array
+from collections import Counter
+from itertools import compress
+import json
+from typing import Union
+
+from modules.metadata_store import DictionaryEncodedColumn
+
+# Dimensions the events are grouped by and their titles, in the order the breakdowns are shown
+DIMENSION_TITLES = {'three_pl': '3PL',
+                    'status': 'Status',
+                    'state': 'State',
+                    'order_type': 'Order type',
+                    'event_type': 'Event type',
+                    'user': 'User',
+                    'day': 'Day',
+                    'hour': 'Hour'}
+# Dimensions whose groups are shown in the key order instead of the event count order
+_ORDERED_DIMENSIONS = ('day', 'hour')
+# Title of the group of the events that have no value in a dimension
+_NO_VALUE = '(none)'
+
+
+class GroupByCollector:
+    """
+    Object that collects the group-by columns of a report while it's being built.
+    Every dimension is a dictionary-encoded column of codes and the error/order issue flags are byte columns,
+    so a collected event costs one code per dimension. All group-bys are then computed at once
+    by counting the codes of every column (and of the flagged rows), without touching the events again.
+    """
+
+    def __init__(self) -> None:
+        self._columns = {dimension: DictionaryEncodedColumn() for dimension in DIMENSION_TITLES}
+        self._errors_exist = array('B')
+        self._order_issues_exist = array('B')
+
+    def add(self, event_data: dict, event_metadata) -> None:
+        """
+        Appends the group keys of an event.
+        :param dict event_data: Uncleaned dictionary of an event object's fields
+        :param event_metadata: EventMetaData object built from the event
+        :return None
+        """
+        model_data = event_data.get('model_data')
+        if not isinstance(model_data, dict):
+            model_data = {}
+        three_pl = model_data.get('three_pl')
+        event_time = event_metadata.event_time
+        columns = self._columns
+        columns['three_pl'].append(three_pl.get('company_name') if isinstance(three_pl, dict) else None)
+        columns['status'].append(model_data.get('status'))
+        columns['state'].append(model_data.get('state'))
+        columns['order_type'].append(model_data.get('order_type'))
+        columns['event_type'].append(event_metadata.event_type)
+        columns['user'].append(event_metadata.username)
+        # Event time is formatted as '%d.%m.%Y, %H:%M', the day is kept sortable
+        columns['day'].append(f'{event_time[6:10]}-{event_time[3:5]}-{event_time[0:2]}' if event_time else None)
+        columns['hour'].append(f'{event_time[-5:-3]}:00' if event_time else None)
+        self._errors_exist.append(event_metadata.errors_exist)
+        self._order_issues_exist.append(bool(event_metadata.order_issues_count))
+
+    def aggregate(self) -> dict:
+        """
+        Computes every group-by over the collected columns.
+        :return dict: Dimension -> group key -> [events, events with errors, events with order issues]
+        """
+        aggregates = {}
+        for dimension, column in self._columns.items():
+            codes = column.codes
+            event_counts = Counter(codes)
+            error_counts = Counter(compress(codes, self._errors_exist))
+            order_issue_counts = Counter(compress(codes, self._order_issues_exist))
+            groups = aggregates[dimension] = {}
+            for code, event_count in event_counts.items():
+                # Missing and empty values make up the same group
+                counts = groups.setdefault(_get_group_key(column.values[code]), [0, 0, 0])
+                counts[0] += event_count
+                counts[1] += error_counts[code]
+                counts[2] += order_issue_counts[code]
+        return aggregates
+
+
+def _get_group_key(value) -> str:
+    if value is None or value == '':
+        return _NO_VALUE
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return str(value)
+
+
+def add_aggregates(total_aggregates: dict, aggregates: dict, sign: int = 1) -> None:
+    """
+    Adds (or subtracts) report's aggregates to the total ones, groups that become empty are removed.
+    :param dict total_aggregates: Aggregates that are updated
+    :param dict aggregates: Report's aggregates
+    :param int sign: 1 to add, -1 to subtract
+    :return None
+    """
+    for dimension, groups in aggregates.items():
+        total_groups = total_aggregates.setdefault(dimension, {})
+        for group_key, counts in groups.items():
+            total_counts = total_groups.setdefault(group_key, [0, 0, 0])
+            for index, count in enumerate(counts):
+                total_counts[index] += sign * count
+            if not total_counts[0]:
+                del total_groups[group_key]
+
+
+def get_breakdown(aggregates: dict, max_group_count: Union[int, None] = None) -> list[dict]:
+    """
+    Returns the groups of every dimension with their error and order issue rates, ready to be shown.
+    Groups are ordered by the event count (time buckets by time), the rest of them are only counted.
+    :param dict aggregates: Aggregates
+    :param Union[int, None] max_group_count: Amount of groups shown per dimension, all if None
+    :return list[dict]: Dimension breakdowns
+    """
+    breakdown = []
+    for dimension, title in DIMENSION_TITLES.items():
+        groups = aggregates.get(dimension, {})
+        if dimension in _ORDERED_DIMENSIONS:
+            group_keys = sorted(groups)
+            if max_group_count is not None and dimension == 'day':
+                # The latest days are the interesting ones, hours of the day are few enough to be shown all
+                group_keys = group_keys[-max_group_count:]
+        else:
+            group_keys = sorted(groups, key=lambda group_key: (-groups[group_key][0], group_key))[:max_group_count]
+        rows = []
+        for group_key in group_keys:
+            event_count, events_with_errors, events_with_order_issues = groups[group_key]
+            rows.append({'group': group_key,
+                         'event_count': event_count,
+                         'events_with_errors': events_with_errors,
+                         'events_with_order_issues': events_with_order_issues,
+                         'error_rate': round(events_with_errors * 100 / event_count, 1),
+                         'order_issue_rate': round(events_with_order_issues * 100 / event_count, 1)})
+        breakdown.append({'dimension': dimension,
+                          'title': title,
+                          'rows': rows,
+                          'hidden_group_count': len(groups) - len(rows)})
+    return breakdown
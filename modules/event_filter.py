@@ -0,0 +1,155 @@
+from datetime import datetime
+import re
+from typing import Iterable, Union
+
+# Source event types by their cleaned (displayed) names
+_SOURCE_EVENT_TYPES = {'CREATION': 'created',
+                       'UPDATE': 'updated',
+                       'TRANSITION': 'transition'}
+# Dates and local times the time bounds may be given with
+_TIMESTAMP_PATTERN = re.compile(r'(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})'
+                                r'(?:[T ](?P<hour>\d{2})(?::(?P<minute>\d{2})(?::(?P<second>\d{2})'
+                                r'(?:\.(?P<fraction>\d{1,6}))?)?)?)?')
+
+
+class EventFilter:
+    """
+    Object that selects the events a report is built from.
+    Events are matched against their source fields, before anything is cleaned or built out of them,
+    and the conditions are checked from the cheapest to the most expensive one,
+    so a rejected event costs a few dictionary lookups.
+    Every condition is optional, a condition with several values matches any of them.
+    """
+
+    def __init__(self,
+                 event_types: Union[Iterable[str], None] = None,
+                 status_displays: Union[Iterable[str], None] = None,
+                 usernames: Union[Iterable[str], None] = None,
+                 serial_numbers: Union[Iterable[str], None] = None,
+                 since: Union[str, None] = None,
+                 until: Union[str, None] = None,
+                 errors_exist: Union[bool, None] = None,
+                 min_order_issues_count: Union[int, None] = None,
+                 max_order_issues_count: Union[int, None] = None) -> None:
+        event_types = _get_set(event_types, str.upper)
+        self._source_event_types = ({_SOURCE_EVENT_TYPES.get(event_type, event_type.lower())
+                                     for event_type in event_types}
+                                    if event_types is not None else None)
+        self._status_displays = _get_set(status_displays)
+        self._usernames = _get_set(usernames)
+        self._serial_numbers = _get_set(serial_numbers)
+        self._since = _get_timestamp_prefix(since)
+        self._until = _get_timestamp_prefix(until)
+        self._errors_exist = errors_exist
+        self._min_order_issues_count = min_order_issues_count
+        self._max_order_issues_count = max_order_issues_count
+        self._checks_model_data = (self._status_displays is not None
+                                   or self._serial_numbers is not None
+                                   or min_order_issues_count is not None
+                                   or max_order_issues_count is not None)
+        self._checks_order_issues = min_order_issues_count is not None or max_order_issues_count is not None
+        # Conditions in a JSON-serializable form, e.g. to tell apart reports cached with different filters
+        self.options = {key: sorted(value) if isinstance(value, frozenset) else value
+                        for key, value in (('event_types', event_types),
+                                           ('status_displays', self._status_displays),
+                                           ('usernames', self._usernames),
+                                           ('serial_numbers', self._serial_numbers),
+                                           ('since', self._since),
+                                           ('until', self._until),
+                                           ('errors_exist', errors_exist),
+                                           ('min_order_issues_count', min_order_issues_count),
+                                           ('max_order_issues_count', max_order_issues_count))
+                        if value is not None}
+
+    def __bool__(self) -> bool:
+        return bool(self.options)
+
+    def __str__(self) -> str:
+        descriptions = []
+        for key, value in self.options.items():
+            descriptions.append(f"{key.replace('_', ' ')}: {', '.join(value) if isinstance(value, list) else value}")
+        return '; '.join(descriptions)
+
+    def matches(self, event_data: dict) -> bool:
+        """
+        Checks whether passed source event dictionary matches every condition.
+        The fields are read the same way Report._clean_event_data() reads them.
+        :param dict event_data: Uncleaned dictionary of an event object's fields
+        :return bool: True if the event should be reported
+        """
+        if self._source_event_types is not None and event_data.get('event_type') not in self._source_event_types:
+            return False
+        if self._errors_exist is not None:
+            extra_data = event_data.get('extra_data', {})
+            if (isinstance(extra_data, dict) and 'error' in extra_data) != self._errors_exist:
+                return False
+        if self._checks_model_data:
+            model_data = event_data.get('model_data', '')
+            if not isinstance(model_data, dict):
+                model_data = {}
+            if self._status_displays is not None and model_data.get('status_display', '') not in self._status_displays:
+                return False
+            if self._serial_numbers is not None and model_data.get('reference', '') not in self._serial_numbers:
+                return False
+            if self._checks_order_issues:
+                order_issues = model_data.get('order_issues')
+                order_issues_count = len(order_issues) if isinstance(order_issues, list) else 0
+                if self._min_order_issues_count is not None and order_issues_count < self._min_order_issues_count:
+                    return False
+                if self._max_order_issues_count is not None and order_issues_count > self._max_order_issues_count:
+                    return False
+        if self._usernames is not None:
+            user_data = event_data.get('user', '')
+            if (user_data.get('username') if isinstance(user_data, dict) else '') not in self._usernames:
+                return False
+        if self._since is not None or self._until is not None:
+            event_time = event_data.get('event_time', '')
+            if not isinstance(event_time, str):
+                return False
+            # Source timestamps are ISO 8601, so they're compared as strings
+            # up to the precision of the bound (e.g. the whole day for '2020-07-28')
+            if self._since is not None and event_time[:len(self._since)] < self._since:
+                return False
+            if self._until is not None and event_time[:len(self._until)] > self._until:
+                return False
+        return True
+
+
+def _get_set(values: Union[Iterable[str], None], normalize=None) -> Union[frozenset, None]:
+    """
+    Returns passed condition values as a set, None if there's no condition.
+    :param Union[Iterable[str], None] values: Condition values
+    :param normalize: Function applied to every value
+    :return Union[frozenset, None]: Set of the values
+    """
+    if values is None:
+        return None
+    return frozenset(map(normalize, values) if normalize else values)
+
+
+def _get_timestamp_prefix(timestamp_str: Union[str, None]) -> Union[str, None]:
+    """
+    Parses an ISO 8601 date or local date and time ('2020-07-28', '2020-07-28T20', '2020-07-28T20:03',
+    '2020-07-28 20:03:02', '2020-07-28T20:03:02.4') and returns it in the source timestamp notation,
+    truncated to the precision it was given with.
+    Other ISO 8601 forms (basic notation, week dates, UTC offsets) are rejected, as they can't be compared
+    with the source timestamps as strings.
+    :param Union[str, None] timestamp_str: Date and time string
+    :return Union[str, None]: Source timestamp prefix
+    """
+    if timestamp_str is None:
+        return None
+    match = _TIMESTAMP_PATTERN.fullmatch(timestamp_str.strip())
+    if match is None:
+        raise ValueError(f"'{timestamp_str}' is not a YYYY-MM-DD[THH[:MM[:SS[.ffffff]]]] date and time")
+    # Raises ValueError for an out of range date or time, e.g. '2020-02-30'
+    parsed_datetime = datetime(int(match['year']), int(match['month']), int(match['day']),
+                               int(match['hour'] or 0), int(match['minute'] or 0), int(match['second'] or 0),
+                               int((match['fraction'] or '0').ljust(6, '0')))
+    if match['hour'] is None:
+        return parsed_datetime.date().isoformat()
+    if match['fraction'] is not None:
+        return parsed_datetime.isoformat(timespec='microseconds')[:len('YYYY-MM-DDTHH:MM:SS.') + len(match['fraction'])]
+    if match['minute'] is None:
+        return parsed_datetime.isoformat(timespec='hours')
+    return parsed_datetime.isoformat(timespec='minutes' if match['second'] is None else 'seconds')
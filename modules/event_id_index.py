@@ -0,0 +1,198 @@
+from array import array
+from bisect import bisect_left
+from typing import Any, Iterator
+
+# Every container holds the ids that share the bits above the lowest 16 ones
+_CONTAINER_BITS = 16
+_CONTAINER_MASK = (1 << _CONTAINER_BITS) - 1
+# Size of a bitmap container, which holds any amount of ids of its range
+_BITMAP_SIZE = (1 << _CONTAINER_BITS) // 8
+# Amount of ids from which an array container takes more memory than a bitmap one
+_MAX_ARRAY_CONTAINER_LENGTH = _BITMAP_SIZE // 2
+# Amount of sparse ids of a range from which an array container (and its dictionary entry) takes less memory
+_MIN_ARRAY_CONTAINER_LENGTH = 32
+# Sparse ids are kept in sorted chunks, a chunk is split in halves once it's longer than twice this length
+_SPARSE_CHUNK_LENGTH = 512
+
+
+class EventIdIndex:
+    """
+    Compact set of the event ids that were already seen, used to drop duplicate events across files.
+    Non-negative integer ids are split into ranges by their high bits. Ids of a range that has few of them
+    are kept in flat sorted 64-bit chunks shared by all such ranges (about 8 bytes per id). A range that gets
+    enough ids has its own container: a sorted array of the low 16 bits (2 bytes per id) that is turned into
+    an 8 KB bitmap (1 bit per id of the range) once that's smaller.
+    Ids of any other type are kept in a set.
+    """
+
+    def __init__(self) -> None:
+        self._containers = {}
+        self._sparse_chunks = []
+        # Greatest id of every sparse chunk, to find the chunk an id belongs to
+        self._sparse_chunk_maxima = []
+        self._other_ids = set()
+        self._id_count = 0
+
+    def __len__(self) -> int:
+        return self._id_count
+
+    def __contains__(self, event_id: Any) -> bool:
+        if type(event_id) is not int or event_id < 0:
+            return event_id in self._other_ids
+        container = self._containers.get(event_id >> _CONTAINER_BITS)
+        if container is None:
+            return self._find_sparse_id(event_id)[2]
+        low_bits = event_id & _CONTAINER_MASK
+        if type(container) is bytearray:
+            return bool(container[low_bits >> 3] & (1 << (low_bits & 7)))
+        position = bisect_left(container, low_bits)
+        return position < len(container) and container[position] == low_bits
+
+    def add(self, event_id: Any) -> bool:
+        """
+        Adds specified event id to the index.
+        :param Any event_id: Event id
+        :return bool: True if the id was not in the index yet
+        """
+        if type(event_id) is not int or event_id < 0:
+            if event_id in self._other_ids:
+                return False
+            self._other_ids.add(event_id)
+            self._id_count += 1
+            return True
+
+        container_key = event_id >> _CONTAINER_BITS
+        low_bits = event_id & _CONTAINER_MASK
+        container = self._containers.get(container_key)
+        if container is None:
+            return self._add_sparse_id(event_id)
+
+        if type(container) is bytearray:
+            byte_index, bit = low_bits >> 3, 1 << (low_bits & 7)
+            if container[byte_index] & bit:
+                return False
+            container[byte_index] |= bit
+            self._id_count += 1
+            return True
+
+        # Ids mostly come sorted (ascending or descending), so the ends are checked first
+        if low_bits > container[-1]:
+            position = len(container)
+        elif low_bits < container[0]:
+            position = 0
+        else:
+            position = bisect_left(container, low_bits)
+            if container[position] == low_bits:
+                return False
+        container.insert(position, low_bits)
+        self._id_count += 1
+        if len(container) > _MAX_ARRAY_CONTAINER_LENGTH:
+            self._containers[container_key] = self._get_bitmap(container)
+        return True
+
+    def _find_sparse_id(self, event_id: int) -> tuple:
+        """
+        Looks specified id up in the sparse chunks.
+        :param int event_id: Event id
+        :return tuple: Index of the chunk, position in the chunk the id is (or would be) at, whether it's there
+        """
+        chunk_index = bisect_left(self._sparse_chunk_maxima, event_id)
+        if chunk_index == len(self._sparse_chunks):
+            return chunk_index - 1, len(self._sparse_chunks[-1]) if self._sparse_chunks else 0, False
+        chunk = self._sparse_chunks[chunk_index]
+        position = bisect_left(chunk, event_id)
+        return chunk_index, position, chunk[position] == event_id
+
+    def _add_sparse_id(self, event_id: int) -> bool:
+        """
+        Adds an id of a range without a container to the sparse chunks,
+        moves the range's ids into a container once there are enough of them.
+        :param int event_id: Event id
+        :return bool: True if the id was not in the index yet
+        """
+        if not self._sparse_chunks:
+            self._sparse_chunks.append(array('Q', (event_id,)))
+            self._sparse_chunk_maxima.append(event_id)
+            self._id_count += 1
+            return True
+        chunk_index, position, found = self._find_sparse_id(event_id)
+        if found:
+            return False
+        chunk = self._sparse_chunks[chunk_index]
+        chunk.insert(position, event_id)
+        self._sparse_chunk_maxima[chunk_index] = chunk[-1]
+        self._id_count += 1
+
+        # The range's ids are counted within the chunk first, as they rarely continue into the neighbouring ones
+        container_key = event_id >> _CONTAINER_BITS
+        range_start = bisect_left(chunk, container_key << _CONTAINER_BITS, 0, position)
+        range_end = bisect_left(chunk, (container_key + 1) << _CONTAINER_BITS, position)
+        if (range_end - range_start >= _MIN_ARRAY_CONTAINER_LENGTH or range_start == 0 < chunk_index
+                or range_end == len(chunk) and chunk_index < len(self._sparse_chunks) - 1):
+            range_ids = self._get_sparse_range_ids(container_key)
+            if len(range_ids) >= _MIN_ARRAY_CONTAINER_LENGTH:
+                self._remove_sparse_range_ids(container_key)
+                self._containers[container_key] = array('H', (range_id & _CONTAINER_MASK for range_id in range_ids))
+                return True
+
+        if len(chunk) > 2 * _SPARSE_CHUNK_LENGTH:
+            self._sparse_chunks[chunk_index:chunk_index + 1] = (chunk[:_SPARSE_CHUNK_LENGTH],
+                                                                chunk[_SPARSE_CHUNK_LENGTH:])
+            self._sparse_chunk_maxima.insert(chunk_index, chunk[_SPARSE_CHUNK_LENGTH - 1])
+        return True
+
+    def _iter_sparse_range_slices(self, container_key: int) -> Iterator[tuple]:
+        """
+        Yields the chunks and slice bounds of the sparse ids of specified range, in ascending order.
+        :param int container_key: High bits of the range
+        :return Iterator[tuple]: Chunk index, chunk, start and end positions
+        """
+        range_start, range_end = container_key << _CONTAINER_BITS, (container_key + 1) << _CONTAINER_BITS
+        for chunk_index in range(bisect_left(self._sparse_chunk_maxima, range_start), len(self._sparse_chunks)):
+            chunk = self._sparse_chunks[chunk_index]
+            start, end = bisect_left(chunk, range_start), bisect_left(chunk, range_end)
+            yield chunk_index, chunk, start, end
+            if end < len(chunk):
+                break
+
+    def _get_sparse_range_ids(self, container_key: int) -> array:
+        """
+        Returns the sparse ids of specified range, stops counting at _MIN_ARRAY_CONTAINER_LENGTH.
+        :param int container_key: High bits of the range
+        :return array: Sorted ids
+        """
+        range_ids = array('Q')
+        for _, chunk, start, end in self._iter_sparse_range_slices(container_key):
+            range_ids.extend(chunk[start:end])
+            if len(range_ids) >= _MIN_ARRAY_CONTAINER_LENGTH:
+                break
+        return range_ids
+
+    def _remove_sparse_range_ids(self, container_key: int) -> None:
+        """
+        Removes the sparse ids of specified range, along with the chunks that are left empty.
+        :param int container_key: High bits of the range
+        :return None
+        """
+        emptied_chunk_indexes = []
+        for chunk_index, chunk, start, end in list(self._iter_sparse_range_slices(container_key)):
+            del chunk[start:end]
+            if chunk:
+                self._sparse_chunk_maxima[chunk_index] = chunk[-1]
+            else:
+                emptied_chunk_indexes.append(chunk_index)
+        for chunk_index in reversed(emptied_chunk_indexes):
+            del self._sparse_chunks[chunk_index]
+            del self._sparse_chunk_maxima[chunk_index]
+
+    @staticmethod
+    def _get_bitmap(container: array) -> bytearray:
+        """
+        Converts an array container into a bitmap one.
+        :param array container: Sorted low bits of the ids
+        :return bytearray: Bitmap of the low bits
+        """
+        bitmap = bytearray(_BITMAP_SIZE)
+        for low_bits in container:
+            bitmap[low_bits >> 3] |= 1 << (low_bits & 7)
+        return bitmap
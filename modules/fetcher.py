@@ -0,0 +1,227 @@
+import asyncio
+from collections import deque
+import http.client
+import json
+import queue
+import threading
+from typing import Iterator, Union
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+from conf import settings
+
+
+class PageFetchError(Exception):
+    """
+    Exception that is raised when a history page could not be fetched or decoded.
+    """
+
+
+class _ConnectionPool:
+    """
+    Pool of persistent HTTP connections shared by concurrent page requests.
+    Blocking requests are run in threads, the amount of requests at a time is bounded by the pool size.
+    """
+
+    def __init__(self, size: int, timeout: float, headers: dict) -> None:
+        self._semaphore = asyncio.Semaphore(size)
+        self._timeout = timeout
+        self._headers = headers
+        self._idle_connections = {}
+
+    async def get_json(self, url: str) -> dict:
+        """
+        Requests specified URL and JSON-decodes the response body.
+        :param str url: Page URL
+        :return dict: Decoded page
+        """
+        url_parts = urlsplit(url)
+        connection_key = (url_parts.scheme, url_parts.netloc)
+        path = urlunsplit(('', '', url_parts.path or '/', url_parts.query, ''))
+        async with self._semaphore:
+            idle_connections = self._idle_connections.setdefault(connection_key, [])
+            connection = idle_connections.pop() if idle_connections else self._connect(*connection_key)
+            try:
+                page = await asyncio.to_thread(self._request_json, connection, path)
+            except BaseException:
+                connection.close()
+                raise
+            idle_connections.append(connection)
+            return page
+
+    def _connect(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        """
+        Creates a connection to specified host.
+        :param str scheme: URL scheme ('http' or 'https')
+        :param str netloc: Host with an optional port
+        :return http.client.HTTPConnection: Not yet opened connection
+        """
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=self._timeout)
+        if scheme == 'http':
+            return http.client.HTTPConnection(netloc, timeout=self._timeout)
+        raise PageFetchError(f"Unsupported URL scheme '{scheme}'.")
+
+    def _request_json(self, connection: http.client.HTTPConnection, path: str) -> dict:
+        """
+        Sends GET request over passed connection and JSON-decodes the response body.
+        :param http.client.HTTPConnection connection: Connection
+        :param str path: Request path with the query string
+        :return dict: Decoded page
+        """
+        try:
+            connection.request('GET', path, headers=self._headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError) as ex:
+            raise PageFetchError(f"Request failed ({ex}).")
+        if response.status != 200:
+            raise PageFetchError(f"Request failed ({response.status} {response.reason}).")
+        try:
+            page = json.loads(body)
+        except (json.decoder.JSONDecodeError, UnicodeDecodeError):
+            raise PageFetchError("Response could not be decoded.")
+        if not isinstance(page, dict):
+            raise PageFetchError("Response is wrongly formulated.")
+        return page
+
+
+class HistoryPageFetcher:
+    """
+    Object that fetches every page of the order history API, starting from the specified page URL.
+    Offsets of the following pages are predicted from the first page's 'count' and its 'next' link,
+    so the pages are fetched concurrently over pooled connections; if the 'next' link has no
+    limit/offset the pages are fetched one after another by following the 'next' links.
+    Pages are yielded in the order of their offsets as soon as they arrive.
+    """
+
+    # Marks the end of the fetched page queue
+    _END = object()
+
+    def __init__(self,
+                 start_url: str,
+                 concurrency: int = settings.FETCH_CONCURRENCY,
+                 timeout: float = settings.FETCH_TIMEOUT,
+                 headers: Union[dict, None] = None) -> None:
+        self.start_url = start_url
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    def iter_pages(self) -> Iterator[tuple[str, Union[dict, None], Union[str, None]]]:
+        """
+        Fetches pages in a background event loop and yields them in the page order.
+        At most a few pages ahead of the consumer are fetched and kept in memory.
+        :return Iterator[tuple[str, Union[dict, None], Union[str, None]]]: (page URL, decoded page or None,
+                                                                             error message or None)
+        """
+        fetched_pages = queue.Queue(maxsize=self.concurrency)
+        fetching_thread = threading.Thread(target=asyncio.run,
+                                           args=(self._fetch_pages(fetched_pages),),
+                                           daemon=True)
+        fetching_thread.start()
+        while True:
+            fetched_page = fetched_pages.get()
+            if fetched_page is self._END:
+                break
+            yield fetched_page
+
+    async def _fetch_pages(self, fetched_pages: queue.Queue) -> None:
+        """
+        Fetches every page of the history and puts them into passed queue in the page order.
+        :param queue.Queue fetched_pages: Queue the (page URL, page, error message) tuples are put into
+        :return None
+        """
+        pool = _ConnectionPool(self.concurrency, self.timeout, self.headers)
+        try:
+            first_page, error_message = await self._fetch_page(pool, self.start_url)
+            await asyncio.to_thread(fetched_pages.put, (self.start_url, first_page, error_message))
+            if first_page is None:
+                return
+            page_urls = self._get_following_page_urls(first_page)
+            if page_urls is None:
+                await self._fetch_linked_pages(pool, first_page, fetched_pages)
+            else:
+                await self._fetch_page_urls(pool, page_urls, fetched_pages)
+        finally:
+            fetched_pages.put(self._END)
+
+    async def _fetch_page_urls(self, pool: _ConnectionPool, page_urls: list[str], fetched_pages: queue.Queue) -> None:
+        """
+        Fetches specified pages concurrently, keeping a bounded window of requests ahead of the consumer.
+        :param _ConnectionPool pool: Connection pool
+        :param list[str] page_urls: URLs of the pages in the page order
+        :param queue.Queue fetched_pages: Queue the (page URL, page, error message) tuples are put into
+        :return None
+        """
+        page_url_iterator = iter(page_urls)
+        pending_fetches = deque()
+        for page_url in page_url_iterator:
+            pending_fetches.append((page_url, asyncio.create_task(self._fetch_page(pool, page_url))))
+            if len(pending_fetches) >= self.concurrency * 2:
+                break
+        while pending_fetches:
+            page_url, fetch_task = pending_fetches.popleft()
+            page, error_message = await fetch_task
+            next_page_url = next(page_url_iterator, None)
+            if next_page_url:
+                pending_fetches.append((next_page_url, asyncio.create_task(self._fetch_page(pool, next_page_url))))
+            await asyncio.to_thread(fetched_pages.put, (page_url, page, error_message))
+
+    async def _fetch_linked_pages(self, pool: _ConnectionPool, page: dict, fetched_pages: queue.Queue) -> None:
+        """
+        Fetches pages one after another by following their 'next' links.
+        :param _ConnectionPool pool: Connection pool
+        :param dict page: Already fetched page to start from
+        :param queue.Queue fetched_pages: Queue the (page URL, page, error message) tuples are put into
+        :return None
+        """
+        visited_page_urls = {self.start_url}
+        page_url = page.get('next')
+        while isinstance(page_url, str) and page_url not in visited_page_urls:
+            visited_page_urls.add(page_url)
+            page, error_message = await self._fetch_page(pool, page_url)
+            await asyncio.to_thread(fetched_pages.put, (page_url, page, error_message))
+            if page is None:
+                break
+            page_url = page.get('next')
+
+    @staticmethod
+    async def _fetch_page(pool: _ConnectionPool, page_url: str) -> tuple[Union[dict, None], Union[str, None]]:
+        """
+        Fetches a single page.
+        :param _ConnectionPool pool: Connection pool
+        :param str page_url: Page URL
+        :return tuple[Union[dict, None], Union[str, None]]: Decoded page or the reason why it was not fetched
+        """
+        try:
+            return await pool.get_json(page_url), None
+        except PageFetchError as ex:
+            return None, f"Skipping '{page_url}' ({ex})"
+
+    @staticmethod
+    def _get_following_page_urls(first_page: dict) -> Union[list[str], None]:
+        """
+        Predicts URLs of the pages that follow the first one from its 'count' and the limit/offset of its 'next' link.
+        :param dict first_page: Decoded first page
+        :return Union[list[str], None]: Following page URLs, None if they can't be predicted
+        """
+        next_page_url = first_page.get('next')
+        count = first_page.get('count')
+        if not next_page_url:
+            return []
+        if not isinstance(next_page_url, str) or not isinstance(count, int):
+            return None
+        url_parts = urlsplit(next_page_url)
+        query = parse_qs(url_parts.query, keep_blank_values=True)
+        try:
+            limit = int(query['limit'][-1])
+            offset = int(query['offset'][-1])
+        except (KeyError, ValueError):
+            return None
+        if limit <= 0:
+            return None
+        page_urls = []
+        for page_offset in range(offset, count, limit):
+            query['offset'] = [str(page_offset)]
+            page_urls.append(urlunsplit(url_parts._replace(query=urlencode(query, doseq=True))))
+        return page_urls
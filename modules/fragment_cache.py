@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import time
+
+from conf import settings
+
+# Bumped whenever the way fragments are keyed changes, so that older fragments are not reused
+FRAGMENT_FORMAT_VERSION = 1
+# Report context key the content digest is kept under, so it's cached along with the report
+CONTENT_DIGEST_KEY = 'content_digest'
+# Context keys that are not rendered into a report fragment
+_UNRENDERED_CONTEXT_KEYS = ('event_metadata_payload', 'aggregates', CONTENT_DIGEST_KEY)
+
+
+def get_content_digest(report_context: dict) -> str:
+    """
+    Returns the content hash of a report as it's rendered: its counters, the cleaned fields
+    and the raw payload of every event. The file path is part of the counters, so two reports render into
+    the same fragment only if they were read from the same file and have the same content digest.
+    The digest is computed once and kept in the report context.
+    :param dict report_context: Report object's context dictionary
+    :return str: Hex digest
+    """
+    content_digest = report_context.get(CONTENT_DIGEST_KEY)
+    if content_digest is not None:
+        return content_digest
+    content_hash = hashlib.blake2b(digest_size=20)
+    content_hash.update(json.dumps({key: value for key, value in report_context.items()
+                                    if key not in _UNRENDERED_CONTEXT_KEYS}, sort_keys=True, default=str).encode())
+    for event_id, e_metadata in report_context['event_metadata_payload'].items():
+        event_raw_data = e_metadata.event_raw_data
+        content_hash.update(f'\x1e{event_id}\x1f{e_metadata.event_type}\x1f{e_metadata.event_time}'
+                            f'\x1f{e_metadata.username}\x1f{e_metadata.serial_number}\x1f{e_metadata.status_display}'
+                            f'\x1f{e_metadata.order_issues_count}\x1f{e_metadata.errors_exist}'
+                            f'\x1f{event_raw_data is None}\x1f{"" if event_raw_data is None else event_raw_data}'
+                            .encode())
+    content_digest = report_context[CONTENT_DIGEST_KEY] = content_hash.hexdigest()
+    return content_digest
+
+
+def get_fragment_digest(content_digest: str, template_source: str) -> str:
+    """
+    Returns the digest a report's fragment is addressed by.
+    :param str content_digest: Report's content digest
+    :param str template_source: Source of the report template
+    :return str: Hex digest
+    """
+    return hashlib.blake2b(f'{FRAGMENT_FORMAT_VERSION}\x1f{content_digest}\x1f{template_source}'.encode(),
+                           digest_size=20).hexdigest()
+
+
+class FragmentCache:
+    """
+    Persistent on-disk cache of rendered report fragments, content-addressed by get_fragment_digest(),
+    so that a report that didn't change since any previous export is not rendered again.
+    Fragment files are named by their digests, a fragment's mtime is its last use;
+    fragments that weren't used for longer than max_age, then the least recently used ones
+    that don't fit into max_size are removed by evict().
+    Raises OSError if the cache directory can't be created or written to.
+    """
+
+    FRAGMENT_SUFFIX = '.html'
+
+    def __init__(self,
+                 cache_dir_path: str = settings.FRAGMENT_CACHE_DIR_PATH,
+                 max_size: int = settings.FRAGMENT_CACHE_MAX_SIZE,
+                 max_age: int = settings.CACHE_MAX_AGE) -> None:
+        self.cache_dir_path = cache_dir_path
+        self.max_size = max_size
+        self.max_age = max_age
+        os.makedirs(cache_dir_path, exist_ok=True)
+        if not os.access(cache_dir_path, os.W_OK | os.X_OK):
+            raise PermissionError(f"Fragment cache directory '{cache_dir_path}' is not writable")
+
+    def get_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir_path, f'{digest}{self.FRAGMENT_SUFFIX}')
+
+    def contains(self, digest: str) -> bool:
+        """
+        Checks whether the fragment of specified digest was rendered, marks it as used if so.
+        :param str digest: Report digest
+        :return bool: True if the fragment file can be reused
+        """
+        try:
+            os.utime(self.get_path(digest))
+        except OSError:
+            return False
+        return True
+
+    def evict(self) -> None:
+        """
+        Removes fragments that weren't used for longer than max_age,
+        then removes least recently used fragments until the cache fits into max_size.
+        :return None
+        """
+        fragments = []
+        try:
+            with os.scandir(self.cache_dir_path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.FRAGMENT_SUFFIX):
+                        fragment_stat = entry.stat()
+                        fragments.append((fragment_stat.st_mtime, fragment_stat.st_size, entry.path))
+        except OSError:
+            return
+        fragments.sort()
+        expired_before = time.time() - self.max_age
+        total_size = sum(fragment_size for _, fragment_size, _ in fragments)
+        for last_used_at, fragment_size, fragment_path in fragments:
+            if last_used_at >= expired_before and total_size <= self.max_size:
+                break
+            total_size -= fragment_size
+            try:
+                os.remove(fragment_path)
+            except OSError:
+                pass
@@ -0,0 +1,397 @@
+from abc import ABC, abstractmethod
+import base64
+from collections import OrderedDict
+import gzip
+from itertools import islice
+import json
+import os
+import tempfile
+from typing import Iterator, Union
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+from conf import settings
+from modules.fragment_cache import FragmentCache, get_content_digest, get_fragment_digest
+
+# Template environments of a render worker process by templates directory path
+_worker_template_envs = {}
+
+
+def create_template_env(templates_dir_path: str = settings.DEFAULT_TEMPLATES_DIR_PATH) -> Environment:
+    """
+    Creates the template environment of specified templates directory.
+    Compiled templates are kept in a bytecode cache shared by the runs, a template is only compiled again
+    once its source changes. Templates are compiled on every run if the cache directory can't be created.
+    :param str templates_dir_path: Templates directory path
+    :return Environment: Template environment
+    """
+    bytecode_cache = None
+    try:
+        os.makedirs(settings.TEMPLATE_CACHE_DIR_PATH, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(settings.TEMPLATE_CACHE_DIR_PATH)
+    except OSError:
+        pass
+    return Environment(loader=FileSystemLoader(searchpath=templates_dir_path), bytecode_cache=bytecode_cache)
+
+
+def _write_fragment(template: Template, report_context: dict, fragment_path: str) -> None:
+    """
+    Renders specified report context into a fragment file.
+    The fragment is written next to its path first and then moved in place,
+    so a fragment file that exists is always complete, even if another export writes the same one.
+    :param Template template: Report template
+    :param dict report_context: Report object's context dictionary
+    :param str fragment_path: Fragment file path
+    :return None
+    """
+    tmp_fragment_path = f'{fragment_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_fragment_path, 'w', encoding='utf-8', buffering=settings.EXPORT_CHUNK_SIZE) as f:
+            f.writelines(template.generate(report=report_context))
+        os.replace(tmp_fragment_path, fragment_path)
+    except BaseException:
+        if os.path.exists(tmp_fragment_path):
+            os.remove(tmp_fragment_path)
+        raise
+
+
+def _render_fragment(templates_dir_path: str, template_name: str, report_context: dict, fragment_path: str) -> None:
+    """
+    Renders specified report context into a fragment file in a worker process.
+    :param str templates_dir_path: Templates directory path
+    :param str template_name: Report template file name
+    :param dict report_context: Report object's context dictionary
+    :param str fragment_path: Fragment file path
+    :return None
+    """
+    template_env = _worker_template_envs.get(templates_dir_path)
+    if template_env is None:
+        template_env = _worker_template_envs[templates_dir_path] = create_template_env(templates_dir_path)
+    _write_fragment(template_env.get_template(template_name), report_context, fragment_path)
+
+
+class BaseHtmlExporter(ABC):
+    """
+    Base object for the HTML exporters.
+    Reports are added one by one as soon as they're built, the export is written once all of them were added.
+    """
+
+    def __init__(self,
+                 dest_path: str,
+                 templates_dir_path: str = settings.DEFAULT_TEMPLATES_DIR_PATH,
+                 template_env: Union[Environment, None] = None) -> None:
+        self.dest_path = dest_path
+        if template_env is None:
+            template_env = create_template_env(templates_dir_path)
+        # Environment may be shared between exporters (e.g. of a long-running server) to reuse compiled templates
+        self._template_env = template_env
+
+    @abstractmethod
+    def add_report(self, report_context: dict) -> None:
+        """
+        Adds a built report to the export.
+        :param dict report_context: Report object's context dictionary
+        :return None
+        """
+
+    @abstractmethod
+    def export(self, context: dict) -> None:
+        """
+        Writes the export with all the added reports.
+        :param dict context: ReportPrinter object's context dictionary
+        :return None
+        """
+
+    def _write_template(self, template_name: str, dest_path: str, *args, **kwargs) -> None:
+        """
+        Streams specified template rendered with passed context into the destination file.
+        :param str template_name: Template file name
+        :param str dest_path: Destination file path
+        :return None
+        """
+        template = self._template_env.get_template(template_name)
+        with open(dest_path, 'w', encoding='utf-8', buffering=settings.EXPORT_CHUNK_SIZE) as f:
+            f.writelines(template.generate(*args, **kwargs))
+
+    def close(self) -> None:
+        """
+        Releases resources held by the exporter.
+        :return None
+        """
+
+
+class HtmlExporter(BaseHtmlExporter):
+    """
+    Object that renders reports into an HTML export file.
+    Each report is rendered into a fragment file as soon as it's added, so the report context
+    doesn't have to be kept until the export, then the page is streamed into the destination file
+    with the fragments concatenated chunk by chunk. Peak memory is bounded by the largest single report.
+    Fragments are content-addressed (see FragmentCache): a report whose fragment was rendered by
+    a previous export is not rendered again, and with more than one worker the rest are rendered
+    by a process pool while the following reports are being built.
+    """
+
+    PAGE_TEMPLATE_NAME = 'index.html'
+    REPORT_TEMPLATE_NAME = 'report.html'
+
+    def __init__(self,
+                 dest_path: str,
+                 templates_dir_path: str = settings.DEFAULT_TEMPLATES_DIR_PATH,
+                 template_env: Union[Environment, None] = None,
+                 fragment_cache: Union[FragmentCache, None] = None,
+                 workers: int = 1) -> None:
+        super().__init__(dest_path, templates_dir_path, template_env)
+        self._templates_dir_path = templates_dir_path
+        self._fragment_cache = fragment_cache
+        # Fragments only live as long as the exporter if they're not cached
+        self._fragments_dir = tempfile.TemporaryDirectory() if fragment_cache is None else None
+        self.workers = workers
+        self._executor = None
+        # Fragment path -> future of its render, in the submission order
+        self._pending_renders = OrderedDict()
+        self._template_source = None
+        self._fragment_count = 0
+        self._fragment_paths = []
+
+    def add_report(self, report_context: dict) -> None:
+        """
+        Renders specified report context into its fragment file, unless the fragment is already there.
+        :param dict report_context: Report object's context dictionary
+        :return None
+        """
+        self._fragment_paths.append(self._render_report(report_context))
+
+    def _render_report(self, report_context: dict) -> str:
+        """
+        Finds the fragment of specified report context, renders it if it's not cached yet.
+        Fragments that are not cached are just numbered, so their reports are not hashed.
+        With more than one worker, the render is submitted to the pool and only waited for
+        once too many renders are in flight.
+        :param dict report_context: Report object's context dictionary
+        :return str: Fragment file path
+        """
+        if self._fragments_dir is not None:
+            self._fragment_count += 1
+            fragment_path = os.path.join(self._fragments_dir.name, f'{self._fragment_count}.html')
+        else:
+            fragment_digest = get_fragment_digest(get_content_digest(report_context), self._get_template_source())
+            fragment_path = self._fragment_cache.get_path(fragment_digest)
+            if fragment_path in self._pending_renders or self._fragment_cache.contains(fragment_digest):
+                return fragment_path
+        if self.workers < 2:
+            _write_fragment(self._template_env.get_template(self.REPORT_TEMPLATE_NAME), report_context, fragment_path)
+            return fragment_path
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        while len(self._pending_renders) >= self.workers * 2:
+            self._wait_for_render()
+        self._pending_renders[fragment_path] = self._executor.submit(_render_fragment,
+                                                                     self._templates_dir_path,
+                                                                     self.REPORT_TEMPLATE_NAME,
+                                                                     report_context,
+                                                                     fragment_path)
+        return fragment_path
+
+    def _discard_fragment(self, fragment_path: str) -> None:
+        """
+        Deletes a fragment that is no longer part of the export, unless it's cached for the following exports.
+        :param str fragment_path: Fragment file path
+        :return None
+        """
+        if self._fragments_dir is None:
+            return
+        future = self._pending_renders.pop(fragment_path, None)
+        if future is not None and not future.cancel():
+            future.exception()
+        if os.path.exists(fragment_path):
+            os.remove(fragment_path)
+
+    def _wait_for_render(self) -> None:
+        """
+        Waits for the earliest submitted render, re-raising its error if it failed.
+        :return None
+        """
+        _, future = self._pending_renders.popitem(last=False)
+        future.result()
+
+    def _shutdown_executor(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._pending_renders.clear()
+
+    def _get_template_source(self) -> str:
+        if self._template_source is None:
+            self._template_source, _, _ = self._template_env.loader.get_source(self._template_env,
+                                                                               self.REPORT_TEMPLATE_NAME)
+        return self._template_source
+
+    def _iter_fragment_paths(self) -> Iterator[str]:
+        return iter(self._fragment_paths)
+
+    def _iter_rendered_reports(self) -> Iterator[str]:
+        """
+        Yields the fragments in chunks.
+        :return Iterator[str]: Rendered HTML chunks
+        """
+        for fragment_path in self._iter_fragment_paths():
+            with open(fragment_path, 'r', encoding='utf-8') as f:
+                yield from iter(lambda: f.read(settings.EXPORT_CHUNK_SIZE), '')
+
+    def export(self, context: dict) -> None:
+        """
+        Waits for the pending renders, then streams the page with specified global context
+        and the rendered reports into the destination file.
+        :param dict context: ReportPrinter object's context dictionary
+        :return None
+        """
+        while self._pending_renders:
+            self._wait_for_render()
+        # Pool is started again by the next render (e.g. of a changed report in the watch mode), if there is one
+        self._shutdown_executor()
+        self._write_template(self.PAGE_TEMPLATE_NAME,
+                             self.dest_path,
+                             context,
+                             rendered_reports=self._iter_rendered_reports())
+
+    def close(self) -> None:
+        """
+        Stops the render pool, then evicts the stale cached fragments or deletes the uncached ones.
+        :return None
+        """
+        self._shutdown_executor()
+        if self._fragments_dir is not None:
+            self._fragments_dir.cleanup()
+        else:
+            self._fragment_cache.evict()
+
+
+class SplitHtmlExporter(BaseHtmlExporter):
+    """
+    Object that renders reports into a split HTML export: an index page with the global summary
+    and links to the reports, plus a directory next to it with one page per report
+    (or per chunk of a big report's events).
+    Raw event payloads are not put into the pages, each page has a gzip-compressed sidecar script
+    with them, which is only loaded by the browser when 'Details' is clicked.
+    """
+
+    PAGE_TEMPLATE_NAME = 'split_index.html'
+    REPORT_PAGE_TEMPLATE_NAME = 'split_report_page.html'
+
+    def __init__(self, dest_path: str, templates_dir_path: str = settings.DEFAULT_TEMPLATES_DIR_PATH) -> None:
+        super().__init__(dest_path, templates_dir_path)
+        dest_dir_path, dest_filename = os.path.split(dest_path)
+        self._index_filename = dest_filename
+        self._files_dir_name = f'{os.path.splitext(dest_filename)[0]}_files'
+        self._files_dir_path = os.path.join(dest_dir_path, self._files_dir_name)
+        self._report_links = []
+
+    def add_report(self, report_context: dict) -> None:
+        """
+        Writes the pages and the raw data sidecars of specified report context
+        and keeps a link to the report for the index page.
+        :param dict report_context: Report object's context dictionary
+        :return None
+        """
+        os.makedirs(self._files_dir_path, exist_ok=True)
+        report_number = len(self._report_links) + 1
+        event_metadata_payload = report_context['event_metadata_payload']
+        page_size = settings.SPLIT_EXPORT_PAGE_SIZE
+        page_count = max(1, -(-len(event_metadata_payload) // page_size))
+        page_filenames = [f'report_{report_number}_page_{page_number}.html'
+                          for page_number in range(1, page_count + 1)]
+
+        event_metadata_items = iter(event_metadata_payload.items())
+        for page_number, page_filename in enumerate(page_filenames, start=1):
+            page_event_metadata_payload = dict(islice(event_metadata_items, page_size))
+            raw_data_chunk = self._write_raw_data_chunk(page_filename, page_event_metadata_payload)
+            self._write_template(self.REPORT_PAGE_TEMPLATE_NAME,
+                                 os.path.join(self._files_dir_path, page_filename),
+                                 report={**report_context, 'event_metadata_payload': page_event_metadata_payload},
+                                 raw_data_chunk=raw_data_chunk,
+                                 index_path=f'../{self._index_filename}',
+                                 page_paths=page_filenames,
+                                 page_number=page_number)
+
+        self._report_links.append({'file_path': report_context['file_path'],
+                                   'event_count': report_context['event_count'],
+                                   'filtered': report_context['filtered'],
+                                   'matched_event_count': report_context['matched_event_count'],
+                                   'deduplicated': report_context['deduplicated'],
+                                   'duplicate_event_count': report_context['duplicate_event_count'],
+                                   'events_with_order_issues': report_context['events_with_order_issues'],
+                                   'events_with_errors': report_context['events_with_errors'],
+                                   'page_paths': [f'{self._files_dir_name}/{page_filename}'
+                                                  for page_filename in page_filenames]})
+
+    def _write_raw_data_chunk(self, page_filename: str, page_event_metadata_payload: dict) -> dict:
+        """
+        Writes the sidecar script with gzip-compressed raw payloads of the page's events.
+        :param str page_filename: File name of the page the sidecar belongs to
+        :param dict page_event_metadata_payload: Event id -> EventMetaData dictionary of the page
+        :return dict: Chunk id and the sidecar path relative to the page
+        """
+        chunk_id = os.path.splitext(page_filename)[0]
+        chunk_filename = f'{chunk_id}.raw.js'
+        raw_data = {event_id: str(e_metadata.event_raw_data)
+                    for event_id, e_metadata in page_event_metadata_payload.items()
+                    if e_metadata.event_raw_data is not None}
+        encoded_chunk = base64.b64encode(gzip.compress(json.dumps(raw_data).encode('utf-8'))).decode('ascii')
+        with open(os.path.join(self._files_dir_path, chunk_filename), 'w', encoding='utf-8') as f:
+            f.write(f"registerRawDataChunk('{chunk_id}', '{encoded_chunk}');\n")
+        return {'id': chunk_id, 'path': chunk_filename}
+
+    def export(self, context: dict) -> None:
+        """
+        Writes the index page with specified global context and the links to the report pages.
+        :param dict context: ReportPrinter object's context dictionary
+        :return None
+        """
+        self._write_template(self.PAGE_TEMPLATE_NAME,
+                             self.dest_path,
+                             context,
+                             report_links=self._report_links)
+
+
+class FragmentHtmlExporter(HtmlExporter):
+    """
+    Object that renders reports into an HTML export file, keeping the fragment of every report
+    keyed by the report's file path.
+    A report can be replaced or removed at any time, the export then only renders the changed report
+    and concatenates the fragments in the natural file path order.
+    """
+
+    def __init__(self,
+                 dest_path: str,
+                 templates_dir_path: str = settings.DEFAULT_TEMPLATES_DIR_PATH,
+                 fragment_cache: Union[FragmentCache, None] = None,
+                 workers: int = 1) -> None:
+        super().__init__(dest_path, templates_dir_path, fragment_cache=fragment_cache, workers=workers)
+        self._fragment_paths = {}
+
+    def add_report(self, report_context: dict) -> None:
+        """
+        Renders specified report context into its fragment file, replacing the previous one of the same file path.
+        :param dict report_context: Report object's context dictionary
+        :return None
+        """
+        file_path = report_context['file_path']
+        previous_fragment_path = self._fragment_paths.get(file_path)
+        self._fragment_paths[file_path] = self._render_report(report_context)
+        if previous_fragment_path and previous_fragment_path != self._fragment_paths[file_path]:
+            self._discard_fragment(previous_fragment_path)
+
+    def remove_report(self, file_path: str) -> None:
+        """
+        Removes the report of specified file path from the export.
+        :param str file_path: Report's file path
+        :return None
+        """
+        fragment_path = self._fragment_paths.pop(file_path, None)
+        if fragment_path:
+            self._discard_fragment(fragment_path)
+
+    def _iter_fragment_paths(self) -> Iterator[str]:
+        import natsort
+        return (self._fragment_paths[file_path] for file_path in natsort.natsorted(self._fragment_paths))
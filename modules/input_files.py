@@ -0,0 +1,162 @@
+import gzip
+import io
+import mmap
+from typing import BinaryIO, Union
+
+try:
+    import zstandard
+except ImportError:
+    # Optional dependency, .zst files are not read without it
+    zstandard = None
+
+# Suffixes of the compressed input files
+GZIP_SUFFIX = '.gz'
+ZSTD_SUFFIX = '.zst'
+# Suffixes of the (uncompressed) input files by their format
+JSON_SUFFIXES = ('.json',)
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+
+# Reason a .zst file is skipped for when the optional zstandard package is not installed
+ZSTD_MISSING_MESSAGE = 'reading .zst files requires the zstandard package, install it with "pip install zstandard"'
+# Exceptions raised when a compressed file is corrupted or truncated, besides the JSON decoding errors
+DECOMPRESSION_ERRORS = (OSError, EOFError) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+class UnsupportedInputFileError(Exception):
+    """
+    Exception that is raised when an input file can't be opened because of its format.
+    """
+
+
+class _MappedInputFile:
+    """
+    Memory-mapped uncompressed input file that is read sequentially like a file object.
+    Pages that were read are released from the process right away (they stay in the page cache),
+    so that reading a big file doesn't grow the resident memory of the process.
+    """
+
+    def __init__(self, mapped_file: mmap.mmap) -> None:
+        self._mapped_file = mapped_file
+        self._released_end = 0
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapped_file.madvise(mmap.MADV_SEQUENTIAL)
+
+    def __enter__(self) -> '_MappedInputFile':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Reads up to specified amount of bytes from the current position.
+        :param int size: Amount of bytes, the rest of the file if negative
+        :return bytes: Read bytes, empty at the end of the file
+        """
+        data = self._mapped_file.read(size)
+        self._release_read_pages()
+        return data
+
+    def read_text(self) -> str:
+        """
+        Decodes the whole file as UTF-8 straight from the mapped pages, without a copy of the bytes.
+        :return str: File text
+        """
+        text = str(self._mapped_file, 'utf-8')
+        self._mapped_file.seek(0, 2)
+        self._release_read_pages()
+        return text
+
+    def _release_read_pages(self) -> None:
+        """
+        Releases the pages before the current position from the process.
+        :return None
+        """
+        release_end = self._mapped_file.tell() // mmap.PAGESIZE * mmap.PAGESIZE
+        if release_end > self._released_end and hasattr(mmap, 'MADV_DONTNEED'):
+            self._mapped_file.madvise(mmap.MADV_DONTNEED, self._released_end, release_end - self._released_end)
+            self._released_end = release_end
+
+    def close(self) -> None:
+        self._mapped_file.close()
+
+
+def _strip_compression_suffix(file_path: str) -> str:
+    for suffix in (GZIP_SUFFIX, ZSTD_SUFFIX):
+        if file_path.endswith(suffix):
+            return file_path[:-len(suffix)]
+    return file_path
+
+
+def is_supported_input_file(file_path: str) -> bool:
+    """
+    Checks whether specified file is a (possibly compressed) JSON or newline-delimited JSON file.
+    :param str file_path: Input file path
+    :return bool: True if the file can be read
+    """
+    return _strip_compression_suffix(file_path).endswith(JSON_SUFFIXES + NDJSON_SUFFIXES)
+
+
+def get_unsupported_input_reason(file_path: str) -> Union[str, None]:
+    """
+    Returns why specified file can't be read as an input file.
+    :param str file_path: Input file path
+    :return Union[str, None]: Reason, None if the file can be read
+    """
+    if file_path.endswith(ZSTD_SUFFIX) and zstandard is None:
+        return ZSTD_MISSING_MESSAGE
+    if not is_supported_input_file(file_path):
+        return 'non-JSON file'
+    return None
+
+
+def is_ndjson_file(file_path: str) -> bool:
+    """
+    Checks whether specified file holds one JSON event per line instead of a single history object.
+    :param str file_path: Input file path
+    :return bool: True for a (possibly compressed) newline-delimited JSON file
+    """
+    return _strip_compression_suffix(file_path).endswith(NDJSON_SUFFIXES)
+
+
+def is_compressed_file(file_path: str) -> bool:
+    return _strip_compression_suffix(file_path) != file_path
+
+
+def open_input_file(file_path: str) -> Union[BinaryIO, _MappedInputFile]:
+    """
+    Opens specified input file for binary reading.
+    Compressed files are decompressed on the fly as they're read, chunk by chunk,
+    uncompressed ones are memory-mapped, so that reading them doesn't copy through a file buffer.
+    :param str file_path: Input file path
+    :return Union[BinaryIO, _MappedInputFile]: Readable binary file object
+    """
+    if file_path.endswith(GZIP_SUFFIX):
+        return gzip.open(file_path, 'rb')
+    if file_path.endswith(ZSTD_SUFFIX):
+        if zstandard is None:
+            raise UnsupportedInputFileError(ZSTD_MISSING_MESSAGE)
+        # Files written by several zstd runs (e.g. appended to by a log shipper) consist of several frames
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'),
+                                                          read_across_frames=True,
+                                                          closefd=True)
+    with open(file_path, 'rb') as f:
+        try:
+            return _MappedInputFile(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except ValueError:
+            # Empty files can't be mapped
+            return open(file_path, 'rb')
+
+
+def read_input_file_text(file_path: str) -> str:
+    """
+    Reads the whole (decompressed) text of specified input file,
+    decoding it on the fly so that the bytes are never held next to the text.
+    :param str file_path: Input file path
+    :return str: File text
+    """
+    with open_input_file(file_path) as f:
+        if isinstance(f, _MappedInputFile):
+            return f.read_text()
+        with io.TextIOWrapper(f, encoding='utf-8', newline='') as text_file:
+            return text_file.read()
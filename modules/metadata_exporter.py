@@ -0,0 +1,221 @@
+from collections.abc import Sequence
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from typing import Iterator
+
+from modules.metadata_store import EventMetaDataStore
+from modules.raw_data import RawEventData
+from modules.report import Report
+
+# Bumped whenever the layout of the metadata files changes, so that older files are not misread
+METADATA_FORMAT_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE metadata_format (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE reports (report_id INTEGER PRIMARY KEY,
+                      file_path TEXT NOT NULL,
+                      context TEXT NOT NULL,
+                      ids_order INTEGER,
+                      has_raw_data INTEGER NOT NULL);
+CREATE TABLE report_columns (report_id INTEGER NOT NULL,
+                             name TEXT NOT NULL,
+                             data BLOB NOT NULL,
+                             PRIMARY KEY (report_id, name));
+CREATE TABLE raw_event_data (report_id INTEGER NOT NULL,
+                             row INTEGER NOT NULL,
+                             payload TEXT,
+                             PRIMARY KEY (report_id, row)) WITHOUT ROWID;
+"""
+
+
+class MetaDataFormatError(Exception):
+    """
+    Exception that is raised when a file is not a (readable) event metadata file.
+    """
+
+
+class ExportedRawEventData(RawEventData):
+    """
+    Reference to a raw event payload stored in an event metadata file, which is only queried when it's read.
+    """
+    __slots__ = ('_connection', '_report_id', '_row')
+
+    def __init__(self, connection: sqlite3.Connection, report_id: int, row: int) -> None:
+        self._connection = connection
+        self._report_id = report_id
+        self._row = row
+
+    def read(self) -> str:
+        """
+        Returns the raw payload text queried from the metadata file.
+        :return str: Raw event payload text
+        """
+        result = self._connection.execute('SELECT payload FROM raw_event_data WHERE report_id = ? AND row = ?',
+                                          (self._report_id, self._row)).fetchone()
+        return result[0] if result and result[0] is not None else ''
+
+
+class _ExportedRawDataColumn(Sequence):
+    """
+    Read-only raw data column of an imported EventMetaDataStore,
+    which makes the payload references on access instead of holding one per row.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, report_id: int, length: int) -> None:
+        self._connection = connection
+        self._report_id = report_id
+        self._length = length
+
+    def __getitem__(self, row: int) -> ExportedRawEventData:
+        if not 0 <= row < self._length:
+            raise IndexError(row)
+        return ExportedRawEventData(self._connection, self._report_id, row)
+
+    def __len__(self) -> int:
+        return self._length
+
+
+class MetaDataExporter:
+    """
+    Object that writes the cleaned event metadata and the counters of every report into an SQLite file.
+    Every report is a row of 'reports' (its context without the events, as JSON) plus the columns of its
+    EventMetaDataStore in 'report_columns', each one a single blob of a typed array in the native byte order
+    (dictionary-encoded strings as codes plus a JSON list of the values), so the file is loaded back
+    without parsing a row at a time. Raw payloads are optionally written into 'raw_event_data', row by row.
+    The file is written next to the destination and only moved over it once it's complete,
+    so a failed run keeps the previous export. An existing file that is not an event metadata file
+    is never overwritten.
+    """
+
+    def __init__(self, dest_path: str, include_raw_data: bool = False) -> None:
+        self.dest_path = dest_path
+        self.include_raw_data = include_raw_data
+        if os.path.exists(dest_path) and not is_metadata_file(dest_path):
+            raise MetaDataFormatError(f"'{dest_path}' exists and is not an event metadata file, "
+                                      f"it's not overwritten.")
+        dest_dir_path, dest_filename = os.path.split(os.path.abspath(dest_path))
+        tmp_fd, self._tmp_path = tempfile.mkstemp(suffix='.tmp', prefix=f'{dest_filename}.', dir=dest_dir_path)
+        os.close(tmp_fd)
+        self._connection = sqlite3.connect(self._tmp_path)
+        self._connection.executescript(_SCHEMA)
+        self._connection.executemany('INSERT INTO metadata_format VALUES (?, ?)',
+                                     (('version', str(METADATA_FORMAT_VERSION)),
+                                      ('byte_order', sys.byteorder)))
+
+    def add_report(self, report_context: dict) -> None:
+        """
+        Writes specified report context.
+        :param dict report_context: Report object's context dictionary
+        :return None
+        """
+        event_metadata_payload = report_context['event_metadata_payload']
+        if not isinstance(event_metadata_payload, EventMetaDataStore):
+            store = EventMetaDataStore()
+            for event_id, event_metadata in event_metadata_payload.items():
+                store[event_id] = event_metadata
+            event_metadata_payload = store
+        has_raw_data = self.include_raw_data and event_metadata_payload.raw_data is not None
+        context = {key: value for key, value in report_context.items()
+                   if key not in ('event_metadata_payload', 'file_path')}
+        cursor = self._connection.execute('INSERT INTO reports (file_path, context, ids_order, has_raw_data) '
+                                          'VALUES (?, ?, ?, ?)',
+                                          (report_context['file_path'],
+                                           json.dumps(context),
+                                           event_metadata_payload.get_ids_order(),
+                                           has_raw_data))
+        report_id = cursor.lastrowid
+        self._connection.executemany('INSERT INTO report_columns VALUES (?, ?, ?)',
+                                     ((report_id, column_name, column_buffer) for column_name, column_buffer
+                                      in event_metadata_payload.get_column_buffers().items()))
+        if has_raw_data:
+            self._connection.executemany('INSERT INTO raw_event_data VALUES (?, ?, ?)',
+                                         ((report_id, row, raw_data.read() if raw_data is not None else None)
+                                          for row, raw_data in enumerate(event_metadata_payload.raw_data)))
+
+    def close(self) -> None:
+        """
+        Commits the written reports, closes the file and moves it over the destination.
+        :return None
+        """
+        try:
+            self._connection.commit()
+            self._connection.close()
+            os.replace(self._tmp_path, self.dest_path)
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self) -> None:
+        """
+        Closes and deletes the partially written file, the destination is left as it was.
+        :return None
+        """
+        self._connection.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def is_metadata_file(file_path: str) -> bool:
+    """
+    Checks whether specified file is an event metadata file (of any format version).
+    :param str file_path: File path
+    :return bool: True if the file has the metadata format table
+    """
+    try:
+        connection = sqlite3.connect(f'file:{file_path}?mode=ro', uri=True)
+    except sqlite3.Error:
+        return False
+    try:
+        connection.execute('SELECT key, value FROM metadata_format').fetchall()
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+class MetaDataReader:
+    """
+    Object that loads the reports written by MetaDataExporter, the event metadata columns are taken over as they are.
+    Raw payloads stay in the file and are queried when they're read, so the file is kept open until closed.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        if not os.path.isfile(file_path):
+            raise MetaDataFormatError(f"'{file_path}' not found.")
+        self._connection = sqlite3.connect(f'file:{file_path}?mode=ro', uri=True)
+        try:
+            metadata_format = dict(self._connection.execute('SELECT key, value FROM metadata_format'))
+        except sqlite3.DatabaseError:
+            self._connection.close()
+            raise MetaDataFormatError(f"'{file_path}' is not an event metadata file.")
+        if metadata_format.get('version') != str(METADATA_FORMAT_VERSION):
+            self._connection.close()
+            raise MetaDataFormatError(f"'{file_path}' was written in an unsupported format "
+                                      f"(version {metadata_format.get('version')}).")
+        self._byte_order = metadata_format['byte_order']
+
+    def iter_reports(self) -> Iterator[tuple[str, Report]]:
+        """
+        Yields the stored reports in the order they were written.
+        :return Iterator[tuple[str, Report]]: (source file path, Report object)
+        """
+        reports = self._connection.execute('SELECT report_id, file_path, context, ids_order, has_raw_data '
+                                           'FROM reports ORDER BY report_id').fetchall()
+        for report_id, file_path, context_json, ids_order, has_raw_data in reports:
+            column_buffers = dict(self._connection.execute('SELECT name, data FROM report_columns WHERE report_id = ?',
+                                                           (report_id,)))
+            store = EventMetaDataStore.from_column_buffers(column_buffers, ids_order, self._byte_order)
+            if has_raw_data:
+                store.raw_data = _ExportedRawDataColumn(self._connection, report_id, len(store))
+            context = json.loads(context_json)
+            context['file_path'] = file_path
+            context['event_metadata_payload'] = store
+            yield file_path, Report.from_context(context)
+
+    def close(self) -> None:
+        self._connection.close()
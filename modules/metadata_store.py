@@ -0,0 +1,412 @@
+from array import array
+from collections.abc import Mapping
+import json
+import sys
+from typing import Any, Iterator, Union
+
+from modules.raw_data import RawEventData
+
+# Packed value of an event time column cell that holds no (valid) timestamp
+_NO_EVENT_TIME = -1
+# Typed array columns and dictionary-encoded columns of EventMetaDataStore
+_ARRAY_COLUMN_NAMES = ('ids', 'event_times', 'order_issues_counts', 'errors_exist')
+_ENCODED_COLUMN_NAMES = ('event_types', 'usernames', 'serial_numbers', 'status_displays')
+
+
+class DictionaryEncodedColumn:
+    """
+    Column of repetitive string values, which are stored once
+    and referred to by integer codes from each row.
+    Unhashable values (lists and dictionaries of the source JSON) are looked up by their JSON encoding.
+    """
+
+    def __init__(self) -> None:
+        self.codes = array('I')
+        self.values = []
+        self._codes_by_value = {}
+
+    def _encode(self, value: str) -> int:
+        """
+        Returns the code of passed value, adds the value to the dictionary if it's not there yet.
+        :param str value: Column value
+        :return int: Value code
+        """
+        value_key = value
+        try:
+            code = self._codes_by_value.get(value)
+        except TypeError:
+            value_key = _get_value_key(value)
+            code = self._codes_by_value.get(value_key)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._codes_by_value[value_key] = code
+        return code
+
+    def append(self, value: str) -> None:
+        self.codes.append(self._encode(value))
+
+    def set(self, row: int, value: str) -> None:
+        self.codes[row] = self._encode(value)
+
+    def get(self, row: int) -> str:
+        return self.values[self.codes[row]]
+
+    @classmethod
+    def from_buffers(cls,
+                     codes_buffer: bytes,
+                     values_buffer: bytes,
+                     swap_bytes: bool = False) -> 'DictionaryEncodedColumn':
+        """
+        Creates a column out of the buffers made by get_buffers().
+        :param bytes codes_buffer: Row codes
+        :param bytes values_buffer: JSON-encoded values
+        :param bool swap_bytes: Whether the codes were written with the other byte order
+        :return DictionaryEncodedColumn: Column
+        """
+        column = cls()
+        column.codes.frombytes(codes_buffer)
+        if swap_bytes:
+            column.codes.byteswap()
+        column.values = json.loads(values_buffer)
+        column._codes_by_value = {_get_value_key(value): code for code, value in enumerate(column.values)}
+        return column
+
+    def get_buffers(self) -> tuple[bytes, bytes]:
+        """
+        Returns the row codes and the JSON-encoded values.
+        :return tuple[bytes, bytes]: Codes buffer, values buffer
+        """
+        return self.codes.tobytes(), json.dumps(self.values).encode('utf-8')
+
+
+class EventMetaDataRow:
+    """
+    Attribute-style view of a single EventMetaDataStore row,
+    which can be used in place of an EventMetaData object.
+    """
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store: 'EventMetaDataStore', row: int) -> None:
+        self._store = store
+        self._row = row
+
+    @property
+    def event_type(self) -> str:
+        return self._store.event_types.get(self._row)
+
+    @property
+    def event_time(self) -> str:
+        return _unpack_event_time(self._store.event_times[self._row])
+
+    @property
+    def username(self) -> str:
+        return self._store.usernames.get(self._row)
+
+    @property
+    def serial_number(self) -> str:
+        return self._store.serial_numbers.get(self._row)
+
+    @property
+    def status_display(self) -> str:
+        return self._store.status_displays.get(self._row)
+
+    @property
+    def order_issues_count(self) -> int:
+        return self._store.order_issues_counts[self._row]
+
+    @property
+    def errors_exist(self) -> bool:
+        return bool(self._store.errors_exist[self._row])
+
+    @property
+    def event_raw_data(self) -> Union[RawEventData, None]:
+        raw_data = self._store.raw_data
+        return raw_data[self._row] if raw_data is not None else None
+
+    def __repr__(self) -> str:
+        return (f'EventMetaDataRow(event_type={self.event_type!r}, event_time={self.event_time!r}, '
+                f'username={self.username!r}, serial_number={self.serial_number!r}, '
+                f'status_display={self.status_display!r}, order_issues_count={self.order_issues_count!r}, '
+                f'errors_exist={self.errors_exist!r})')
+
+
+class EventMetaDataStore(Mapping):
+    """
+    Compact columnar storage of EventMetaData objects keyed by event id.
+    Numbers and timestamps are kept in typed arrays, repetitive strings are dictionary-encoded,
+    so that a stored event takes a few dozen bytes instead of a per-instance dataclass.
+    Behaves like the event id -> EventMetaData dictionary it replaces,
+    its values are EventMetaDataRow views with the same attributes.
+    Integer ids are kept in a typed array, the ids column turns into a plain list
+    once an id of another type (e.g. a string or UUID one) is stored.
+    """
+
+    def __init__(self) -> None:
+        self.ids = array('q')
+        self.event_types = DictionaryEncodedColumn()
+        self.event_times = array('q')
+        self.usernames = DictionaryEncodedColumn()
+        self.serial_numbers = DictionaryEncodedColumn()
+        self.status_displays = DictionaryEncodedColumn()
+        self.order_issues_counts = array('I')
+        self.errors_exist = array('B')
+        # Created on the first event that comes with raw data,
+        # may also be a read-only sequence of raw data references (e.g. of an imported store)
+        self.raw_data = None
+        # Ids usually come sorted, so rows are looked up by binary search
+        # and the id -> row index dictionary is only built once the ids stop being monotonic
+        self._ids_order = 0
+        self._rows_by_id = None
+
+    def __setitem__(self, event_id: Any, event_metadata: Any) -> None:
+        """
+        Stores passed EventMetaData object's fields as a row,
+        overwrites the row of the same event id if it's already stored.
+        :param Any event_id: Event id
+        :param Any event_metadata: EventMetaData (or any object with the same attributes)
+        :return None
+        """
+        if type(self.ids) is array and not _is_array_id(event_id):
+            self._store_ids_as_list()
+        row = self._find_row_for_insertion(event_id)
+        if row is None:
+            self._append_row(event_id, event_metadata)
+        else:
+            self._set_row(row, event_metadata)
+
+    def __getitem__(self, event_id: Any) -> EventMetaDataRow:
+        row = self._find_row(event_id)
+        if row is None:
+            raise KeyError(event_id)
+        return EventMetaDataRow(self, row)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def values(self) -> Iterator[EventMetaDataRow]:
+        return (EventMetaDataRow(self, row) for row in range(len(self.ids)))
+
+    def items(self) -> Iterator[tuple[int, EventMetaDataRow]]:
+        return ((event_id, EventMetaDataRow(self, row)) for row, event_id in enumerate(self.ids))
+
+    def get_column_buffers(self) -> dict[str, bytes]:
+        """
+        Returns every column (except the raw data) as bytes, e.g. to be written into a column file.
+        Typed arrays are dumped as they are in the native byte order, so they're loaded back without parsing.
+        :return dict[str, bytes]: Column name -> buffer, dictionary-encoded columns (and a list of ids)
+                                  also have '<name>.values'
+        """
+        column_buffers = {column_name: getattr(self, column_name).tobytes() for column_name in _ARRAY_COLUMN_NAMES
+                          if column_name != 'ids'}
+        if type(self.ids) is array:
+            column_buffers['ids'] = self.ids.tobytes()
+        else:
+            # Ids that are not all integers are JSON-encoded
+            column_buffers['ids'] = b''
+            column_buffers['ids.values'] = json.dumps(self.ids).encode('utf-8')
+        for column_name in _ENCODED_COLUMN_NAMES:
+            codes_buffer, values_buffer = getattr(self, column_name).get_buffers()
+            column_buffers[column_name] = codes_buffer
+            column_buffers[f'{column_name}.values'] = values_buffer
+        return column_buffers
+
+    def get_memory_size(self) -> int:
+        """
+        Returns the approximate amount of memory the store takes, raw data references included
+        (but not the source files they point into).
+        :return int: Size in bytes
+        """
+        size = sum(column.itemsize * len(column) for column in (getattr(self, column_name)
+                                                                 for column_name in _ARRAY_COLUMN_NAMES)
+                   if type(column) is array)
+        if type(self.ids) is not array:
+            size += sys.getsizeof(self.ids) + sum(map(sys.getsizeof, self.ids))
+        for column_name in _ENCODED_COLUMN_NAMES:
+            column = getattr(self, column_name)
+            size += column.codes.itemsize * len(column.codes) + sum(map(sys.getsizeof, column.values))
+        if self.raw_data is not None:
+            size += sys.getsizeof(self.raw_data) + sum(map(sys.getsizeof, self.raw_data))
+        return size
+
+    def get_ids_order(self) -> Union[int, None]:
+        """
+        Returns the order the ids were stored in.
+        :return Union[int, None]: 1 for ascending, -1 for descending, 0 for a single id, None if they're not monotonic
+        """
+        return self._ids_order if self._rows_by_id is None else None
+
+    @classmethod
+    def from_column_buffers(cls,
+                            column_buffers: dict[str, bytes],
+                            ids_order: Union[int, None],
+                            byte_order: str = sys.byteorder) -> 'EventMetaDataStore':
+        """
+        Creates a store out of the column buffers made by get_column_buffers().
+        :param dict[str, bytes] column_buffers: Column name -> buffer
+        :param Union[int, None] ids_order: Order of the ids returned by get_ids_order()
+        :param str byte_order: Byte order the buffers were written with ('little' or 'big')
+        :return EventMetaDataStore: Store
+        """
+        store = cls()
+        swap_bytes = byte_order != sys.byteorder
+        for column_name in _ARRAY_COLUMN_NAMES:
+            column = getattr(store, column_name)
+            column.frombytes(column_buffers[column_name])
+            if swap_bytes:
+                column.byteswap()
+        if 'ids.values' in column_buffers:
+            store.ids = json.loads(column_buffers['ids.values'])
+        for column_name in _ENCODED_COLUMN_NAMES:
+            setattr(store, column_name, DictionaryEncodedColumn.from_buffers(column_buffers[column_name],
+                                                                             column_buffers[f'{column_name}.values'],
+                                                                             swap_bytes))
+        if ids_order is None:
+            store._rows_by_id = {event_id: row for row, event_id in enumerate(store.ids)}
+        else:
+            store._ids_order = ids_order
+        return store
+
+    def _append_row(self, event_id: Any, event_metadata: Any) -> None:
+        """
+        Appends passed EventMetaData object's fields as a new row.
+        :param Any event_id: Event id
+        :param Any event_metadata: EventMetaData (or any object with the same attributes)
+        :return None
+        """
+        if self._rows_by_id is not None:
+            self._rows_by_id[event_id] = len(self.ids)
+        self.ids.append(event_id)
+        self.event_types.append(event_metadata.event_type)
+        self.event_times.append(_pack_event_time(event_metadata.event_time))
+        self.usernames.append(event_metadata.username)
+        self.serial_numbers.append(event_metadata.serial_number)
+        self.status_displays.append(event_metadata.status_display)
+        self.order_issues_counts.append(event_metadata.order_issues_count)
+        self.errors_exist.append(event_metadata.errors_exist)
+        if event_metadata.event_raw_data is not None and self.raw_data is None:
+            self.raw_data = [None] * (len(self.ids) - 1)
+        if self.raw_data is not None:
+            self.raw_data.append(event_metadata.event_raw_data)
+
+    def _set_row(self, row: int, event_metadata: Any) -> None:
+        """
+        Overwrites specified row with passed EventMetaData object's fields.
+        :param int row: Row index
+        :param Any event_metadata: EventMetaData (or any object with the same attributes)
+        :return None
+        """
+        self.event_types.set(row, event_metadata.event_type)
+        self.event_times[row] = _pack_event_time(event_metadata.event_time)
+        self.usernames.set(row, event_metadata.username)
+        self.serial_numbers.set(row, event_metadata.serial_number)
+        self.status_displays.set(row, event_metadata.status_display)
+        self.order_issues_counts[row] = event_metadata.order_issues_count
+        self.errors_exist[row] = event_metadata.errors_exist
+        if event_metadata.event_raw_data is not None and self.raw_data is None:
+            self.raw_data = [None] * len(self.ids)
+        if self.raw_data is not None:
+            self.raw_data[row] = event_metadata.event_raw_data
+
+    def _store_ids_as_list(self) -> None:
+        """
+        Turns the ids column into a list that takes ids of any type,
+        rows are looked up by the id -> row index dictionary from then on, since such ids can't be ordered.
+        :return None
+        """
+        self.ids = list(self.ids)
+        if self._rows_by_id is None:
+            self._rows_by_id = {stored_event_id: row for row, stored_event_id in enumerate(self.ids)}
+
+    def _find_row_for_insertion(self, event_id: Any) -> Union[int, None]:
+        """
+        Returns the row index of an already stored event id, None if it's a new one.
+        Ids that keep the order of the stored ones are new without any lookup.
+        :param Any event_id: Event id
+        :return Union[int, None]: Row index
+        """
+        if self._rows_by_id is None and self.ids:
+            order = (event_id > self.ids[-1]) - (event_id < self.ids[-1])
+            if order and self._ids_order in (0, order):
+                self._ids_order = order
+                return None
+            self._rows_by_id = {stored_event_id: row for row, stored_event_id in enumerate(self.ids)}
+        return self._find_row(event_id)
+
+    def _find_row(self, event_id: Any) -> Union[int, None]:
+        """
+        Returns the row index of specified event id, None if it's not stored.
+        :param Any event_id: Event id
+        :return Union[int, None]: Row index
+        """
+        if self._rows_by_id is not None:
+            return self._rows_by_id.get(event_id)
+        if not _is_array_id(event_id):
+            return None
+        low, high = 0, len(self.ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self.ids[middle] * self._ids_order < event_id * self._ids_order:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.ids) and self.ids[low] == event_id:
+            return low
+        return None
+
+
+def _get_value_key(value: Any) -> Any:
+    """
+    Returns the dictionary key a column value is looked up by: the value itself if it's hashable,
+    otherwise its JSON encoding (tagged, so that it doesn't collide with an equal string value).
+    :param Any value: Column value
+    :return Any: Hashable value key
+    """
+    try:
+        hash(value)
+    except TypeError:
+        return 'json', json.dumps(value, sort_keys=True, default=str)
+    return value
+
+
+def _is_array_id(event_id: Any) -> bool:
+    """
+    Checks whether an event id fits into the typed array of ids.
+    :param Any event_id: Event id
+    :return bool: True for a 64-bit signed integer
+    """
+    return type(event_id) is int and -2 ** 63 <= event_id < 2 ** 63
+
+
+def _pack_event_time(event_time: str) -> int:
+    """
+    Packs formatted event time string ('%d.%m.%Y, %H:%M') into a YYYYMMDDHHMM integer.
+    :param str event_time: Formatted event time string
+    :return int: Packed event time, -1 for an empty string
+    """
+    if not event_time:
+        return _NO_EVENT_TIME
+    year = int(event_time[6:-7])
+    month = int(event_time[3:5])
+    day = int(event_time[0:2])
+    hour = int(event_time[-5:-3])
+    minute = int(event_time[-2:])
+    return (((year * 100 + month) * 100 + day) * 100 + hour) * 100 + minute
+
+
+def _unpack_event_time(packed_event_time: int) -> str:
+    """
+    Unpacks YYYYMMDDHHMM integer into the formatted event time string ('%d.%m.%Y, %H:%M').
+    :param int packed_event_time: Packed event time
+    :return str: Formatted event time string, empty for -1
+    """
+    if packed_event_time == _NO_EVENT_TIME:
+        return ''
+    packed_date, minute = divmod(packed_event_time, 100)
+    packed_date, hour = divmod(packed_date, 100)
+    packed_date, day = divmod(packed_date, 100)
+    year, month = divmod(packed_date, 100)
+    return f'{day:02d}.{month:02d}.{year}, {hour:02d}:{minute:02d}'
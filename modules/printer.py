@@ -1,24 +1,129 @@
-from typing import Union
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, TextIO, Union
 
-from jinja2 import Environment, FileSystemLoader
-from jinja2.exceptions import TemplateError
-from pathlib import Path
-from rich.console import Console
+from rich.console import Console, ConsoleOptions
+from rich.segment import Segment
+from rich.style import Style
 
+from collections import deque
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 import glob
+import importlib
+from itertools import repeat
 import json
-import natsort
+import os
 
 from conf import settings
+from modules.aggregation import add_aggregates, get_breakdown
+from modules.event_filter import EventFilter
+from modules.event_id_index import EventIdIndex
+from modules.input_files import (DECOMPRESSION_ERRORS, UnsupportedInputFileError, get_unsupported_input_reason,
+                                 is_ndjson_file, read_input_file_text)
+from modules.profiler import NullProfiler, PhaseClock
+from modules.raw_data import close_mapped_file, close_mapped_files
 from modules.report import Report
+from modules.report_cache import ReportCache
+from modules.stream_reader import EventStreamReader
+from modules.timeline import TimelineCollector
+
+# Modules that only some runs need (jinja2 for the HTML export, sqlite3 for the metadata files, natsort for sorting
+# several files, multiprocessing for the workers, asyncio for the history API) are imported where they're used,
+# so that a small run doesn't pay for their import
+if TYPE_CHECKING:
+    from jinja2.exceptions import TemplateError
+    from modules.fetcher import HistoryPageFetcher
+    from modules.html_exporter import BaseHtmlExporter
+    from concurrent.futures import ProcessPoolExecutor
+    from modules.metadata_exporter import MetaDataReader
+
+
+def _load_console_theme_class() -> type:
+    """
+    Imports the console theme class specified in the settings by its dotted path.
+    :return type: Theme class
+    """
+    module_name, class_name = settings.DEFAULT_CONSOLE_THEME.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
 
 # rich console theme
-_theme = settings.DEFAULT_CONSOLE_THEME()
+_theme = _load_console_theme_class()()
 # rich console
 _console = Console(theme=_theme, width=settings.DEFAULT_CONSOLE_WIDTH)
 # rich console print name replacement
 _print = _console.print
+# rich console styles of the event types
+_EVENT_TYPE_STYLES = {'CREATION': _theme.TYPE_CREATED,
+                      'UPDATE': _theme.TYPE_UPDATED,
+                      'TRANSITION': _theme.TYPE_TRANSITION}
+# Phases of the run in the order they're listed in the profile
+_PROFILE_PHASES = ('discovery', 'cache', 'wait', 'decode', 'build', 'print', 'export')
+# Line that separates events in the event list
+_EVENT_RULE = f"{'─' * settings.DEFAULT_CONSOLE_WIDTH}\n"
+
+
+@contextmanager
+def redirect_console(file: TextIO) -> Iterator[None]:
+    """
+    Writes everything printed to the console into specified file instead.
+    :param TextIO file: Text file (e.g. io.StringIO)
+    :return Iterator[None]: Context manager
+    """
+    console_file = _console.file
+    _console.file = file
+    try:
+        yield
+    finally:
+        _console.file = console_file
+
+
+def print_message(message: str, style_name: str) -> None:
+    """
+    Prints a message to the console in a style of the console theme.
+    :param str message: Message text
+    :param str style_name: Name of the theme style (e.g. 'OK', 'WARNING')
+    :return None
+    """
+    _print(message, style=getattr(_theme, style_name))
+
+
+class _EventListRenderable:
+    """
+    rich renderable of a report's event list, which yields the styled segments of every event
+    directly instead of going through a print call (and text wrapping) per field.
+    """
+
+    def __init__(self, event_metadata_list: Iterable, get_event_metadata_fields: Callable) -> None:
+        self._event_metadata_list = event_metadata_list
+        self._get_event_metadata_fields = get_event_metadata_fields
+
+    def __rich_console__(self, console: Console, options: ConsoleOptions) -> Iterator[Segment]:
+        styles = {}
+
+        def get_style(style_name: str) -> Style:
+            style = styles.get(style_name)
+            if style is None:
+                style = styles[style_name] = console.get_style(style_name) if style_name else Style.null()
+            return style
+
+        rule_segment = Segment(_EVENT_RULE)
+        field_title_style = get_style(_theme.EVENT_FIELD)
+        line_segment = Segment.line()
+        for e_metadata in self._event_metadata_list:
+            yield rule_segment
+            yield Segment(e_metadata.event_type.center(console.width),
+                          get_style(_EVENT_TYPE_STYLES.get(e_metadata.event_type, '')))
+            yield line_segment
+            for field_title, field_value, value_style in self._get_event_metadata_fields(e_metadata):
+                yield Segment(field_title, field_title_style)
+                yield Segment(field_value, get_style(value_style))
+                yield line_segment
+
+
+class UnparsedFileError(Exception):
+    """
+    Exception that is raised when an input file could not be read or decoded.
+    """
 
 
 class ReportPrinter:
@@ -29,19 +134,129 @@ class ReportPrinter:
     def __init__(self,
                  file_path_patterns: str,
                  do_export: bool,
-                 export_dest_path: str) -> None:
-        self._file_paths = self._get_sorted_abs_path_list_from_pattern_list(file_path_patterns)
-        self._check_file_count()
+                 export_dest_path: str,
+                 stream: bool = False,
+                 workers: int = 1,
+                 compact: bool = False,
+                 use_cache: bool = True,
+                 split_export: bool = False,
+                 summary_only: bool = False,
+                 page_fetcher: Union['HistoryPageFetcher', None] = None,
+                 profiler: Union[NullProfiler, None] = None,
+                 event_filter: Union[EventFilter, None] = None,
+                 aggregate: bool = False,
+                 deduplicate: bool = False,
+                 metadata_reader: Union['MetaDataReader', None] = None,
+                 metadata_dest_path: Union[str, None] = None,
+                 export_raw_data: bool = False,
+                 timeline: bool = False,
+                 memory_budget: int = settings.READ_AHEAD_MEMORY_BUDGET) -> None:
+        self._profiler = profiler or NullProfiler()
+        self._profiler.start()
+        self._page_fetcher = page_fetcher
+        self._metadata_reader = metadata_reader
+        if page_fetcher or metadata_reader:
+            # Reports are built from the fetched history pages (or loaded from a metadata file)
+            # instead of the input files
+            self._file_paths = []
+        else:
+            with self._profiler.phase('discovery'):
+                self._file_paths = self._get_sorted_abs_path_list_from_pattern_list(file_path_patterns)
+            self._check_file_count()
         self.do_export = do_export
+        self.stream = stream
+        self.summary_only = summary_only
+        self._event_filter = event_filter or None
+        # Timelines show the changes of the events instead of their raw payloads
+        self._report_options = {'keep_raw_data': (do_export and not timeline) or bool(metadata_dest_path
+                                                                                      and export_raw_data),
+                                'compact': compact,
+                                'event_filter': self._event_filter,
+                                'aggregate': aggregate}
+        self._timeline_collector = TimelineCollector() if timeline else None
+        if deduplicate:
+            self._report_options['event_id_index'] = EventIdIndex()
+        if timeline:
+            self._report_options['timeline_collector'] = self._timeline_collector
+        if deduplicate or timeline:
+            # Which events of a file are duplicates (and which snapshots they're diffed against) depends on
+            # the files read before it, so the files are read one after another into the shared index
+            # and timelines, and their reports are not cached
+            workers = 1
+            use_cache = False
+        self.workers = workers
+        self.memory_budget = memory_budget
+        self._cache = ReportCache(self._get_cache_variant()) if use_cache else None
         self.export_dest_path = self._get_abs_path_str(export_dest_path)
+        self._clean_export_path()
+        self._exporter = self._create_exporter(split_export) if do_export else None
+        self._export_error = None
+        self.metadata_dest_path = metadata_dest_path
+        self._metadata_exporter = None
+        self._metadata_export_error = None
+        if metadata_dest_path:
+            import sqlite3
+            from modules.metadata_exporter import MetaDataExporter, MetaDataFormatError
+            try:
+                self._metadata_exporter = MetaDataExporter(metadata_dest_path, include_raw_data=export_raw_data)
+            except (sqlite3.Error, OSError, MetaDataFormatError) as ex:
+                self._metadata_export_error = ex
         self._context = {'template_filename': self.export_dest_path,
                          'created_at': datetime.now().strftime('%d.%m.%Y, %H:%M'),
-                         'reports': [],
+                         'report_count': 0,
+                         'event_filter': str(self._event_filter or ''),
                          'event_count': 0,
+                         'matched_event_count': 0,
+                         'deduplicated': deduplicate,
+                         'duplicate_event_count': 0,
                          'events_with_errors': 0,
                          'events_with_order_issues': 0,
                          'file_count': len(self._file_paths),
-                         'unparsed_file_paths': []}
+                         'unparsed_file_paths': [],
+                         # Group-by aggregates summed up from the reports, None if they're not collected
+                         'aggregates': {} if aggregate else None,
+                         'breakdown': None,
+                         'timelines': None}
+
+    def _create_exporter(self, split_export: bool) -> 'BaseHtmlExporter':
+        """
+        Creates the HTML exporter the reports are added to.
+        :param bool split_export: Whether the export should be split into a page per report
+        :return BaseHtmlExporter: HTML exporter
+        """
+        from modules.html_exporter import HtmlExporter, SplitHtmlExporter
+        if split_export:
+            return SplitHtmlExporter(self.export_dest_path)
+        return HtmlExporter(self.export_dest_path, **self._get_fragment_options())
+
+    def _get_fragment_options(self) -> dict:
+        """
+        Returns the options of an exporter that renders reports into fragments:
+        the fragments are cached along with the reports, and rendered by as many workers as the reports are read by.
+        Raw payloads of imported reports are read from the open metadata file, so those are rendered in place.
+        If the fragment cache directory can't be used, fragments are rendered into a temporary one as without the cache.
+        :return dict: Exporter keyword arguments
+        """
+        from modules.fragment_cache import FragmentCache
+        fragment_cache = None
+        if self._cache is not None:
+            try:
+                fragment_cache = FragmentCache()
+            except OSError:
+                pass
+        return {'fragment_cache': fragment_cache,
+                'workers': 1 if self._metadata_reader else self.workers}
+
+    def _get_cache_variant(self) -> str:
+        """
+        Returns the string that identifies the options reports are built with,
+        so that reports built with different options are cached separately.
+        :return str: Cache variant string
+        """
+        return json.dumps({'stream': self.stream,
+                           **self._report_options,
+                           'event_filter': self._event_filter.options if self._event_filter else None},
+                          sort_keys=True)
 
     @staticmethod
     def _get_abs_path_str(file_path: str) -> str:
@@ -50,7 +265,7 @@ class ReportPrinter:
         :param str file_path: Passed file path string
         :return str: Absolute file path string
         """
-        return str(Path(file_path).absolute())
+        return os.path.abspath(file_path)
 
     @classmethod
     def _get_sorted_abs_path_list_from_pattern_list(cls, file_path_patterns: str) -> list[str]:
@@ -64,6 +279,9 @@ class ReportPrinter:
         for pattern in file_path_patterns:
             abs_pattern_matches = [cls._get_abs_path_str(match) for match in (glob.glob(pattern))]
             abs_path_set.update(abs_pattern_matches)
+        if len(abs_path_set) < 2:
+            return list(abs_path_set)
+        import natsort
         sorted_abs_path_list = natsort.natsorted(abs_path_set)
         return sorted_abs_path_list
 
@@ -85,7 +303,14 @@ class ReportPrinter:
         :return None:
         """
         self._generate_and_print_reports()
-        self._print_final_summary()
+        with self._profiler.phase('print'):
+            if self._timeline_collector:
+                self._context['timelines'] = self._timeline_collector.get_timelines()
+                self._print_timelines(self._context['timelines'])
+            self._print_final_summary()
+        if self.metadata_dest_path:
+            with self._profiler.phase('export'):
+                self._write_metadata_export()
 
     def _generate_and_print_reports(self) -> None:
         """
@@ -94,17 +319,170 @@ class ReportPrinter:
         prints report metadata and summary with metrics.
         :return None:
         """
-        for file_path in self._file_paths:
+        if self._page_fetcher:
+            loaded_reports = self._iter_fetched_reports()
+        elif self._metadata_reader:
+            loaded_reports = self._iter_imported_reports()
+        else:
+            loaded_reports = self._iter_loaded_reports()
+        for file_path, report, error_message in loaded_reports:
+            self._add_loaded_report(file_path, report, error_message)
+        if self._cache:
+            self._cache.save()
+
+    def _add_loaded_report(self, file_path: str, report: Union[Report, None], error_message: Union[str, None]) -> None:
+        """
+        Prints loaded Report object (or the reason why it was not loaded),
+        adds it to the global metrics and to the HTML export.
+        :param str file_path: File path (or page URL) the report was loaded from
+        :param Union[Report, None] report: Report object, None if it was not loaded
+        :param Union[str, None] error_message: Reason why the report was not loaded
+        :return None
+        """
+        with self._profiler.phase('print', file_path):
             self._print_report_title(file_path)
-            event_payload_full = self._read_event_json_data(file_path)
-            if event_payload_full and isinstance(event_payload_full, dict):
-                event_payload_full['file_path'] = file_path
-                report = Report(event_payload_full)
-                self._update_context_count_metrics(report)
+        if report:
+            self._update_context_count_metrics(report)
+            with self._profiler.phase('print', file_path):
                 self._print_report(report)
-                self._context['reports'].append(report.context)
-            else:
-                self._add_file_path_to_context_unparsed_list(file_path)
+            self._context['report_count'] += 1
+            self._profiler.add_file(file_path, report.context['event_count'])
+            if self._exporter:
+                with self._profiler.phase('export', file_path):
+                    self._export_report(report)
+            if self._metadata_exporter:
+                with self._profiler.phase('export', file_path):
+                    self._export_report_metadata(report)
+            # Raw data of the report was read by now, the source file doesn't have to stay mapped
+            close_mapped_file(file_path)
+        else:
+            _print(error_message, style=_theme.WARNING)
+            self._add_file_path_to_context_unparsed_list(file_path)
+
+    def _iter_loaded_reports(self) -> Iterator[tuple[str, Union[Report, None], Union[str, None]]]:
+        """
+        Yields Report objects of the files that matched the specified file pattern in the sorted file path order.
+        Reports of unchanged files are loaded from the cache, the rest of the files are read
+        in a process pool if more than one worker was requested.
+        :return Iterator[tuple[str, Union[Report, None], Union[str, None]]]: (file path, Report object
+                                                                              or None, error message or None)
+        """
+        if self._cache:
+            with self._profiler.phase('cache'):
+                cached_file_paths = {file_path for file_path in self._file_paths if self._cache.contains(file_path)}
+        else:
+            cached_file_paths = set()
+        file_paths_to_build = [file_path for file_path in self._file_paths if file_path not in cached_file_paths]
+
+        measure_phases = self._profiler.enabled
+        if self.workers > 1 and len(file_paths_to_build) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+            built_reports = self._iter_reports_built_in_pool(executor, file_paths_to_build, measure_phases)
+        else:
+            executor = None
+            built_reports = map(self.load_report,
+                                file_paths_to_build,
+                                repeat(self.stream),
+                                repeat(self._report_options),
+                                repeat(measure_phases))
+        try:
+            for file_path in self._file_paths:
+                if file_path in cached_file_paths:
+                    with self._profiler.phase('cache', file_path):
+                        report = self._cache.load(file_path)
+                    if report:
+                        yield file_path, report, None
+                        continue
+                    # Cache entry could not be loaded, the file is read right away
+                    report, error_message, phase_times = self.load_report(file_path,
+                                                                          self.stream,
+                                                                          self._report_options,
+                                                                          measure_phases)
+                elif executor:
+                    # Time the main process spends waiting for the workers
+                    with self._profiler.phase('wait'):
+                        report, error_message, phase_times = next(built_reports)
+                else:
+                    report, error_message, phase_times = next(built_reports)
+                self._profiler.add_phase_times(file_path, phase_times)
+                yield file_path, report, error_message
+                # Stored once the report was exported, so that the content digest of its fragment is stored with it
+                if report and self._cache:
+                    with self._profiler.phase('cache', file_path):
+                        self._cache.store(file_path, report)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def _iter_reports_built_in_pool(self,
+                                    executor: 'ProcessPoolExecutor',
+                                    file_paths: list[str],
+                                    measure_phases: bool) -> Iterator[tuple[Union[Report, None], Union[str, None],
+                                                                            Union[dict, None]]]:
+        """
+        Yields the results of load_report() for specified files, built by the worker pool, in the file order.
+        Files are only handed to the workers while the files read ahead of the printed report fit into
+        the memory budget (at least one file is always being read), so that the reports the workers build
+        faster than they're printed and exported don't pile up in memory.
+        The budget is checked against the input file sizes, the reports themselves usually take a fraction of that.
+        :param ProcessPoolExecutor executor: Worker pool
+        :param list[str] file_paths: File paths
+        :param bool measure_phases: Whether the time of decoding and building should be measured
+        :return Iterator[tuple[Union[Report, None], Union[str, None], Union[dict, None]]]: Report objects
+                                                                                           or the reasons why
+                                                                                           they were not built,
+                                                                                           phase times if measured
+        """
+        file_sizes = [os.path.getsize(file_path) if os.path.isfile(file_path) else 0 for file_path in file_paths]
+        pending_results = deque()
+        pending_size = 0
+        submitted_count = 0
+        for file_size in file_sizes:
+            while submitted_count < len(file_paths) and (not pending_results or pending_size
+                                                         + file_sizes[submitted_count] <= self.memory_budget):
+                pending_results.append(executor.submit(self.load_report,
+                                                       file_paths[submitted_count],
+                                                       self.stream,
+                                                       self._report_options,
+                                                       measure_phases))
+                pending_size += file_sizes[submitted_count]
+                submitted_count += 1
+            result = pending_results[0].result()
+            pending_results.popleft()
+            pending_size -= file_size
+            yield result
+
+    def _iter_fetched_reports(self) -> Iterator[tuple[str, Union[Report, None], Union[str, None]]]:
+        """
+        Yields Report objects built from the history API pages as soon as they're fetched, in the page order.
+        Every page counts as a read file.
+        :return Iterator[tuple[str, Union[Report, None], Union[str, None]]]: (page URL, Report object
+                                                                              or None, error message or None)
+        """
+        for page_url, page, error_message in self._page_fetcher.iter_pages():
+            self._context['file_count'] += 1
+            if page is None:
+                yield page_url, None, error_message
+                continue
+            page['file_path'] = page_url
+            with self._profiler.phase('build', page_url):
+                report = Report(page, **self._report_options)
+            yield page_url, report, None
+
+    def _iter_imported_reports(self) -> Iterator[tuple[str, Union[Report, None], Union[str, None]]]:
+        """
+        Yields Report objects loaded from the event metadata file, nothing is decoded or cleaned.
+        Every report counts as a read file.
+        :return Iterator[tuple[str, Union[Report, None], Union[str, None]]]: (source file path, Report object,
+                                                                              None)
+        """
+        try:
+            for file_path, report in self._metadata_reader.iter_reports():
+                self._context['file_count'] += 1
+                yield file_path, report, None
+        finally:
+            self._metadata_reader.close()
 
     @staticmethod
     def _print_report_title(file_path):
@@ -119,24 +497,119 @@ class ReportPrinter:
                           style=_theme.REPORT_HEADER)
         _print('\n')
 
+    @classmethod
+    def load_report(cls,
+                    file_path: str,
+                    stream: bool,
+                    report_options: dict,
+                    measure_phases: bool = False) -> tuple[Union[Report, None], Union[str, None], Union[dict, None]]:
+        """
+        Builds a Report object from specified file path.
+        Doesn't print anything, so that it can be run in a worker process.
+        :param str file_path: Passed file path for reading
+        :param bool stream: Whether the file should be decoded incrementally
+        :param dict report_options: Keyword arguments for the Report object
+        :param bool measure_phases: Whether the time of decoding and building should be measured
+        :return tuple[Union[Report, None], Union[str, None], Union[dict, None]]: Report object or the reason
+                                                                                  why it was not built,
+                                                                                  phase times if measured
+        """
+        clock = PhaseClock() if measure_phases else None
+        try:
+            if stream:
+                report = cls._build_report_from_stream(file_path, report_options, clock)
+            else:
+                report = cls._build_report(file_path, report_options, clock)
+            return report, None, clock and clock.times
+        except UnparsedFileError as ex:
+            return None, str(ex), clock and clock.times
+
+    @classmethod
+    def _build_report(cls, file_path: str, report_options: dict, clock: Union[PhaseClock, None] = None) -> Report:
+        """
+        Builds a Report object from the fully decoded specified file.
+        :param str file_path: Passed file path for reading
+        :param dict report_options: Keyword arguments for the Report object
+        :param Union[PhaseClock, None] clock: Clock that measures the decoding and building time
+        :return Report: Report object
+        """
+        with clock.measure('decode') if clock else nullcontext():
+            event_payload_full = cls._read_event_json_data(file_path)
+        if not event_payload_full or not isinstance(event_payload_full, dict):
+            raise UnparsedFileError(f"Skipping '{file_path}' (wrongly formulated).")
+        event_payload_full['file_path'] = file_path
+        with clock.measure('build') if clock else nullcontext():
+            return Report(event_payload_full, **report_options)
+
+    @staticmethod
+    def _build_report_from_stream(file_path: str,
+                                  report_options: dict,
+                                  clock: Union[PhaseClock, None] = None) -> Report:
+        """
+        Builds a Report object while incrementally decoding (and decompressing) specified file,
+        so that only one raw event is held in memory at a time.
+        Raw event payloads are kept as byte spans of the source file if it's not compressed.
+        :param str file_path: Passed file path for reading
+        :param dict report_options: Keyword arguments for the Report object
+        :param Union[PhaseClock, None] clock: Clock that measures the decoding and building time
+        :return Report: Report object
+        """
+        unsupported_reason = get_unsupported_input_reason(file_path)
+        if unsupported_reason:
+            raise UnparsedFileError(f"Skipping '{file_path}' ({unsupported_reason}).")
+        try:
+            event_payload_stream = EventStreamReader(file_path).read(raw_data=report_options['keep_raw_data'])
+            event_payload_stream['file_path'] = file_path
+            if not clock:
+                return Report(event_payload_stream, **report_options)
+            # Events are decoded while the report is being built, the decoding time is measured per event
+            results_key = 'results_with_raw_data' if 'results_with_raw_data' in event_payload_stream else 'results'
+            event_payload_stream[results_key] = clock.measure_iterator('decode', event_payload_stream[results_key])
+            build_clock = PhaseClock()
+            with build_clock.measure('build'):
+                report = Report(event_payload_stream, **report_options)
+            decode_wall_time, decode_cpu_time = clock.get('decode')
+            build_wall_time, build_cpu_time = build_clock.get('build')
+            clock.add('build', build_wall_time - decode_wall_time, build_cpu_time - decode_cpu_time)
+            return report
+        except UnsupportedInputFileError as ex:
+            raise UnparsedFileError(f"Skipping '{file_path}' ({ex}).")
+        except (json.decoder.JSONDecodeError, UnicodeDecodeError, *DECOMPRESSION_ERRORS):
+            raise UnparsedFileError(f"Skipping '{file_path}' "
+                                    f"(not found/corrupted/wrongly formulated/could not be decoded).")
+
     @staticmethod
     def _read_event_json_data(file_path: str) -> dict:
         """
-        Reads and JSON-decodes specified file path.
+        Reads (decompressing if needed) and JSON-decodes specified file path.
+        Events of a newline-delimited JSON file are put into the 'results' list.
         :param str file_path: Passed file path for reading
         :return dict: Decoded event data dictionary
         """
+        unsupported_reason = get_unsupported_input_reason(file_path)
+        if unsupported_reason:
+            raise UnparsedFileError(f"Skipping '{file_path}' ({unsupported_reason}).")
+        try:
+            text = read_input_file_text(file_path)
+            if is_ndjson_file(file_path):
+                # Only '\n' ends a line, other line breaks may appear unescaped in JSON strings
+                return {'results': [json.loads(line) for line in text.split('\n') if line.strip()]}
+            return json.loads(text)
+        except UnsupportedInputFileError as ex:
+            raise UnparsedFileError(f"Skipping '{file_path}' ({ex}).")
+        except (json.decoder.JSONDecodeError, UnicodeDecodeError, *DECOMPRESSION_ERRORS):
+            raise UnparsedFileError(f"Skipping '{file_path}' "
+                                    f"(not found/corrupted/wrongly formulated/could not be decoded).")
 
-        with open(file_path, 'r') as f:
-            if file_path.endswith('.json'):
-                try:
-                    return json.loads(f.read())
-                except (json.decoder.JSONDecodeError, FileNotFoundError):
-                    _print(f"Skipping '{file_path}' (not found/corrupted/wrongly formulated/could not be decoded).",
-                           style=_theme.WARNING)
-            else:
-                _print(f"Skipping '{file_path}' (non-JSON file).",
-                       style=_theme.WARNING)
+    @staticmethod
+    def _get_percentage(part: int, total: int) -> float:
+        """
+        Returns the rounded percentage of the part in the total, 0 for an empty total.
+        :param int part: Part amount
+        :param int total: Total amount
+        :return float: Percentage rounded to one decimal place
+        """
+        return round(part * 100 / total, 1) if total else 0.0
 
     def _print_final_summary(self) -> None:
         """
@@ -144,10 +617,11 @@ class ReportPrinter:
         :return None:
         """
         event_count = self._context['event_count']
+        matched_event_count = self._context['matched_event_count']
         events_with_order_issues = self._context['events_with_order_issues']
-        events_with_order_issues_percentage = round(events_with_order_issues * 100 / event_count, 1)
+        events_with_order_issues_percentage = self._get_percentage(events_with_order_issues, matched_event_count)
         events_with_errors = self._context['events_with_errors']
-        events_with_errors_percentage = round(events_with_errors * 100 / event_count, 1)
+        events_with_errors_percentage = self._get_percentage(events_with_errors, matched_event_count)
 
         _print('\n\n')
         _console.rule('[final_summary_header]FINAL SUMMARY[/final_summary_header]',
@@ -155,7 +629,7 @@ class ReportPrinter:
         _print('\n')
 
         _print(f"Reports: ", style=_theme.FINAL_SUMMARY_FIELD, end="")
-        _print(len(self._context['reports']), style='bold')
+        _print(self._context['report_count'], style='bold')
 
         _print(f"Read files: ", style=_theme.FINAL_SUMMARY_FIELD, end="")
         _print(self._context['file_count'], style='bold')
@@ -163,6 +637,17 @@ class ReportPrinter:
         _print(f"Events: ", style=_theme.FINAL_SUMMARY_FIELD, end="")
         _print(event_count, style='bold')
 
+        if self._event_filter:
+            _print(f"Filter: ", style=_theme.FINAL_SUMMARY_FIELD, end="")
+            _print(self._context['event_filter'])
+            _print(f"Matched events: ", style=_theme.FINAL_SUMMARY_FIELD, end="")
+            _print(matched_event_count, style='bold', end="")
+            _print(f" ({self._get_percentage(matched_event_count, event_count)}%)")
+
+        if self._context['deduplicated']:
+            _print(f"Duplicate events dropped: ", style=_theme.FINAL_SUMMARY_FIELD, end="")
+            _print(self._context['duplicate_event_count'], style='bold')
+
         _print(f"Events with order issues: ", style=_theme.FINAL_SUMMARY_FIELD, end="")
         _print(events_with_order_issues,
                style=_theme.WARNING if events_with_order_issues > 0 else _theme.OK, end="")
@@ -178,6 +663,9 @@ class ReportPrinter:
         _print(f"Read files: ", style=_theme.FINAL_SUMMARY_FIELD, end="")
         _print(self._context['file_count'], style='bold')
 
+        if self._context['aggregates'] is not None:
+            self._print_breakdown(get_breakdown(self._context['aggregates'], settings.BREAKDOWN_MAX_GROUP_COUNT))
+
         unparsed_file_paths = self._context['unparsed_file_paths']
         if unparsed_file_paths:
             _print(f"\nUnparsed files ({len(unparsed_file_paths)}):", style=_theme.UNPARSED_FILES_FIELD)
@@ -186,23 +674,196 @@ class ReportPrinter:
 
         _print('\n')
 
-    def export_to_html(self) -> None:
+    @staticmethod
+    def _print_breakdown(breakdown: list[dict]) -> None:
         """
-        Renders ReportPrinter object's self._context dictionary as the string of html content,
-        writes the content to the specified file destination.
+        Prints the event count, error rate and order issue rate of the groups of every dimension.
+        :param list[dict] breakdown: Dimension breakdowns made by get_breakdown()
         :return None
         """
-        template_loader = FileSystemLoader(searchpath=settings.DEFAULT_TEMPLATES_DIR_PATH)
-        template_env = Environment(loader=template_loader)
-        template = template_env.get_template('index.html')
+        for dimension_breakdown in breakdown:
+            _print(f"\n{dimension_breakdown['title']}", style=_theme.FINAL_SUMMARY_FIELD, end="")
+            _print(f"{'Events':>{24 - len(dimension_breakdown['title'])}}{'Errors':>8}{'Issues':>8}")
+            for row in dimension_breakdown['rows']:
+                group = row['group'] if len(row['group']) <= 15 else f"{row['group'][:14]}…"
+                _print(f"{group:<16}{row['event_count']:>8}", end="")
+                _print(f"{row['error_rate']:>7}%", style=_theme.WARNING if row['error_rate'] > 0 else _theme.OK, end="")
+                _print(f"{row['order_issue_rate']:>7}%",
+                       style=_theme.WARNING if row['order_issue_rate'] > 0 else _theme.OK)
+            if dimension_breakdown['hidden_group_count']:
+                _print(f"... {dimension_breakdown['hidden_group_count']} more")
 
-        self._clean_export_path()
+    @staticmethod
+    def _print_timelines(timelines: list[dict]) -> None:
+        """
+        Prints every order's events in the event time order with the fields each of them changed.
+        :param list[dict] timelines: Order timelines made by TimelineCollector.get_timelines()
+        :return None
+        """
+        _print('\n\n')
+        _console.rule('[final_summary_header]ORDER TIMELINES[/final_summary_header]',
+                      style=_theme.FINAL_SUMMARY_HEADER)
+        for timeline in timelines:
+            _print('\n')
+            _console.rule(f"[{_theme.REPORT_HEADER}]{timeline['reference'] or timeline['order_key']}"
+                          f"[/{_theme.REPORT_HEADER}]",
+                          style=_theme.REPORT_HEADER)
+            _print(f"Events: ", style=_theme.REPORT_SUMMARY_FIELD, end="")
+            _print(timeline['event_count'], style='bold')
+            for transition in timeline['transitions']:
+                _print(f"{transition['field'].capitalize()}: ", style=_theme.REPORT_SUMMARY_FIELD, end="")
+                _print(' → '.join(transition['values']), markup=False)
+            for entry in timeline['entries']:
+                _print(f"\n{entry['event_time']} ", end="")
+                _print(entry['event_type'], style=_EVENT_TYPE_STYLES.get(entry['event_type'], ''), end="")
+                _print(f" {entry['username']}" if entry['username'] else "", markup=False)
+                if entry['is_initial']:
+                    _print(f"Initial snapshot, {entry['field_count']} fields", style=_theme.EVENT_FIELD)
+                changes = entry['changes']
+                if not changes:
+                    _print("No changes", style=_theme.EVENT_FIELD)
+                for change in changes[:settings.TIMELINE_MAX_CHANGE_COUNT]:
+                    # Field paths and values may contain square brackets, which are not rich markup here
+                    _print(f"{change['field']}: ", style=_theme.EVENT_FIELD, end="", markup=False)
+                    if entry['is_initial']:
+                        _print(change['new_value'], markup=False)
+                    else:
+                        _print(f"{change['old_value']} → {change['new_value']}", markup=False)
+                if len(changes) > settings.TIMELINE_MAX_CHANGE_COUNT:
+                    _print(f"... {len(changes) - settings.TIMELINE_MAX_CHANGE_COUNT} more")
+
+    def finish_profiling(self) -> None:
+        """
+        Stops profiling the run and prints the timing table, if profiling is on,
+        followed by the profile files that could not be written.
+        :return None
+        """
+        if not self._profiler.enabled:
+            return
+        self._profiler.stop()
+        self._print_profile_summary(self._profiler.get_metrics())
+        for ex in self._profiler.output_errors:
+            _print('Something went wrong while the program was trying to write the profile.',
+                   style=_theme.MAJOR_WARNING)
+            _print(ex, style=_theme.WARNING)
+
+    @staticmethod
+    def _print_profile_summary(metrics: dict) -> None:
+        """
+        Prints the time spent in every phase, the peak memory and the largest files of the run.
+        :param dict metrics: RunProfiler object's metrics dictionary
+        :return None
+        """
+        def format_rate(events_per_second: Union[float, None]) -> str:
+            return f'{events_per_second:,.0f}' if events_per_second else '-'
+
+        _print('\n')
+        _console.rule('[final_summary_header]PROFILE[/final_summary_header]',
+                      style=_theme.FINAL_SUMMARY_HEADER)
+        _print('\n')
+
+        _print(f"{'Phase':<10}{'Wall, s':>8}{'CPU, s':>8}{'Events/s':>12}", style=_theme.FINAL_SUMMARY_FIELD)
+        phases = metrics['phases']
+        for phase in sorted(phases, key=lambda phase: (_PROFILE_PHASES + (phase,)).index(phase)):
+            phase_metrics = phases[phase]
+            _print(f"{phase:<10}{phase_metrics['wall_time']:>8.3f}{phase_metrics['cpu_time']:>8.3f}"
+                   f"{format_rate(phase_metrics['events_per_second']):>12}")
+        _print(f"{'total':<10}{metrics['wall_time']:>8.3f}{metrics['cpu_time']:>8.3f}"
+               f"{format_rate(metrics['events_per_second']):>12}", style='bold')
+
+        if metrics['peak_rss'] is not None:
+            _print(f"Peak memory: ", style=_theme.FINAL_SUMMARY_FIELD, end="")
+            peak_rss_text = f"{metrics['peak_rss'] / 1024 ** 2:,.1f} MB"
+            if metrics['peak_rss_workers']:
+                peak_rss_text += f" (workers: {metrics['peak_rss_workers'] / 1024 ** 2:,.1f} MB)"
+            _print(peak_rss_text, style='bold')
+
+        files_by_path = {file['file_path']: file for file in metrics['files']}
+        if metrics['largest_files']:
+            _print(f"\nLargest files:", style=_theme.FINAL_SUMMARY_FIELD)
+        for file_path in metrics['largest_files']:
+            file = files_by_path[file_path]
+            _print(f"- {file_path}")
+            _print(f"  {file['size'] / 1024 ** 2:,.1f} MB, {file['event_count']} events, {file['wall_time']:.3f} s")
+
+        _print('\n')
+
+    def _export_report(self, report: Report) -> None:
+        """
+        Renders Report object's context for the HTML export right after the report was printed,
+        so that the context doesn't have to be kept until the export.
+        The first rendering failure is kept to be reported by export_to_html().
+        :param Report report: Report object
+        :return None
+        """
+        from jinja2.exceptions import TemplateError
+        if self._export_error:
+            return
+        try:
+            self._exporter.add_report(report.context)
+        except (IOError, AttributeError, TemplateError) as ex:
+            self._export_error = ex
+
+    def _export_report_metadata(self, report: Report) -> None:
+        """
+        Writes Report object's event metadata and counters into the metadata file.
+        The first failure is kept to be reported once all the reports were printed.
+        :param Report report: Report object
+        :return None
+        """
+        import sqlite3
+        if self._metadata_export_error:
+            return
+        try:
+            self._metadata_exporter.add_report(report.context)
+        except (sqlite3.Error, OSError) as ex:
+            self._metadata_export_error = ex
 
+    def _write_metadata_export(self) -> None:
+        """
+        Finishes the event metadata file (or discards it if writing a report failed) and prints whether it succeeded.
+        :return None
+        """
+        import sqlite3
+        from modules.metadata_exporter import MetaDataFormatError
         try:
-            export_content = template.render(self._context)
-            with open(self.export_dest_path, 'w') as f:
-                f.write(export_content)
-                self._print_export_success_message()
+            if self._metadata_export_error:
+                if self._metadata_exporter:
+                    self._metadata_exporter.discard()
+                raise self._metadata_export_error
+            self._metadata_exporter.close()
+            _print(f'Successfully exported event metadata to\n{self.metadata_dest_path}\n', style=_theme.OK)
+        except (sqlite3.Error, OSError, MetaDataFormatError) as ex:
+            _print('Something went wrong while the program was trying to write the event metadata file.',
+                   style=_theme.MAJOR_WARNING)
+            _print(ex, style=_theme.WARNING)
+
+    def export_to_html(self) -> None:
+        """
+        Streams the page with ReportPrinter object's self._context dictionary
+        and the already rendered reports into the specified file destination.
+        :return None
+        """
+        try:
+            with self._profiler.phase('export'):
+                self._write_export()
+        finally:
+            self._exporter.close()
+            close_mapped_files()
+
+    def _write_export(self) -> None:
+        """
+        Writes the HTML export and prints whether it succeeded.
+        :return None
+        """
+        from jinja2.exceptions import TemplateError
+        try:
+            if self._export_error:
+                raise self._export_error
+            if self._context['aggregates'] is not None:
+                self._context['breakdown'] = get_breakdown(self._context['aggregates'])
+            self._exporter.export(self._context)
+            self._print_export_success_message()
         except (IOError, AttributeError, TemplateError) as ex:
             self._print_export_failure_message(ex)
 
@@ -215,7 +876,7 @@ class ReportPrinter:
                style=_theme.OK)
 
     @staticmethod
-    def _print_export_failure_message(exception: Union[IOError, AttributeError, TemplateError]) -> None:
+    def _print_export_failure_message(exception: Union[IOError, AttributeError, 'TemplateError']) -> None:
         """
         Prints HTML export failure message.
         :param exception: Exception that took place during the export
@@ -233,29 +894,32 @@ class ReportPrinter:
         if not self.export_dest_path.endswith('.html'):
             self.export_dest_path = f'{self.export_dest_path}.html'
 
-    @classmethod
-    def _print_report(cls, report: Report) -> None:
+    def _print_report(self, report: Report) -> None:
         """
         Prints Report summary and report's event metadata payload
-        from Report object's self.context dictionary
+        from Report object's self.context dictionary,
+        the event metadata payload is left out in the summary-only mode.
         :param Report report: Report object
         :return None
         """
-        cls._print_report_summary(report)
-        cls._print_event_metadata_payload(report)
+        self._print_report_summary(report)
+        if not self.summary_only:
+            self._print_event_metadata_payload(report)
 
-    @staticmethod
-    def _print_report_summary(report: Report) -> None:
+    @classmethod
+    def _print_report_summary(cls, report: Report) -> None:
         """
         Prints report's summary from Report object's 'context' dictionary.
+        Shares of the events with order issues and errors are taken from the events that matched the filter.
         :param Report report: Report object
         :return None
         """
         event_count = report.context['event_count']
+        matched_event_count = report.context['matched_event_count']
         events_with_order_issues = report.context['events_with_order_issues']
-        events_with_order_issues_percentage = round(events_with_order_issues * 100 / event_count, 1)
+        events_with_order_issues_percentage = cls._get_percentage(events_with_order_issues, matched_event_count)
         events_with_errors = report.context['events_with_errors']
-        events_with_errors_percentage = round(events_with_errors * 100 / event_count, 1)
+        events_with_errors_percentage = cls._get_percentage(events_with_errors, matched_event_count)
 
         _console.rule('REPORT SUMMARY', style='bold')
         _print('\n')
@@ -264,6 +928,16 @@ class ReportPrinter:
                end="")
         _print(event_count, style='bold')
 
+        if report.context['filtered']:
+            _print(f"Matched events: ", style=_theme.REPORT_SUMMARY_FIELD,
+                   end="")
+            _print(matched_event_count, style='bold')
+
+        if report.context['deduplicated']:
+            _print(f"Duplicate events dropped: ", style=_theme.REPORT_SUMMARY_FIELD,
+                   end="")
+            _print(report.context['duplicate_event_count'], style='bold')
+
         _print(f"Events with order issues: ", style=_theme.REPORT_SUMMARY_FIELD,
                end="")
         _print(events_with_order_issues,
@@ -281,51 +955,55 @@ class ReportPrinter:
                style=_theme.WARNING if events_with_errors_percentage > 0 else _theme.OK)
 
     @classmethod
-    def _print_event_metadata_payload(cls, report):
+    def _print_event_metadata_payload(cls, report: Report) -> None:
+        """
+        Prints report's event metadata payload from Report object's 'context' dictionary.
+        The whole event list is written at once: as plain text if the output is not a terminal
+        (e.g. piped into a log), as a single rich renderable otherwise.
+        :param Report report: Report object
+        :return None
+        """
         event_metadata_payload = report.context['event_metadata_payload']
 
         _print('\n')
         _console.rule('EVENT LIST', style='bold')
         _print('\n')
 
-        for e_metadata in event_metadata_payload.values():
-            cls._print_event_metadata(e_metadata)
+        if not event_metadata_payload:
+            return
+        if _console.is_terminal:
+            _print(_EventListRenderable(event_metadata_payload.values(), cls._get_event_metadata_fields))
+        else:
+            _console.file.write(''.join(map(cls._get_event_metadata_plain_text, event_metadata_payload.values())))
 
     @staticmethod
-    def _print_event_metadata(e_metadata: Report.EventMetaData) -> None:
+    def _get_event_metadata_fields(e_metadata: Report.EventMetaData) -> list[tuple[str, str, str]]:
         """
-        Prints EventMetaData object's fields.
+        Returns EventMetaData object's printed fields.
         :param Report.EventMetaData e_metadata: EventMetaData object
-        :return None
+        :return list[tuple[str, str, str]]: (field title, field value, value style) tuples
         """
-        _console.rule()
+        return [
+            ("Event time: ", e_metadata.event_time, ''),
+            ("Username: ", e_metadata.username, ''),
+            ("Status: ", e_metadata.status_display,
+             _theme.STATUS_WARNING if e_metadata.status_display == 'Action Required' else _theme.STATUS_OK),
+            ("Issues count: ", str(e_metadata.order_issues_count),
+             _theme.WARNING if e_metadata.order_issues_count > 0 else _theme.OK),
+            ("Errors exist: ", 'Yes' if e_metadata.errors_exist else 'No',
+             _theme.WARNING if e_metadata.errors_exist else _theme.OK),
+        ]
 
-        event_type_theme_mapping = {'CREATION': _theme.TYPE_CREATED,
-                                    'UPDATE': _theme.TYPE_UPDATED,
-                                    'TRANSITION': _theme.TYPE_TRANSITION}
-        _print(f"{e_metadata.event_type}",
-               style=event_type_theme_mapping[e_metadata.event_type],
-               justify='center')
-
-        _print("Event time: ", style=_theme.EVENT_FIELD, end="")
-        _print(e_metadata.event_time)
-
-        _print("Username: ", style=_theme.EVENT_FIELD, end="")
-        _print(e_metadata.username)
-
-        _print("Status: ", style=_theme.EVENT_FIELD, end="")
-        _print(f"{e_metadata.status_display}",
-               style=_theme.STATUS_WARNING if e_metadata.status_display == 'Action Required' else _theme.STATUS_OK)
-
-        _print("Issues count: ", style=_theme.EVENT_FIELD, end="")
-        _print(e_metadata.order_issues_count,
-               style=_theme.WARNING if e_metadata.order_issues_count > 0 else _theme.OK)
-
-        _print(f"Errors exist: ", style=_theme.EVENT_FIELD, end="")
-        if e_metadata.errors_exist:
-            _print('Yes', style=_theme.WARNING)
-        else:
-            _print('No', style=_theme.OK)
+    @classmethod
+    def _get_event_metadata_plain_text(cls, e_metadata: Report.EventMetaData) -> str:
+        """
+        Returns EventMetaData object's fields as plain text.
+        :param Report.EventMetaData e_metadata: EventMetaData object
+        :return str: Plain text of the event
+        """
+        fields_text = ''.join(f'{field_title}{field_value}\n'
+                              for field_title, field_value, _ in cls._get_event_metadata_fields(e_metadata))
+        return f'{_EVENT_RULE}{e_metadata.event_type.center(_console.width)}\n{fields_text}'
 
     def _add_file_path_to_context_unparsed_list(self, file_path: str) -> None:
         """
@@ -338,11 +1016,16 @@ class ReportPrinter:
 
     def _update_context_count_metrics(self, report: Report) -> None:
         """
-        Adds values of keys 'event_count', 'events_with_errors' and 'events_with_order_issues'
-        of a Report object's self.context to ReportPrinter object's self._context by the same keys.
+        Adds values of keys 'event_count', 'matched_event_count', 'duplicate_event_count', 'events_with_errors'
+        and 'events_with_order_issues' of a Report object's self.context
+        to ReportPrinter object's self._context by the same keys.
         :param Report report: Report object
         :return None
         """
         self._context['event_count'] += report.context['event_count']
+        self._context['matched_event_count'] += report.context['matched_event_count']
+        self._context['duplicate_event_count'] += report.context['duplicate_event_count']
         self._context['events_with_errors'] += report.context['events_with_errors']
         self._context['events_with_order_issues'] += report.context['events_with_order_issues']
+        if self._context['aggregates'] is not None and report.context['aggregates']:
+            add_aggregates(self._context['aggregates'], report.context['aggregates'])
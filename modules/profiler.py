@@ -0,0 +1,254 @@
+import cProfile
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import time
+from typing import ContextManager, Iterator, Union
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is not reported there
+    resource = None
+
+# Amount of the largest files that are listed in the metrics
+LARGEST_FILE_COUNT = 5
+
+_NULL_CONTEXT = nullcontext()
+
+
+class PhaseClock:
+    """
+    Accumulates wall and CPU time spent in the named phases of reading a file.
+    Simple enough to be used in a worker process and sent back with the built report.
+    """
+
+    def __init__(self) -> None:
+        # Phase -> [wall time, CPU time] in seconds
+        self.times = {}
+
+    def add(self, phase: str, wall_time: float, cpu_time: float) -> None:
+        phase_times = self.times.setdefault(phase, [0.0, 0.0])
+        phase_times[0] += wall_time
+        phase_times[1] += cpu_time
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        """
+        Measures the time spent in the context as a part of specified phase.
+        :param str phase: Phase name
+        :return Iterator[None]
+        """
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+    def measure_iterator(self, phase: str, iterator: Iterator) -> Iterator:
+        """
+        Yields passed iterator's items, measuring the time spent in producing them as a part of specified phase,
+        e.g. the decoding of a lazily decoded event stream.
+        :param str phase: Phase name
+        :param Iterator iterator: Iterator
+        :return Iterator: Items of the iterator
+        """
+        perf_counter, process_time = time.perf_counter, time.process_time
+        iterator = iter(iterator)
+        while True:
+            wall_start, cpu_start = perf_counter(), process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(phase, perf_counter() - wall_start, process_time() - cpu_start)
+            yield item
+
+    def get(self, phase: str) -> tuple[float, float]:
+        wall_time, cpu_time = self.times.get(phase, (0.0, 0.0))
+        return wall_time, cpu_time
+
+
+class NullProfiler:
+    """
+    Profiler that records nothing, used when profiling is off so that the instrumented code
+    costs a method call per file and phase.
+    """
+    enabled = False
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def phase(self, phase: str, file_path: Union[str, None] = None) -> ContextManager:
+        return _NULL_CONTEXT
+
+    def add_phase_times(self, file_path: str, phase_times: Union[dict, None]) -> None:
+        pass
+
+    def add_file(self, file_path: str, event_count: int) -> None:
+        pass
+
+
+class RunProfiler(NullProfiler):
+    """
+    Profiler that records wall and CPU time of every phase, overall and per file,
+    the amount of events per file and the peak memory of the run.
+    Optionally runs cProfile over the whole run (the main process only).
+    """
+    enabled = True
+
+    def __init__(self,
+                 metrics_dest_path: Union[str, None] = None,
+                 stats_dump_path: Union[str, None] = None) -> None:
+        self.metrics_dest_path = metrics_dest_path
+        self.stats_dump_path = stats_dump_path
+        self._run_clock = PhaseClock()
+        self._clock = PhaseClock()
+        self._file_clocks = {}
+        self._file_event_counts = {}
+        self._c_profile = cProfile.Profile() if stats_dump_path else None
+        self._start_times = None
+        # Errors of writing the metrics file or the stats dump, reported by the caller after the run
+        self.output_errors = []
+
+    def start(self) -> None:
+        """
+        Starts measuring the whole run.
+        :return None
+        """
+        self._start_times = time.perf_counter(), time.process_time()
+        if self._c_profile:
+            self._c_profile.enable()
+
+    def stop(self) -> None:
+        """
+        Stops measuring the whole run, writes the metrics and dumps the cProfile stats if requested.
+        Files that could not be written are kept in output_errors instead of interrupting the run.
+        :return None
+        """
+        if self._start_times is None:
+            return
+        wall_start, cpu_start = self._start_times
+        self._run_clock.add('run', time.perf_counter() - wall_start, time.process_time() - cpu_start)
+        self._start_times = None
+        if self._c_profile:
+            self._c_profile.disable()
+            try:
+                self._c_profile.dump_stats(self.stats_dump_path)
+            except OSError as ex:
+                self.output_errors.append(ex)
+        if self.metrics_dest_path:
+            try:
+                self.write_metrics(self.metrics_dest_path)
+            except OSError as ex:
+                self.output_errors.append(ex)
+
+    @contextmanager
+    def phase(self, phase: str, file_path: Union[str, None] = None) -> Iterator[None]:
+        """
+        Measures the time spent in the context as a part of specified phase (of specified file).
+        :param str phase: Phase name
+        :param Union[str, None] file_path: File path the phase belongs to
+        :return Iterator[None]
+        """
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            self._clock.add(phase, wall_time, cpu_time)
+            if file_path is not None:
+                self._get_file_clock(file_path).add(phase, wall_time, cpu_time)
+
+    def add_phase_times(self, file_path: str, phase_times: Union[dict, None]) -> None:
+        """
+        Adds phase times measured elsewhere (e.g. in a worker process) to specified file.
+        :param str file_path: File path
+        :param Union[dict, None] phase_times: Phase -> (wall time, CPU time)
+        :return None
+        """
+        if not phase_times:
+            return
+        file_clock = self._get_file_clock(file_path)
+        for phase, (wall_time, cpu_time) in phase_times.items():
+            self._clock.add(phase, wall_time, cpu_time)
+            file_clock.add(phase, wall_time, cpu_time)
+
+    def add_file(self, file_path: str, event_count: int) -> None:
+        self._file_event_counts[file_path] = event_count
+
+    def _get_file_clock(self, file_path: str) -> PhaseClock:
+        file_clock = self._file_clocks.get(file_path)
+        if file_clock is None:
+            file_clock = self._file_clocks[file_path] = PhaseClock()
+        return file_clock
+
+    def get_metrics(self) -> dict:
+        """
+        Returns the recorded metrics.
+        :return dict: Metrics dictionary
+        """
+        event_count = sum(self._file_event_counts.values())
+        run_wall_time, run_cpu_time = self._run_clock.get('run')
+        files = []
+        for file_path, file_clock in self._file_clocks.items():
+            file_event_count = self._file_event_counts.get(file_path, 0)
+            file_wall_time = sum(wall_time for wall_time, _ in file_clock.times.values())
+            files.append({'file_path': file_path,
+                          'size': os.path.getsize(file_path) if os.path.isfile(file_path) else None,
+                          'event_count': file_event_count,
+                          'wall_time': file_wall_time,
+                          'events_per_second': _get_rate(file_event_count, file_wall_time),
+                          'phases': _get_phase_metrics(file_clock, file_event_count)})
+        largest_files = sorted((file for file in files if file['size'] is not None),
+                               key=lambda file: file['size'], reverse=True)[:LARGEST_FILE_COUNT]
+        return {'wall_time': run_wall_time,
+                'cpu_time': run_cpu_time,
+                'event_count': event_count,
+                'events_per_second': _get_rate(event_count, run_wall_time),
+                'peak_rss': _get_peak_rss(resource.RUSAGE_SELF) if resource else None,
+                'peak_rss_workers': _get_peak_rss(resource.RUSAGE_CHILDREN) if resource else None,
+                'phases': _get_phase_metrics(self._clock, event_count),
+                'largest_files': [file['file_path'] for file in largest_files],
+                'files': files}
+
+    def write_metrics(self, dest_path: str) -> None:
+        """
+        Writes the recorded metrics as JSON.
+        :param str dest_path: Destination file path
+        :return None
+        """
+        with open(dest_path, 'w') as f:
+            f.write(json.dumps(self.get_metrics(), indent=2))
+
+
+def _get_rate(event_count: int, wall_time: float) -> Union[float, None]:
+    return event_count / wall_time if wall_time else None
+
+
+def _get_phase_metrics(clock: PhaseClock, event_count: int) -> dict:
+    """
+    Returns the times of every phase measured by passed clock.
+    :param PhaseClock clock: Phase clock
+    :param int event_count: Amount of events processed in the phases
+    :return dict: Phase -> times and events per second
+    """
+    return {phase: {'wall_time': wall_time,
+                    'cpu_time': cpu_time,
+                    'events_per_second': _get_rate(event_count, wall_time)}
+            for phase, (wall_time, cpu_time) in clock.times.items()}
+
+
+def _get_peak_rss(who: int) -> int:
+    """
+    Returns the peak resident set size of the process (or of its largest finished child process).
+    :param int who: resource.RUSAGE_SELF or resource.RUSAGE_CHILDREN
+    :return int: Peak RSS in bytes
+    """
+    peak_rss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak_rss if os.uname().sysname == 'Darwin' else peak_rss * 1024
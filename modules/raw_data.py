@@ -0,0 +1,127 @@
+from abc import ABC, abstractmethod
+import json
+import mmap
+import sys
+
+# Memory maps of the source files that raw event data spans point into
+_mapped_files = {}
+
+
+class RawEventData(ABC):
+    """
+    Lazy reference to the raw payload of an event record.
+    The payload is turned into text only when it's read (e.g. when rendered into an HTML export).
+    """
+    __slots__ = ()
+
+    @abstractmethod
+    def read(self) -> str:
+        """
+        Returns the raw payload text.
+        :return str: Raw event payload text
+        """
+
+    def __str__(self) -> str:
+        return self.read()
+
+
+class DecodedRawEventData(RawEventData):
+    """
+    Reference to an already decoded event dictionary, which is JSON-encoded on read.
+    """
+    __slots__ = ('_event_data',)
+
+    def __init__(self, event_data: dict) -> None:
+        self._event_data = event_data
+
+    def read(self) -> str:
+        """
+        Returns JSON-encoded event dictionary.
+        :return str: Raw event payload text
+        """
+        return json.dumps(self._event_data)
+
+
+class TextRawEventData(RawEventData):
+    """
+    Raw payload text kept as it was read, for sources whose byte offsets can't be mapped
+    (e.g. decompressed on the fly).
+    """
+    __slots__ = ('_text',)
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+
+    def __getstate__(self) -> str:
+        return self._text
+
+    def __setstate__(self, state: str) -> None:
+        self._text = state
+
+    def __sizeof__(self) -> int:
+        return super().__sizeof__() + sys.getsizeof(self._text)
+
+    def read(self) -> str:
+        return self._text
+
+
+class FileSpanRawEventData(RawEventData):
+    """
+    Reference to a byte span of the source file that holds the raw event payload.
+    The file is memory-mapped on the first read, so no payload copy is kept until then.
+    """
+    __slots__ = ('file_path', 'offset', 'length')
+
+    def __init__(self, file_path: str, offset: int, length: int) -> None:
+        self.file_path = file_path
+        self.offset = offset
+        self.length = length
+
+    def __getstate__(self) -> tuple:
+        return self.file_path, self.offset, self.length
+
+    def __setstate__(self, state: tuple) -> None:
+        self.file_path, self.offset, self.length = state
+
+    def read(self) -> str:
+        """
+        Returns the raw payload text sliced out of the memory-mapped source file.
+        :return str: Raw event payload text
+        """
+        mapped_file = _get_mapped_file(self.file_path)
+        return mapped_file[self.offset:self.offset + self.length].decode('utf-8')
+
+
+def _get_mapped_file(file_path: str) -> mmap.mmap:
+    """
+    Returns read-only memory map of specified file, maps the file on the first call.
+    :param str file_path: Source file path
+    :return mmap.mmap: Memory-mapped file
+    """
+    mapped_file = _mapped_files.get(file_path)
+    if mapped_file is None:
+        with open(file_path, 'rb') as f:
+            mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _mapped_files[file_path] = mapped_file
+    return mapped_file
+
+
+def close_mapped_files() -> None:
+    """
+    Closes all source file memory maps.
+    :return None
+    """
+    for mapped_file in _mapped_files.values():
+        mapped_file.close()
+    _mapped_files.clear()
+
+
+def close_mapped_file(file_path: str) -> None:
+    """
+    Closes the memory map of specified source file, e.g. because the file has changed.
+    :param str file_path: Source file path
+    :return None
+    """
+    mapped_file = _mapped_files.pop(file_path, None)
+    if mapped_file is not None:
+        mapped_file.close()
@@ -1,7 +1,15 @@
 from dataclasses import dataclass, field
-from datetime import datetime
-import json
-from typing import Union
+from typing import TYPE_CHECKING, Iterator, Union
+
+from modules.aggregation import GroupByCollector
+from modules.metadata_store import EventMetaDataStore
+from modules.raw_data import DecodedRawEventData, RawEventData
+from modules.timestamps import format_timestamp_string
+
+if TYPE_CHECKING:
+    from modules.event_filter import EventFilter
+    from modules.event_id_index import EventIdIndex
+    from modules.timeline import TimelineCollector
 
 
 class Report:
@@ -21,46 +29,139 @@ class Report:
         status_display: str = field(default='')
         order_issues_count: int = field(default=0)
         errors_exist: bool = field(default=False)
-        event_raw_data: Union[str, None] = field(default=None)
+        event_raw_data: Union[RawEventData, None] = field(default=None)
 
-    def __init__(self, event_payload_full: dict) -> None:
+    def __init__(self,
+                 event_payload_full: dict,
+                 keep_raw_data: bool = True,
+                 compact: bool = False,
+                 event_filter: Union['EventFilter', None] = None,
+                 aggregate: bool = False,
+                 event_id_index: Union['EventIdIndex', None] = None,
+                 timeline_collector: Union['TimelineCollector', None] = None) -> None:
         self._event_full_payload = event_payload_full
+        self._keep_raw_data = keep_raw_data
+        self._event_filter = event_filter or None
+        self._group_by_collector = GroupByCollector() if aggregate else None
+        self._event_id_index = event_id_index
+        self._timeline_collector = timeline_collector
         self.context = {
-            'event_count': len(self._event_full_payload.get('results', [])),
+            'event_count': 0,
+            'matched_event_count': 0,
+            'filtered': self._event_filter is not None,
+            'deduplicated': event_id_index is not None,
+            'duplicate_event_count': 0,
             'events_with_errors': 0,
             'events_with_order_issues': 0,
-            'event_metadata_payload': {},
+            'event_metadata_payload': EventMetaDataStore() if compact else {},
+            'aggregates': None,
             'file_path': self._event_full_payload.get('file_path', '')
         }
         self._populate_context_event_metadata()
 
+    def __getstate__(self) -> dict:
+        """
+        Leaves the full event payload out of the pickled state,
+        so that only the context is sent back from worker processes.
+        :return dict: Object state
+        """
+        state = self.__dict__.copy()
+        state['_event_full_payload'] = None
+        state['_event_filter'] = None
+        state['_event_id_index'] = None
+        state['_timeline_collector'] = None
+        return state
+
+    @classmethod
+    def from_context(cls, context: dict) -> 'Report':
+        """
+        Creates a Report object out of an already built context (e.g. an imported one),
+        nothing is decoded or cleaned.
+        :param dict context: Report context dictionary
+        :return Report: Report object
+        """
+        report = cls.__new__(cls)
+        report._event_full_payload = None
+        report._keep_raw_data = False
+        report._event_filter = None
+        report._group_by_collector = None
+        report._event_id_index = None
+        report._timeline_collector = None
+        report.context = context
+        return report
+
     def _populate_context_event_metadata(self) -> None:
         """
         Generates context dictionary by creating EventMetaData objects
         and puts them into self.context dictionary.
+        Events are counted while being iterated, so 'results' may also be a lazy iterator.
+        Events whose ids are already in the event id index (seen in this or another file) are dropped
+        before they're counted, events that don't match the event filter are only counted.
+        Group-by columns of the events are collected on the way and aggregated at the end,
+        the events are also added to the order timelines if those are collected.
         :return: None
         """
-        results = self._event_full_payload.get('results')
-        for event_data in results:
-            event_metadata = self._build_event_metadata(event_data)
+        event_filter = self._event_filter
+        event_id_index = self._event_id_index
+        group_by_collector = self._group_by_collector
+        timeline_collector = self._timeline_collector
+        for event_data, event_raw_data in self._iter_events_with_raw_data():
+            if event_id_index is not None and not event_id_index.add(event_data.get('id')):
+                self.context['duplicate_event_count'] += 1
+                continue
+            self.context['event_count'] += 1
+            if event_filter and not event_filter.matches(event_data):
+                continue
+            event_metadata = self._build_event_metadata(event_data, event_raw_data)
             self.context['event_metadata_payload'][event_data['id']] = event_metadata
+            self.context['matched_event_count'] += 1
+            if group_by_collector:
+                group_by_collector.add(event_data, event_metadata)
+            if timeline_collector is not None:
+                timeline_collector.add(event_data, event_metadata)
+        if group_by_collector:
+            self.context['aggregates'] = group_by_collector.aggregate()
+            self._group_by_collector = None
+
+    def _iter_events_with_raw_data(self) -> Iterator[tuple[dict, Union[RawEventData, None]]]:
+        """
+        Returns an iterator of event dictionaries paired with lazy references to their raw payloads.
+        Payloads that already come with raw data references (e.g. file spans of a streamed file)
+        are passed as they are, otherwise references to the decoded dictionaries are made.
+        No references are made at all if raw data should not be kept.
+        :return Iterator[tuple[dict, Union[RawEventData, None]]]: (event data, raw event data) pairs
+        """
+        results_with_raw_data = self._event_full_payload.get('results_with_raw_data')
+        if results_with_raw_data is not None:
+            if self._keep_raw_data:
+                return results_with_raw_data
+            return ((event_data, None) for event_data, _ in results_with_raw_data)
+        results = self._event_full_payload.get('results')
+        if self._keep_raw_data:
+            return ((event_data, DecodedRawEventData(event_data)) for event_data in results)
+        return ((event_data, None) for event_data in results)
 
-    def _build_event_metadata(self, event_data: dict) -> EventMetaData:
+    def _build_event_metadata(self,
+                              event_data: dict,
+                              event_raw_data: Union[RawEventData, None] = None) -> EventMetaData:
         """
         Cleans passed event_data dictionary and creates EventMetaData object from it.
         :param dict event_data: Dictionary with uncleaned event data from the full event payload
+        :param Union[RawEventData, None] event_raw_data: Lazy reference to the event's raw payload
         :return EventMetaData: EventMetaData object
         """
-        cleaned_event_data = self._clean_event_data(event_data)
+        cleaned_event_data = self._clean_event_data(event_data, event_raw_data)
         event_metadata = self.EventMetaData(**cleaned_event_data)
         self._increment_context_count_metrics(event_metadata)
         return event_metadata
 
     @classmethod
-    def _clean_event_data(cls, event_data: dict) -> dict:
+    def _clean_event_data(cls, event_data: dict, event_raw_data: Union[RawEventData, None] = None) -> dict:
         """
         Clears passed event_data dictionary and returns dictionary with cleaned data.
+        Raw payload is not serialized here, the passed lazy reference is stored instead.
         :param dict event_data: Uncleaned dictionary of an event object's fields.
+        :param Union[RawEventData, None] event_raw_data: Lazy reference to the event's raw payload
         :return dict : Cleaned dictionary
         """
         user_data = (event_data.get('user', ''))
@@ -82,7 +183,7 @@ class Report:
                                   status_display=status_display,
                                   order_issues_count=order_issues_count,
                                   errors_exist=errors_exist,
-                                  event_raw_data=json.dumps(event_data))
+                                  event_raw_data=event_raw_data)
         return cleaned_event_data
 
     @staticmethod
@@ -92,15 +193,7 @@ class Report:
         :param str timestamp_str: string that's supposed to be formatted.
         :return str: formatted timestamp string
         """
-        try:
-            formatted_timestamp_str = datetime.strftime(
-                datetime.strptime(
-                    timestamp_str,
-                    '%Y-%m-%dT%H:%M:%S.%fZ'
-                ), '%d.%m.%Y, %H:%M')
-        except ValueError:
-            formatted_timestamp_str = ''
-        return formatted_timestamp_str
+        return format_timestamp_string(timestamp_str)
 
     @staticmethod
     def _clean_event_type_str(event_type: str) -> str:
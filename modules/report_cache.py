@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+from typing import Union
+
+from conf import settings
+from modules.report import Report
+
+# Bumped whenever the cached Report structure changes, so that older entries are not loaded
+CACHE_FORMAT_VERSION = 3
+
+
+class ReportCache:
+    """
+    Persistent on-disk cache of built Report objects.
+    Entries are keyed by the absolute file path and the set of options the reports were built with,
+    and are valid as long as the file's size, mtime and content hash match the recorded ones.
+    An unchanged file is recognized by a single stat call, its content is hashed only if the mtime changed.
+    """
+
+    INDEX_FILENAME = 'index.json'
+
+    def __init__(self,
+                 variant: str,
+                 cache_dir_path: str = settings.DEFAULT_CACHE_DIR_PATH,
+                 max_size: int = settings.CACHE_MAX_SIZE,
+                 max_age: int = settings.CACHE_MAX_AGE) -> None:
+        self.variant = f'v{CACHE_FORMAT_VERSION}:{variant}'
+        self.cache_dir_path = cache_dir_path
+        self.max_size = max_size
+        self.max_age = max_age
+        self._index_path = os.path.join(cache_dir_path, self.INDEX_FILENAME)
+        self._index = self._read_index()
+        self._file_stats = {}
+        self._is_changed = False
+
+    def _read_index(self) -> dict:
+        """
+        Reads the cache index file.
+        :return dict: Cache key -> entry metadata dictionary, empty if there's no (readable) index
+        """
+        try:
+            with open(self._index_path, 'r') as f:
+                index = json.loads(f.read())
+            return index if isinstance(index, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _get_key(self, file_path: str) -> str:
+        return f'{self.variant}:{file_path}'
+
+    def contains(self, file_path: str) -> bool:
+        """
+        Checks whether there's a valid cache entry for specified file.
+        :param str file_path: Absolute input file path
+        :return bool: True if the cached report can be loaded
+        """
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return False
+        self._file_stats[file_path] = file_stat
+        entry = self._index.get(self._get_key(file_path))
+        if entry is None or entry['size'] != file_stat.st_size:
+            return False
+        if entry['mtime_ns'] != file_stat.st_mtime_ns:
+            # Touched, but possibly not changed
+            if entry['content_hash'] != self._hash_file(file_path):
+                return False
+            entry['mtime_ns'] = file_stat.st_mtime_ns
+            self._is_changed = True
+        return True
+
+    def load(self, file_path: str) -> Union[Report, None]:
+        """
+        Loads the cached Report object of specified file.
+        Should be called after contains() returned True.
+        :param str file_path: Absolute input file path
+        :return Union[Report, None]: Report object, None if the entry could not be loaded
+        """
+        key = self._get_key(file_path)
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        try:
+            with open(os.path.join(self.cache_dir_path, entry['entry_filename']), 'rb') as f:
+                report = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            self._remove_entry(key)
+            return None
+        entry['last_used_at'] = time.time()
+        self._is_changed = True
+        return report
+
+    def store(self, file_path: str, report: Report) -> None:
+        """
+        Stores built Report object of specified file.
+        The file's stat recorded by contains() is used, so that changes made while the report
+        was being built don't get attributed to it. The report is not stored at all if the file changed
+        since then (or while its content was hashed), its next build is cached instead.
+        :param str file_path: Absolute input file path
+        :param Report report: Report object
+        :return None
+        """
+        file_stat = self._file_stats.get(file_path)
+        if file_stat is None or not self._is_stat_unchanged(file_path, file_stat):
+            return
+        key = self._get_key(file_path)
+        entry_filename = f'{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.pickle'
+        entry_path = os.path.join(self.cache_dir_path, entry_filename)
+        try:
+            content_hash = self._hash_file(file_path)
+            if not self._is_stat_unchanged(file_path, file_stat):
+                return
+            os.makedirs(self.cache_dir_path, exist_ok=True)
+            with open(entry_path, 'wb') as f:
+                pickle.dump(report, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            return
+        now = time.time()
+        self._index[key] = {'size': file_stat.st_size,
+                            'mtime_ns': file_stat.st_mtime_ns,
+                            'content_hash': content_hash,
+                            'entry_filename': entry_filename,
+                            'entry_size': os.path.getsize(entry_path),
+                            'stored_at': now,
+                            'last_used_at': now}
+        self._is_changed = True
+
+    def save(self) -> None:
+        """
+        Evicts entries that are too old or don't fit into the cache size limit,
+        least recently used first, and writes the cache index file.
+        :return None
+        """
+        self._evict()
+        if not self._is_changed:
+            return
+        try:
+            os.makedirs(self.cache_dir_path, exist_ok=True)
+            tmp_index_path = f'{self._index_path}.tmp'
+            with open(tmp_index_path, 'w') as f:
+                f.write(json.dumps(self._index))
+            os.replace(tmp_index_path, self._index_path)
+        except OSError:
+            pass
+        self._is_changed = False
+
+    def _evict(self) -> None:
+        """
+        Removes entries that weren't used for longer than max_age,
+        then removes least recently used entries until the cache fits into max_size.
+        :return None
+        """
+        expired_before = time.time() - self.max_age
+        entries_by_last_use = sorted(self._index.items(), key=lambda item: item[1]['last_used_at'])
+        total_size = sum(entry['entry_size'] for _, entry in entries_by_last_use)
+        for key, entry in entries_by_last_use:
+            if entry['last_used_at'] >= expired_before and total_size <= self.max_size:
+                break
+            total_size -= entry['entry_size']
+            self._remove_entry(key)
+
+    def _remove_entry(self, key: str) -> None:
+        """
+        Removes specified entry from the index and deletes its file.
+        :param str key: Cache key
+        :return None
+        """
+        entry = self._index.pop(key, None)
+        if entry is None:
+            return
+        try:
+            os.remove(os.path.join(self.cache_dir_path, entry['entry_filename']))
+        except OSError:
+            pass
+        self._is_changed = True
+
+    @staticmethod
+    def _is_stat_unchanged(file_path: str, file_stat: os.stat_result) -> bool:
+        """
+        Checks whether specified file still has the recorded size and mtime.
+        :param str file_path: File path
+        :param os.stat_result file_stat: Recorded stat of the file
+        :return bool: True if the file was not changed since the stat was recorded
+        """
+        try:
+            current_stat = os.stat(file_path)
+        except OSError:
+            return False
+        return current_stat.st_size == file_stat.st_size and current_stat.st_mtime_ns == file_stat.st_mtime_ns
+
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        """
+        Returns the content hash of specified file.
+        :param str file_path: File path
+        :return str: Hex digest of the file content
+        """
+        file_hash = hashlib.blake2b()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(settings.STREAM_READ_CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
@@ -0,0 +1,432 @@
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import io
+import json
+import os
+import re
+import socketserver
+import tempfile
+from typing import Iterator, Union
+from urllib.parse import parse_qs, urlsplit
+
+from jinja2 import Environment
+from jinja2.exceptions import TemplateError
+
+from conf import settings
+from modules.aggregation import get_breakdown
+from modules.event_filter import EventFilter
+from modules.html_exporter import BaseHtmlExporter, HtmlExporter, create_template_env
+from modules.printer import ReportPrinter, redirect_console
+from modules.raw_data import close_mapped_file
+from modules.report import Report
+
+# Keys of the report context counters listed in the JSON summary
+_REPORT_SUMMARY_KEYS = ('event_count', 'matched_event_count', 'events_with_errors', 'events_with_order_issues')
+# Query parameter values that turn a flag on
+_TRUE_VALUES = ('1', 'true', 'yes')
+# Style sequences the console writes when the server runs in a terminal
+_ANSI_STYLE_PATTERN = re.compile(r'\x1b\[[0-9;]*m')
+
+
+class ReportRequestError(Exception):
+    """
+    Exception that is raised when a request can't be answered, holds the HTTP status to answer with.
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class _ResidentReport:
+    """
+    Report (or the reason why it was not built) of a file as it was when the report was built.
+    """
+    __slots__ = ('file_stat', 'report', 'error_message', 'memory_size')
+
+    def __init__(self,
+                 file_stat: Union[tuple[int, int], None],
+                 report: Union[Report, None],
+                 error_message: Union[str, None],
+                 memory_size: int) -> None:
+        self.file_stat = file_stat
+        self.report = report
+        self.error_message = error_message
+        self.memory_size = memory_size
+
+
+class ResidentReportStore:
+    """
+    In-memory LRU of built reports keyed by file path and the options they were built with.
+    A report is returned as it is while its file keeps the same size and mtime, a changed file is read again.
+    Once the reports take more memory than the budget, the least recently requested ones are dropped
+    (the one just built is always kept, even if it's bigger than the budget by itself).
+    """
+
+    def __init__(self, memory_budget: int = settings.SERVER_MEMORY_BUDGET) -> None:
+        self.memory_budget = memory_budget
+        self.memory_size = 0
+        self._reports = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'evictions': 0}
+
+    def get(self, file_path: str, variant: str, report_options: dict) -> tuple[Union[Report, None], Union[str, None]]:
+        """
+        Returns the report of specified file, building it if it's not there yet or if the file has changed.
+        :param str file_path: File path
+        :param str variant: String that identifies the report options
+        :param dict report_options: Keyword arguments for the Report object
+        :return tuple[Union[Report, None], Union[str, None]]: Report object or None, error message or None
+        """
+        key = (file_path, variant)
+        file_stat = self._stat_file(file_path)
+        resident_report = self._reports.get(key)
+        if resident_report is not None:
+            if resident_report.file_stat == file_stat:
+                self._reports.move_to_end(key)
+                self.stats['hits'] += 1
+                return resident_report.report, resident_report.error_message
+            self._remove(key)
+            self.stats['reloads'] += 1
+        else:
+            self.stats['misses'] += 1
+
+        # Raw data of a changed file must not be read from a memory map of its previous content
+        close_mapped_file(file_path)
+        report, error_message, _ = ReportPrinter.load_report(file_path, True, report_options)
+        memory_size = report.context['event_metadata_payload'].get_memory_size() if report else 0
+        self._reports[key] = _ResidentReport(file_stat, report, error_message, memory_size)
+        self.memory_size += memory_size
+        self._evict()
+        return report, error_message
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        resident_report = self._reports.pop(key)
+        self.memory_size -= resident_report.memory_size
+
+    def _evict(self) -> None:
+        """
+        Drops the least recently requested reports until the rest fits into the memory budget.
+        :return None
+        """
+        while self.memory_size > self.memory_budget and len(self._reports) > 1:
+            key = next(iter(self._reports))
+            self._remove(key)
+            if not any(file_path == key[0] for file_path, _ in self._reports):
+                close_mapped_file(key[0])
+            self.stats['evictions'] += 1
+
+    def get_status(self) -> dict:
+        """
+        Returns the amount of the resident reports, their memory size and the request counters.
+        :return dict: Store status
+        """
+        return {'report_count': len(self._reports),
+                'memory_size': self.memory_size,
+                'memory_budget': self.memory_budget,
+                **self.stats}
+
+    @staticmethod
+    def _stat_file(file_path: str) -> Union[tuple[int, int], None]:
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return None
+        return file_stat.st_size, file_stat.st_mtime_ns
+
+
+class ServedReportPrinter(ReportPrinter):
+    """
+    Object that prints (and exports) the reports like ReportPrinter does for a single server request,
+    taking the reports from the resident report store instead of reading every file again.
+    Files are read in the stream mode into compact storage with raw data kept as file spans,
+    so that a report takes little memory and serves the console text, the JSON summary and the HTML export alike.
+    """
+
+    def __init__(self,
+                 report_store: ResidentReportStore,
+                 input_root: str,
+                 file_path_patterns: list[str],
+                 do_export: bool,
+                 export_dest_path: str,
+                 template_env: Union[Environment, None] = None,
+                 **printer_options) -> None:
+        self._report_store = report_store
+        self._input_root = os.path.realpath(input_root)
+        self._template_env = template_env
+        self._report_summaries = []
+        super().__init__(file_path_patterns,
+                         do_export,
+                         export_dest_path,
+                         stream=True,
+                         compact=True,
+                         use_cache=False,
+                         **printer_options)
+        # Every format is served from the same reports
+        self._report_options['keep_raw_data'] = True
+
+    def _get_sorted_abs_path_list_from_pattern_list(self, file_path_patterns: list[str]) -> list[str]:
+        """
+        Searches for files like ReportPrinter does, leaving out the matches (e.g. symbolic links)
+        that resolve to a file outside the input root.
+        :param list[str] file_path_patterns: File path patterns
+        :return list[str]: Natural-sorted absolute file paths list
+        """
+        return [file_path for file_path in super()._get_sorted_abs_path_list_from_pattern_list(file_path_patterns)
+                if os.path.commonpath((self._input_root, os.path.realpath(file_path))) == self._input_root]
+
+    def _check_file_count(self) -> None:
+        """
+        A pattern without matches is answered with an empty summary instead of quitting.
+        :return None
+        """
+
+    def _create_exporter(self, split_export: bool) -> BaseHtmlExporter:
+        """
+        Creates the HTML exporter with the server's template environment.
+        :param bool split_export: Not supported by the server
+        :return BaseHtmlExporter: HTML exporter
+        """
+        return HtmlExporter(self.export_dest_path, template_env=self._template_env)
+
+    def _iter_loaded_reports(self) -> Iterator[tuple[str, Union[Report, None], Union[str, None]]]:
+        """
+        Yields Report objects of the matched files from the resident report store in the sorted file path order.
+        :return Iterator[tuple[str, Union[Report, None], Union[str, None]]]: (file path, Report object
+                                                                              or None, error message or None)
+        """
+        variant = self._get_cache_variant()
+        for file_path in self._file_paths:
+            report, error_message = self._report_store.get(file_path, variant, self._report_options)
+            yield file_path, report, error_message
+
+    def _add_loaded_report(self, file_path: str, report: Union[Report, None], error_message: Union[str, None]) -> None:
+        """
+        Adds loaded Report object like ReportPrinter does and keeps its counters for the JSON summary.
+        :param str file_path: File path the report was loaded from
+        :param Union[Report, None] report: Report object, None if it was not loaded
+        :param Union[str, None] error_message: Reason why the report was not loaded
+        :return None
+        """
+        super()._add_loaded_report(file_path, report, error_message)
+        if report:
+            self._report_summaries.append({'file_path': file_path,
+                                           **{key: report.context[key] for key in _REPORT_SUMMARY_KEYS}})
+
+    def get_summary(self) -> dict:
+        """
+        Returns the global metrics and the counters of every report.
+        :return dict: JSON-serializable summary
+        """
+        summary = {key: self._context[key] for key in ('created_at', 'report_count', 'file_count', 'event_filter',
+                                                       'event_count', 'matched_event_count', 'events_with_errors',
+                                                       'events_with_order_issues', 'unparsed_file_paths')}
+        if self._context['aggregates'] is not None:
+            summary['breakdown'] = get_breakdown(self._context['aggregates'])
+        summary['reports'] = self._report_summaries
+        return summary
+
+    def render_html(self) -> str:
+        """
+        Writes the HTML export and returns its content.
+        :return str: HTML page
+        """
+        try:
+            if self._export_error:
+                raise self._export_error
+            if self._context['aggregates'] is not None:
+                self._context['breakdown'] = get_breakdown(self._context['aggregates'])
+            self._exporter.export(self._context)
+            with open(self.export_dest_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        finally:
+            self._exporter.close()
+
+
+class ReportServer:
+    """
+    Object that answers report requests from the resident report store.
+    Interpreter start-up, imports and template compilation are paid once, a file is read
+    only on its first request (or after it has changed), so a warm request costs the file stats and the printing.
+    Requests are answered one at a time, since they share the console.
+
+    GET /text, /json or /html with the query parameters:
+    files (repeatable file path patterns, relative to the input root, which no file outside of is read from),
+    summary_only, breakdown and the event filters of the 'print' command
+    (event_type, status, username, serial_number, since, until, errors, min_order_issues, max_order_issues).
+    GET /status returns the state of the resident report store.
+    """
+
+    def __init__(self,
+                 memory_budget: int = settings.SERVER_MEMORY_BUDGET,
+                 templates_dir_path: str = settings.DEFAULT_TEMPLATES_DIR_PATH,
+                 input_root: str = settings.SERVER_INPUT_ROOT) -> None:
+        self.input_root = os.path.abspath(input_root)
+        self._report_store = ResidentReportStore(memory_budget)
+        self._template_env = create_template_env(templates_dir_path)
+
+    def respond(self, path: str, query: dict[str, list[str]]) -> tuple[str, bytes]:
+        """
+        Answers a request.
+        :param str path: Request path
+        :param dict[str, list[str]] query: Parsed query parameters
+        :return tuple[str, bytes]: Content type, response body
+        """
+        if path == '/status':
+            return 'application/json', json.dumps(self._report_store.get_status()).encode('utf-8')
+        if path not in ('/text', '/json', '/html'):
+            raise ReportRequestError(404, 'Not found')
+        printer_options = self._get_printer_options(query)
+        if path != '/text':
+            printer_options['summary_only'] = True
+        # Printed output is only returned as text, it's still printed for the other formats to fill the context
+        console_output = io.StringIO()
+        with redirect_console(console_output):
+            if path == '/html':
+                with tempfile.TemporaryDirectory() as export_dir_path:
+                    printer = self._create_printer(printer_options,
+                                                   do_export=True,
+                                                   export_dest_path=os.path.join(export_dir_path, 'export.html'))
+                    printer.print()
+                    try:
+                        return 'text/html; charset=utf-8', printer.render_html().encode('utf-8')
+                    except (IOError, AttributeError, TemplateError) as ex:
+                        raise ReportRequestError(500, f'Export failed ({ex})')
+            printer = self._create_printer(printer_options)
+            printer.print()
+        if path == '/json':
+            return 'application/json', json.dumps(printer.get_summary()).encode('utf-8')
+        # Styles are left out of the text, as they are when the output is not a terminal
+        return 'text/plain; charset=utf-8', _ANSI_STYLE_PATTERN.sub('', console_output.getvalue()).encode('utf-8')
+
+    def _create_printer(self,
+                        printer_options: dict,
+                        do_export: bool = False,
+                        export_dest_path: Union[str, None] = None) -> ServedReportPrinter:
+        return ServedReportPrinter(self._report_store,
+                                   self.input_root,
+                                   do_export=do_export,
+                                   export_dest_path=export_dest_path or settings.get_default_output_path(),
+                                   template_env=self._template_env,
+                                   **printer_options)
+
+    def _get_file_path_patterns(self, query: dict[str, list[str]]) -> list[str]:
+        """
+        Returns the file path patterns specified by the query parameters, joined with the input root
+        (every file of the input root if none were specified).
+        Absolute patterns and patterns that go up a directory are rejected.
+        :param dict[str, list[str]] query: Parsed query parameters
+        :return list[str]: File path patterns
+        """
+        patterns = query.get('files')
+        if not patterns:
+            return [os.path.join(self.input_root, '*')]
+        for pattern in patterns:
+            if os.path.isabs(pattern) or os.path.splitdrive(pattern)[0] or '..' in re.split(r'[\\/]', pattern):
+                raise ReportRequestError(403, f"File pattern '{pattern}' is outside the input directory")
+        return [os.path.join(self.input_root, pattern) for pattern in patterns]
+
+    def _get_printer_options(self, query: dict[str, list[str]]) -> dict:
+        """
+        Returns the printer options specified by the query parameters.
+        :param dict[str, list[str]] query: Parsed query parameters
+        :return dict: Keyword arguments for ServedReportPrinter
+        """
+        def get_flag(name: str) -> Union[bool, None]:
+            values = query.get(name)
+            return values[-1].lower() in _TRUE_VALUES if values else None
+
+        def get_int(name: str) -> Union[int, None]:
+            values = query.get(name)
+            if not values:
+                return None
+            try:
+                return int(values[-1])
+            except ValueError:
+                raise ReportRequestError(400, f"Invalid '{name}' value")
+
+        def get_str(name: str) -> Union[str, None]:
+            values = query.get(name)
+            return values[-1] if values else None
+
+        try:
+            event_filter = EventFilter(event_types=query.get('event_type'),
+                                       status_displays=query.get('status'),
+                                       usernames=query.get('username'),
+                                       serial_numbers=query.get('serial_number'),
+                                       since=get_str('since'),
+                                       until=get_str('until'),
+                                       errors_exist=get_flag('errors'),
+                                       min_order_issues_count=get_int('min_order_issues'),
+                                       max_order_issues_count=get_int('max_order_issues'))
+        except ValueError as ex:
+            raise ReportRequestError(400, f'Invalid since/until time ({ex})')
+        return {'file_path_patterns': self._get_file_path_patterns(query),
+                'summary_only': bool(get_flag('summary_only')),
+                'aggregate': bool(get_flag('breakdown')),
+                'event_filter': event_filter}
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    """
+    Request handler that passes GET requests to the server's ReportServer object.
+    """
+
+    def do_GET(self) -> None:
+        url_parts = urlsplit(self.path)
+        try:
+            content_type, body = self.server.report_server.respond(url_parts.path, parse_qs(url_parts.query))
+        except ReportRequestError as ex:
+            self.send_error(ex.status, str(ex))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Clients of a Unix socket have no address
+        return self.client_address[0] if self.client_address else 'unix socket'
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    """
+    HTTP server listening on a Unix socket, which is removed once the server is closed.
+    """
+
+    def server_bind(self) -> None:
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def create_server(report_server: ReportServer,
+                  host: str = settings.SERVER_HOST,
+                  port: int = settings.SERVER_PORT,
+                  socket_path: Union[str, None] = None,
+                  quiet: bool = True) -> Union[HTTPServer, UnixHTTPServer]:
+    """
+    Creates the HTTP server that answers the requests with passed ReportServer object.
+    :param ReportServer report_server: Report server
+    :param str host: Host to listen on
+    :param int port: Port to listen on, a free one is picked for 0
+    :param Union[str, None] socket_path: Unix socket path to listen on instead of the port
+    :param bool quiet: Whether to leave requests out of the log
+    :return Union[HTTPServer, UnixHTTPServer]: Server, not yet serving
+    """
+    if socket_path:
+        server = UnixHTTPServer(socket_path, ReportRequestHandler)
+    else:
+        server = HTTPServer((host, port), ReportRequestHandler)
+    server.report_server = report_server
+    server.quiet = quiet
+    return server
@@ -0,0 +1,320 @@
+import codecs
+import json
+from typing import Any, BinaryIO, Iterator, Union
+
+from conf import settings
+from modules.input_files import is_compressed_file, is_ndjson_file, open_input_file
+from modules.raw_data import FileSpanRawEventData, TextRawEventData
+
+
+class EventStreamReader:
+    """
+    Object that incrementally reads an event history file.
+    Top-level fields are decoded eagerly, while elements of the 'results' array
+    are decoded one at a time, so only a single event is held in memory at once.
+    Byte offsets are tracked along the way, so that every event can refer to its raw payload
+    as a span of the source file instead of being re-encoded.
+    Newline-delimited JSON (one event per line) is read the same way, line by line.
+    The source is read in binary chunks, so it may also be a file object, e.g. a decompressing one.
+    """
+
+    RESULTS_KEY = 'results'
+    RESULTS_WITH_RAW_DATA_KEY = 'results_with_raw_data'
+
+    def __init__(self,
+                 source: Union[str, BinaryIO],
+                 chunk_size: int = settings.STREAM_READ_CHUNK_SIZE,
+                 ndjson: Union[bool, None] = None) -> None:
+        """
+        :param Union[str, BinaryIO] source: File path (compressed files are decompressed on the fly)
+                                            or a binary file object, which is closed once it's read
+        :param int chunk_size: Amount of bytes read at a time
+        :param Union[bool, None] ndjson: Whether the source holds one event per line,
+                                         told by the file path suffix if None
+        """
+        if isinstance(source, str):
+            self.file_path = source
+            self._source_file = None
+        else:
+            self.file_path = None
+            self._source_file = source
+        self._ndjson = is_ndjson_file(self.file_path) if ndjson is None and self.file_path else bool(ndjson)
+        # Raw payloads are referred to as file spans only if the read byte offsets are the file offsets
+        self._spans_raw_data = self.file_path is not None and not is_compressed_file(self.file_path)
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._file = None
+        self._buffer = ''
+        self._pos = 0
+        self._byte_pos = 0
+        self._eof = False
+
+    def read(self, raw_data: bool = False) -> dict:
+        """
+        Opens the file and decodes top-level fields up to the 'results' array,
+        which is put into the returned dictionary as a lazy event iterator.
+        Fields that follow the 'results' array are added once the iterator is exhausted.
+        :param bool raw_data: Whether to yield (event, raw payload span) pairs
+                              by the 'results_with_raw_data' key instead of 'results'
+        :return dict: Event payload dictionary with lazily decoded 'results'
+        """
+        self._file = self._source_file or open_input_file(self.file_path)
+        try:
+            payload = {}
+            if self._ndjson:
+                if raw_data:
+                    payload[self.RESULTS_WITH_RAW_DATA_KEY] = self._iter_lines(raw_data=True)
+                else:
+                    payload[self.RESULTS_KEY] = self._iter_lines()
+                return payload
+            self._skip_whitespace()
+            self._expect('{')
+            if self._read_fields(payload, stop_at_results=True):
+                if raw_data:
+                    payload[self.RESULTS_WITH_RAW_DATA_KEY] = self._iter_results(payload, raw_data=True)
+                else:
+                    payload[self.RESULTS_KEY] = self._iter_results(payload)
+            else:
+                self._close()
+            return payload
+        except Exception:
+            self._close()
+            raise
+
+    def _read_fields(self, payload: dict, stop_at_results: bool) -> bool:
+        """
+        Decodes top-level object fields into the passed payload dictionary.
+        :param dict payload: Dictionary the decoded fields are put into
+        :param bool stop_at_results: Whether to stop right before the value of the 'results' array
+        :return bool: True if reading stopped at the 'results' array, False if the object was closed
+        """
+        self._skip_whitespace()
+        if self._peek() == '}':
+            self._move_to(self._pos + 1)
+            return False
+        while True:
+            self._skip_whitespace()
+            key = self._decode_value()
+            self._skip_whitespace()
+            self._expect(':')
+            self._skip_whitespace()
+            if stop_at_results and key == self.RESULTS_KEY and self._peek() == '[':
+                self._move_to(self._pos + 1)
+                return True
+            payload[key] = self._decode_value()
+            if not self._read_field_separator():
+                return False
+
+    def _iter_results(self, payload: dict, raw_data: bool = False) -> Iterator[Any]:
+        """
+        Yields decoded elements of the 'results' array one by one,
+        then reads the remaining top-level fields into the payload and closes the file.
+        :param dict payload: Payload dictionary the remaining fields are put into
+        :param bool raw_data: Whether to yield each element together with its raw payload span
+        :return Iterator[Any]: Decoded 'results' elements
+        """
+        try:
+            self._skip_whitespace()
+            if self._peek() == ']':
+                self._move_to(self._pos + 1)
+            else:
+                while True:
+                    self._skip_whitespace()
+                    if raw_data:
+                        offset = self._byte_pos
+                        if self._spans_raw_data:
+                            event_data = self._decode_value()
+                            event_raw_data = FileSpanRawEventData(self.file_path, offset, self._byte_pos - offset)
+                        else:
+                            event_data, event_text = self._decode_value(with_text=True)
+                            event_raw_data = TextRawEventData(event_text)
+                        yield event_data, event_raw_data
+                    else:
+                        yield self._decode_value()
+                    self._skip_whitespace()
+                    char = self._peek()
+                    self._move_to(self._pos + 1)
+                    if char == ']':
+                        break
+                    if char != ',':
+                        self._raise_decode_error("Expecting ',' delimiter")
+            if self._read_field_separator():
+                self._read_fields(payload, stop_at_results=False)
+        finally:
+            self._close()
+
+    def _iter_lines(self, raw_data: bool = False) -> Iterator[Any]:
+        """
+        Yields the events of a newline-delimited JSON source one by one, blank lines are skipped.
+        Lines are split in the read byte chunks and decoded as they are, without decoding the chunks to text.
+        :param bool raw_data: Whether to yield each event together with its raw payload
+        :return Iterator[Any]: Decoded events
+        """
+        try:
+            buffer = b''
+            buffer_offset = 0
+            while True:
+                # The chunk grows with a pending long line, so that the line is not copied over for every small chunk
+                data = self._file.read(max(self._chunk_size, len(buffer)))
+                search_start = len(buffer)
+                buffer += data
+                line_start = 0
+                line_end = buffer.find(b'\n', search_start)
+                while line_end != -1:
+                    yield from self._decode_line(buffer, line_start, line_end, buffer_offset, raw_data)
+                    line_start = line_end + 1
+                    line_end = buffer.find(b'\n', line_start)
+                if not data:
+                    yield from self._decode_line(buffer, line_start, len(buffer), buffer_offset, raw_data)
+                    return
+                buffer = buffer[line_start:]
+                buffer_offset += line_start
+        finally:
+            self._close()
+
+    def _decode_line(self, buffer: bytes, start: int, end: int, buffer_offset: int, raw_data: bool) -> Iterator[Any]:
+        """
+        Decodes the event on a single line of a newline-delimited JSON source, if it's not blank.
+        :param bytes buffer: Buffer that holds the line
+        :param int start: Line start in the buffer
+        :param int end: Line end in the buffer
+        :param int buffer_offset: Byte offset of the buffer in the source
+        :param bool raw_data: Whether to yield the event together with its raw payload
+        :return Iterator[Any]: Decoded event (or event and raw payload pair), nothing for a blank line
+        """
+        line = buffer[start:end]
+        event_bytes = line.strip()
+        if not event_bytes:
+            return
+        event_data = json.loads(event_bytes)
+        if not raw_data:
+            yield event_data
+            return
+        if self._spans_raw_data:
+            offset = buffer_offset + start + len(line) - len(line.lstrip())
+            event_raw_data = FileSpanRawEventData(self.file_path, offset, len(event_bytes))
+        else:
+            event_raw_data = TextRawEventData(event_bytes.decode('utf-8'))
+        yield event_data, event_raw_data
+
+    def _read_field_separator(self) -> bool:
+        """
+        Consumes the separator that follows a top-level field value.
+        :return bool: True if another field follows, False if the object was closed
+        """
+        self._skip_whitespace()
+        char = self._peek()
+        self._move_to(self._pos + 1)
+        if char == ',':
+            return True
+        if char == '}':
+            return False
+        self._raise_decode_error("Expecting ',' delimiter")
+
+    def _decode_value(self, with_text: bool = False) -> Any:
+        """
+        Decodes a single JSON value that starts at the current buffer position,
+        reading more of the file whenever the value is not complete yet.
+        :param bool with_text: Whether to also return the source text of the value
+        :return Any: Decoded value (or decoded value and source text pair)
+        """
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.decoder.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._fill_buffer()
+                continue
+            # A value that ends right at the end of the buffer might be a truncated number or literal
+            if end == len(self._buffer) and not self._eof:
+                self._fill_buffer()
+                continue
+            text = self._buffer[self._pos:end] if with_text else None
+            self._move_to(end)
+            self._compact_buffer()
+            return (value, text) if with_text else value
+
+    def _skip_whitespace(self) -> None:
+        """
+        Moves the buffer position past any JSON whitespace.
+        :return None
+        """
+        while True:
+            end = self._pos
+            while end < len(self._buffer) and self._buffer[end] in ' \t\n\r':
+                end += 1
+            self._move_to(end)
+            if self._pos < len(self._buffer) or self._eof:
+                return
+            self._fill_buffer()
+
+    def _peek(self) -> str:
+        """
+        Returns the character at the current buffer position.
+        :return str: Current character
+        """
+        if self._pos >= len(self._buffer):
+            self._raise_decode_error('Unexpected end of file')
+        return self._buffer[self._pos]
+
+    def _expect(self, char: str) -> None:
+        """
+        Consumes the expected character or raises a decode error.
+        :param str char: Expected character
+        :return None
+        """
+        if self._peek() != char:
+            self._raise_decode_error(f"Expecting '{char}'")
+        self._move_to(self._pos + 1)
+
+    def _move_to(self, end: int) -> None:
+        """
+        Moves the buffer position to the passed index, keeping track of the file byte offset.
+        :param int end: New buffer position
+        :return None
+        """
+        span = self._buffer[self._pos:end]
+        self._byte_pos += len(span) if span.isascii() else len(span.encode('utf-8'))
+        self._pos = end
+
+    def _fill_buffer(self) -> None:
+        """
+        Reads the next chunk of the file into the buffer.
+        The chunk grows with the pending data so that big values are not re-decoded too often.
+        :return None
+        """
+        self._compact_buffer(force=True)
+        data = self._file.read(max(self._chunk_size, len(self._buffer)))
+        # Multibyte characters split between two chunks are completed with the next one
+        self._buffer += self._text_decoder.decode(data, final=not data)
+        if not data:
+            self._eof = True
+
+    def _compact_buffer(self, force: bool = False) -> None:
+        """
+        Drops already consumed data from the beginning of the buffer.
+        :param bool force: Whether to compact regardless of the amount of consumed data
+        :return None
+        """
+        if self._pos and (force or self._pos >= self._chunk_size):
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+    def _raise_decode_error(self, message: str) -> None:
+        """
+        Raises JSONDecodeError pointing at the current buffer position.
+        :param str message: Error message
+        :return None
+        """
+        raise json.decoder.JSONDecodeError(message, self._buffer, self._pos)
+
+    def _close(self) -> None:
+        """
+        Closes the underlying file (or the passed file object).
+        :return None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
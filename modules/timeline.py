@@ -0,0 +1,248 @@
+import json
+from typing import Any, Union
+
+# Fields whose values are followed through a timeline as the order's transitions
+TRANSITION_FIELDS = ('state', 'status')
+
+
+class _Absent:
+    """
+    Value of a field that is not in a snapshot (as opposed to a field that is null).
+    """
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return '(absent)'
+
+
+ABSENT = _Absent()
+
+
+class TimelineEntry:
+    """
+    Event of an order's timeline with the field-level changes of the order's snapshot it brought.
+    Changes are (field path, old value, new value) tuples, the first entry of a timeline
+    has every field of the initial snapshot as a change from ABSENT.
+    """
+    __slots__ = ('event_id', 'event_time_key', 'event_time', 'event_type', 'username', 'changes')
+
+    def __init__(self,
+                 event_id: Any,
+                 event_time_key: str,
+                 event_time: str,
+                 event_type: str,
+                 username: str,
+                 changes: list[tuple[str, Any, Any]]) -> None:
+        self.event_id = event_id
+        self.event_time_key = event_time_key
+        self.event_time = event_time
+        self.event_type = event_type
+        self.username = username
+        self.changes = changes
+
+    def get_sort_key(self) -> tuple:
+        return self.event_time_key, str(self.event_id)
+
+
+class _OrderTimeline:
+    """
+    Entries of an order in the order they were added, together with the order's latest added snapshot,
+    which the following entry is diffed against.
+    """
+    __slots__ = ('order_key', 'entries', 'event_ids', 'last_fields')
+
+    def __init__(self, order_key: Any) -> None:
+        self.order_key = order_key
+        self.entries = []
+        self.event_ids = set()
+        self.last_fields = {}
+
+
+class TimelineCollector:
+    """
+    Object that groups the events by order (model_data's id, or reference) across all reports
+    and keeps every event as the diff of the order's snapshot against the previous event's one.
+    An order's latest snapshot is the only one kept in full (flattened to field paths),
+    so a long-lived order costs its changes instead of a model_data copy per event.
+    Events may come in any order: the timelines are put in the event time order once they're requested,
+    history pages usually list the newest event first, in which case the diffs are just inverted.
+    """
+
+    def __init__(self) -> None:
+        self._timelines = {}
+        # Events without model_data to tell the order by
+        self.skipped_event_count = 0
+
+    def add(self, event_data: dict, event_metadata) -> None:
+        """
+        Adds an event to its order's timeline, an event that is already there (e.g. read from an overlapping file)
+        is left out.
+        :param dict event_data: Uncleaned dictionary of an event object's fields
+        :param event_metadata: EventMetaData object built from the event
+        :return None
+        """
+        model_data = event_data.get('model_data')
+        order_key = (model_data.get('id') or model_data.get('reference')) if isinstance(model_data, dict) else None
+        if order_key is None:
+            self.skipped_event_count += 1
+            return
+        timeline = self._timelines.get(order_key)
+        if timeline is None:
+            timeline = self._timelines[order_key] = _OrderTimeline(order_key)
+        event_id = event_data.get('id')
+        if event_id in timeline.event_ids:
+            return
+        timeline.event_ids.add(event_id)
+        fields = flatten_fields(model_data)
+        event_time_key = event_data.get('event_time')
+        timeline.entries.append(TimelineEntry(event_id,
+                                              event_time_key if isinstance(event_time_key, str) else '',
+                                              event_metadata.event_time,
+                                              event_metadata.event_type,
+                                              event_metadata.username,
+                                              get_changes(timeline.last_fields, fields)))
+        timeline.last_fields = fields
+
+    def get_timelines(self) -> list[dict]:
+        """
+        Returns the timelines of every order in the event time order, ready to be shown.
+        :return list[dict]: Order timelines, the earliest started order first
+        """
+        timelines = []
+        for timeline in self._timelines.values():
+            self._sort_entries(timeline)
+            timelines.append(_get_timeline_context(timeline))
+        timelines.sort(key=lambda timeline_context: (timeline_context['started_at_key'],
+                                                     str(timeline_context['order_key'])))
+        return timelines
+
+    @staticmethod
+    def _sort_entries(timeline: _OrderTimeline) -> None:
+        """
+        Puts the entries of a timeline in the event time order, diffing them against their new predecessors.
+        :param _OrderTimeline timeline: Order timeline
+        :return None
+        """
+        entries = timeline.entries
+        sort_keys = [entry.get_sort_key() for entry in entries]
+        order = sorted(range(len(entries)), key=sort_keys.__getitem__)
+        if order == list(range(len(entries))):
+            return
+        if order == list(reversed(range(len(entries)))):
+            # Every diff turns into the inverted diff of the entry that followed it,
+            # the latest snapshot becomes the initial one
+            last_fields = _apply_changes({}, entries[0].changes)
+            changes = [get_changes({}, timeline.last_fields)]
+            changes.extend([(path, new_value, old_value) for path, old_value, new_value in entry.changes]
+                           for entry in reversed(entries[1:]))
+        else:
+            # Snapshots are restored from the latest one backwards and diffed again in the new order
+            snapshots = [timeline.last_fields]
+            for entry in reversed(entries[1:]):
+                snapshots.append(_apply_changes(dict(snapshots[-1]),
+                                                [(path, new_value, old_value)
+                                                 for path, old_value, new_value in entry.changes]))
+            snapshots.reverse()
+            last_fields = snapshots[order[-1]]
+            changes = [get_changes(snapshots[order[position - 1]] if position else {}, snapshots[index])
+                       for position, index in enumerate(order)]
+        timeline.entries = [entries[index] for index in order]
+        for entry, entry_changes in zip(timeline.entries, changes):
+            entry.changes = entry_changes
+        timeline.last_fields = last_fields
+
+
+def flatten_fields(value: Any, path: str = '', fields: Union[dict, None] = None) -> dict[str, Any]:
+    """
+    Flattens a snapshot into field path -> value pairs ('three_pl.company_name', 'order_items[id=942573].quantity').
+    Elements of a list are told apart by their ids if they have ones, by their positions otherwise,
+    empty objects and lists are values of their own.
+    :param Any value: Snapshot (or a part of it)
+    :param str path: Path of the value
+    :param Union[dict, None] fields: Dictionary the fields are put into
+    :return dict[str, Any]: Field path -> value
+    """
+    if fields is None:
+        fields = {}
+    if isinstance(value, dict) and value:
+        for key, item in value.items():
+            flatten_fields(item, f'{path}.{key}' if path else str(key), fields)
+    elif isinstance(value, list) and value:
+        for index, item in enumerate(value):
+            item_id = item.get('id') if isinstance(item, dict) else None
+            flatten_fields(item, f'{path}[id={item_id}]' if item_id is not None else f'{path}[{index}]', fields)
+    else:
+        fields[path] = value
+    return fields
+
+
+def get_changes(old_fields: dict[str, Any], new_fields: dict[str, Any]) -> list[tuple[str, Any, Any]]:
+    """
+    Returns the field-level diff between two flattened snapshots.
+    :param dict[str, Any] old_fields: Previous snapshot's fields
+    :param dict[str, Any] new_fields: Next snapshot's fields
+    :return list[tuple[str, Any, Any]]: (field path, old value, new value), ABSENT for an added or removed field,
+                                        ordered by the field path
+    """
+    changes = [(path, old_fields.get(path, ABSENT), value) for path, value in new_fields.items()
+               if path not in old_fields or old_fields[path] != value]
+    changes.extend((path, value, ABSENT) for path, value in old_fields.items() if path not in new_fields)
+    # Snapshots restored from diffs don't keep the field order of the source ones, the path order doesn't depend on it
+    changes.sort(key=lambda change: change[0])
+    return changes
+
+
+def _apply_changes(fields: dict[str, Any], changes: list[tuple[str, Any, Any]]) -> dict[str, Any]:
+    for path, _, new_value in changes:
+        if new_value is ABSENT:
+            fields.pop(path, None)
+        else:
+            fields[path] = new_value
+    return fields
+
+
+def format_field_value(value: Any) -> str:
+    """
+    Returns a field value as it's shown, JSON-encoded so that e.g. an empty string and null are told apart.
+    :param Any value: Field value
+    :return str: Shown value
+    """
+    if value is ABSENT:
+        return '(absent)'
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _get_timeline_context(timeline: _OrderTimeline) -> dict:
+    """
+    Returns a sorted order timeline with the values formatted to be shown.
+    :param _OrderTimeline timeline: Order timeline
+    :return dict: Order timeline context
+    """
+    transitions = {field: [] for field in TRANSITION_FIELDS}
+    entries = []
+    for entry in timeline.entries:
+        for path, _, new_value in entry.changes:
+            if path in transitions and new_value is not ABSENT:
+                transitions[path].append(format_field_value(new_value))
+        is_initial = not entries
+        # The initial snapshot is shown by its transition fields only
+        shown_changes = entry.changes
+        if is_initial:
+            shown_changes = [change for change in shown_changes if change[0] in transitions]
+        entries.append({'event_id': entry.event_id,
+                        'event_time': entry.event_time,
+                        'event_type': entry.event_type,
+                        'username': entry.username,
+                        'is_initial': is_initial,
+                        'field_count': len(entry.changes),
+                        'changes': [{'field': path,
+                                     'old_value': format_field_value(old_value),
+                                     'new_value': format_field_value(new_value)}
+                                    for path, old_value, new_value in shown_changes]})
+    reference = timeline.last_fields.get('reference')
+    return {'order_key': timeline.order_key,
+            'reference': reference if isinstance(reference, str) else '',
+            'event_count': len(entries),
+            'started_at_key': timeline.entries[0].event_time_key if timeline.entries else '',
+            'transitions': [{'field': field, 'values': values} for field, values in transitions.items() if values],
+            'entries': entries}
@@ -0,0 +1,90 @@
+from datetime import datetime
+from functools import lru_cache
+
+from conf import settings
+
+# Format of the event timestamps in the input files
+SOURCE_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+# Format of the event timestamps in the reports
+DISPLAY_TIMESTAMP_FORMAT = '%d.%m.%Y, %H:%M'
+# Length of a source timestamp with every field zero-padded, e.g. '2020-07-28T20:03:02.433976Z'
+_CANONICAL_TIMESTAMP_LENGTH = 27
+
+
+def format_timestamp_string_strptime(timestamp_str: str) -> str:
+    """
+    Reforms passed source timestamp string into the display format with the general-purpose
+    strptime/strftime. Reference implementation of format_timestamp_string().
+    :param str timestamp_str: string that's supposed to be formatted.
+    :return str: formatted timestamp string, empty if it could not be parsed
+    """
+    try:
+        formatted_timestamp_str = datetime.strftime(
+            datetime.strptime(
+                timestamp_str,
+                SOURCE_TIMESTAMP_FORMAT
+            ), DISPLAY_TIMESTAMP_FORMAT)
+    except ValueError:
+        formatted_timestamp_str = ''
+    return formatted_timestamp_str
+
+
+def format_timestamp_string(timestamp_str: str) -> str:
+    """
+    Reforms passed source timestamp string into the display format.
+    Canonical (zero-padded, microsecond) timestamps are parsed by slicing,
+    and their minute-resolution display strings are memoized, since neighbouring events
+    tend to share the same minute. Anything else falls back to strptime,
+    so the results are exactly the same as format_timestamp_string_strptime() ones.
+    :param str timestamp_str: string that's supposed to be formatted.
+    :return str: formatted timestamp string, empty if it could not be parsed
+    """
+    if (type(timestamp_str) is str
+            and len(timestamp_str) == _CANONICAL_TIMESTAMP_LENGTH
+            and timestamp_str.isascii()
+            and timestamp_str[4] == '-' and timestamp_str[7] == '-' and timestamp_str[10] == 'T'
+            and timestamp_str[13] == ':' and timestamp_str[16] == ':' and timestamp_str[19] == '.'
+            and timestamp_str[26] == 'Z'):
+        seconds = timestamp_str[17:19]
+        if not (seconds.isdigit() and timestamp_str[20:26].isdigit()):
+            return format_timestamp_string_strptime(timestamp_str)
+        if seconds >= '60':
+            return ''
+        return _format_minute_prefix(timestamp_str[:16])
+    return format_timestamp_string_strptime(timestamp_str)
+
+
+@lru_cache(maxsize=settings.TIMESTAMP_CACHE_SIZE)
+def _format_minute_prefix(minute_prefix: str) -> str:
+    """
+    Formats the minute-resolution prefix of a canonical source timestamp ('%Y-%m-%dT%H:%M').
+    :param str minute_prefix: Timestamp prefix
+    :return str: formatted timestamp string, empty if it's not a valid date and time
+    """
+    year, month, day = minute_prefix[0:4], minute_prefix[5:7], minute_prefix[8:10]
+    hour, minute = minute_prefix[11:13], minute_prefix[14:16]
+    if not (year.isdigit() and month.isdigit() and day.isdigit() and hour.isdigit() and minute.isdigit()):
+        return format_timestamp_string_strptime(f'{minute_prefix}:00.000000Z')
+    if year < '1000':
+        # strftime's year padding is platform-dependent below 1000, so it's left to datetime
+        try:
+            return datetime(int(year), int(month), int(day), int(hour), int(minute)).strftime(DISPLAY_TIMESTAMP_FORMAT)
+        except ValueError:
+            return ''
+    if not ('01' <= month <= '12' and hour < '24' and minute < '60'
+            and '01' <= day and int(day) <= _days_in_month(int(year), int(month))):
+        return ''
+    return f'{day}.{month}.{year}, {hour}:{minute}'
+
+
+def _days_in_month(year: int, month: int) -> int:
+    """
+    Returns the amount of days in specified month of the Gregorian calendar.
+    :param int year: Year
+    :param int month: Month number (1-12)
+    :return int: Amount of days
+    """
+    if month == 2:
+        return 29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28
+    return 30 if month in (4, 6, 9, 11) else 31
+
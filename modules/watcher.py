@@ -0,0 +1,212 @@
+import glob
+import os
+import time
+from typing import Union
+
+import natsort
+
+from conf import settings
+from modules.aggregation import add_aggregates
+from modules.html_exporter import BaseHtmlExporter, FragmentHtmlExporter
+from modules.printer import ReportPrinter, print_message
+from modules.raw_data import close_mapped_file, close_mapped_files
+from modules.report import Report
+
+# Keys of the global context counters each report contributes to
+_CONTRIBUTION_KEYS = ('event_count', 'matched_event_count', 'events_with_errors', 'events_with_order_issues')
+
+
+class ReportWatcher(ReportPrinter):
+    """
+    Object that prints the reports like ReportPrinter does and then keeps watching the file patterns.
+    Files are polled by their size and mtime; when a file appears, changes or disappears only that file
+    is (re)read, its previous contribution to the global metrics is replaced by the new one,
+    and the final summary (and the HTML export) is refreshed.
+    """
+
+    def __init__(self,
+                 file_path_patterns: list[str],
+                 do_export: bool,
+                 export_dest_path: str,
+                 poll_interval: float = settings.WATCH_POLL_INTERVAL,
+                 **printer_options) -> None:
+        self.file_path_patterns = file_path_patterns
+        self.poll_interval = poll_interval
+        # File path -> (counters, aggregates) the file's report added to the global context, None for an unparsed file
+        self._report_contributions = {}
+        super().__init__(file_path_patterns, do_export, export_dest_path, **printer_options)
+
+    def _check_file_count(self) -> None:
+        """
+        Files may appear later, so an empty match is not a reason to quit.
+        :return None
+        """
+
+    def _create_exporter(self, split_export: bool) -> BaseHtmlExporter:
+        """
+        Creates the HTML exporter whose reports can be replaced one by one.
+        :param bool split_export: Not supported in the watch mode
+        :return BaseHtmlExporter: HTML exporter
+        """
+        return FragmentHtmlExporter(self.export_dest_path, **self._get_fragment_options())
+
+    def watch(self) -> None:
+        """
+        Prints the reports and the final summary, then applies the file changes until interrupted.
+        :return None
+        """
+        file_stats = self._stat_files(self._file_paths)
+        self.print()
+        if self._exporter:
+            self._write_export()
+        self._print_watching_message()
+        try:
+            while True:
+                time.sleep(self.poll_interval)
+                file_stats = self._apply_file_changes(file_stats)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self._exporter:
+                self._exporter.close()
+            close_mapped_files()
+
+    def _apply_file_changes(self, file_stats: dict[str, tuple[int, int]]) -> dict[str, tuple[int, int]]:
+        """
+        Re-reads the files that appeared or changed since the previous poll,
+        removes the reports of the files that disappeared and refreshes the summary if anything changed.
+        :param dict[str, tuple[int, int]] file_stats: File path -> (size, mtime) of the previous poll
+        :return dict[str, tuple[int, int]]: File path -> (size, mtime) of this poll
+        """
+        current_file_stats = self._stat_files(self._glob_abs_paths())
+        removed_file_paths = [file_path for file_path in self._report_contributions
+                              if file_path not in current_file_stats]
+        changed_file_paths = [file_path for file_path, file_stat in current_file_stats.items()
+                              if file_stats.get(file_path) != file_stat]
+        if not removed_file_paths and not changed_file_paths:
+            return current_file_stats
+
+        self._file_paths = natsort.natsorted(current_file_stats)
+        self._context['file_count'] = len(self._file_paths)
+        for file_path in natsort.natsorted(removed_file_paths):
+            self._remove_report(file_path)
+        for file_path in natsort.natsorted(changed_file_paths):
+            self._reload_report(file_path)
+        if self._cache:
+            self._cache.save()
+        self._print_final_summary()
+        if self._exporter:
+            self._write_export()
+        self._print_watching_message()
+        return current_file_stats
+
+    def _glob_abs_paths(self) -> set[str]:
+        """
+        Searches for files for each watched pattern.
+        :return set[str]: Absolute file paths
+        """
+        abs_path_set = set()
+        for pattern in self.file_path_patterns:
+            abs_path_set.update(self._get_abs_path_str(match) for match in glob.glob(pattern))
+        return abs_path_set
+
+    @staticmethod
+    def _stat_files(file_paths: Union[list[str], set[str]]) -> dict[str, tuple[int, int]]:
+        """
+        Returns the size and mtime of specified files, files that could not be accessed are left out.
+        :param Union[list[str], set[str]] file_paths: File paths
+        :return dict[str, tuple[int, int]]: File path -> (size, mtime in nanoseconds)
+        """
+        file_stats = {}
+        for file_path in file_paths:
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+            file_stats[file_path] = (file_stat.st_size, file_stat.st_mtime_ns)
+        return file_stats
+
+    def _reload_report(self, file_path: str) -> None:
+        """
+        Replaces the report of a new or changed file.
+        :param str file_path: File path
+        :return None
+        """
+        self._remove_report_contribution(file_path)
+        # A memory map of the previous file content must not be read from
+        close_mapped_file(file_path)
+        report = self._cache.load(file_path) if self._cache and self._cache.contains(file_path) else None
+        is_cached = report is not None
+        if is_cached:
+            error_message = None
+        else:
+            report, error_message, _ = self.load_report(file_path, self.stream, self._report_options)
+        if self._exporter and not report:
+            self._exporter.remove_report(file_path)
+        self._add_loaded_report(file_path, report, error_message)
+        if report and not is_cached and self._cache:
+            self._cache.store(file_path, report)
+
+    def _remove_report(self, file_path: str) -> None:
+        """
+        Removes the report of a file that disappeared.
+        :param str file_path: File path
+        :return None
+        """
+        self._print_report_title(file_path)
+        print_message(f"'{file_path}' was removed.", 'WARNING')
+        self._remove_report_contribution(file_path)
+        close_mapped_file(file_path)
+        if self._exporter:
+            self._exporter.remove_report(file_path)
+
+    def _add_loaded_report(self, file_path: str, report: Union[Report, None], error_message: Union[str, None]) -> None:
+        """
+        Adds loaded Report object like ReportPrinter does and records its contribution to the global metrics.
+        :param str file_path: File path the report was loaded from
+        :param Union[Report, None] report: Report object, None if it was not loaded
+        :param Union[str, None] error_message: Reason why the report was not loaded
+        :return None
+        """
+        super()._add_loaded_report(file_path, report, error_message)
+        if report:
+            self._report_contributions[file_path] = (tuple(report.context[key] for key in _CONTRIBUTION_KEYS),
+                                                     report.context['aggregates'])
+        else:
+            self._report_contributions[file_path] = None
+
+    def _remove_report_contribution(self, file_path: str) -> None:
+        """
+        Subtracts the previous contribution of specified file from the global metrics.
+        :param str file_path: File path
+        :return None
+        """
+        if file_path not in self._report_contributions:
+            return
+        contribution = self._report_contributions.pop(file_path)
+        if contribution is None:
+            self._context['unparsed_file_paths'].remove(file_path)
+            return
+        counts, aggregates = contribution
+        for key, value in zip(_CONTRIBUTION_KEYS, counts):
+            self._context[key] -= value
+        if self._context['aggregates'] is not None and aggregates:
+            add_aggregates(self._context['aggregates'], aggregates, sign=-1)
+        self._context['report_count'] -= 1
+
+    def _write_export(self) -> None:
+        """
+        Writes the HTML export like ReportPrinter does; a rendering failure is only reported once,
+        so that the following changes are exported again.
+        :return None
+        """
+        super()._write_export()
+        self._export_error = None
+
+    @staticmethod
+    def _print_watching_message() -> None:
+        """
+        Prints the message that the files are being watched.
+        :return None
+        """
+        print_message('Watching for changes (Ctrl+C to stop)...', 'OK')
@@ -0,0 +1,73 @@
+import random
+import tracemalloc
+
+from modules.event_id_index import EventIdIndex
+
+
+def _get_allocated_size(ids) -> tuple:
+    tracemalloc.start()
+    try:
+        event_id_index = EventIdIndex()
+        for event_id in ids:
+            event_id_index.add(event_id)
+        allocated_size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return event_id_index, allocated_size
+
+
+def _assert_matches_set(event_ids: list, lookup_ids: list) -> EventIdIndex:
+    event_id_index, seen_ids = EventIdIndex(), set()
+    for event_id in event_ids:
+        assert event_id_index.add(event_id) == (event_id not in seen_ids)
+        seen_ids.add(event_id)
+    assert len(event_id_index) == len(seen_ids)
+    for event_id in lookup_ids:
+        assert (event_id in event_id_index) == (event_id in seen_ids)
+    return event_id_index
+
+
+def test_sparse_ids():
+    rnd = random.Random(1)
+    event_ids = [rnd.randrange(1 << 40) for _ in range(20000)]
+    event_id_index = _assert_matches_set(event_ids + event_ids[:1000], event_ids + [id_ + 1 for id_ in event_ids])
+    assert not event_id_index._containers
+
+
+def test_containers_switch():
+    rnd = random.Random(2)
+    # Ranges of a few ids stay sparse, ranges of more get an array container, then a bitmap one
+    event_ids = [rnd.randrange(1 << 20) for _ in range(100000)] + [rnd.randrange(1 << 40) for _ in range(5000)]
+    rnd.shuffle(event_ids)
+    event_id_index = _assert_matches_set(event_ids, [rnd.randrange(1 << 20) for _ in range(20000)] + event_ids)
+    container_types = {type(container) for container in event_id_index._containers.values()}
+    assert container_types == {bytearray}
+    assert event_id_index._sparse_chunks
+
+    event_id_index = _assert_matches_set([rnd.randrange(1 << 24) for _ in range(20000)], list(range(1 << 16)))
+    container_types = {type(container).__name__ for container in event_id_index._containers.values()}
+    assert container_types == {'array'}
+
+
+def test_ascending_and_descending_ids():
+    _assert_matches_set(list(range(0, 300000, 3)), list(range(300000)))
+    _assert_matches_set(list(range(300000, 0, -7)), list(range(300000)))
+
+
+def test_other_ids():
+    event_ids = [None, 'a1', -5, 1.5, True, 5, '5', 5, None, -5]
+    _assert_matches_set(event_ids, event_ids + [6, 'a2', 0])
+
+
+def test_dense_ids_memory():
+    event_id_index, allocated_size = _get_allocated_size(range(1_000_000))
+    assert len(event_id_index) == 1_000_000
+    assert allocated_size / len(event_id_index) < 0.25
+
+
+def test_sparse_ids_memory():
+    rnd = random.Random(3)
+    event_ids = [rnd.randrange(1 << 40) for _ in range(100_000)]
+    event_id_index, allocated_size = _get_allocated_size(event_ids)
+    assert len(event_id_index) == len(set(event_ids))
+    assert allocated_size / len(event_id_index) < 12
@@ -0,0 +1,106 @@
+import random
+import sys
+
+from modules.metadata_store import DictionaryEncodedColumn, EventMetaDataStore
+from modules.raw_data import TextRawEventData
+from modules.report import Report
+
+_FIELDS = ('event_type', 'event_time', 'username', 'serial_number', 'status_display', 'order_issues_count',
+           'errors_exist')
+
+
+def _get_event_metadata(rnd: random.Random, with_raw_data: bool = False) -> Report.EventMetaData:
+    return Report.EventMetaData(event_type=rnd.choice(('CREATION', 'UPDATE', 'TRANSITION')),
+                                event_time=rnd.choice(('', f'{rnd.randrange(1, 29):02d}.07.2020, '
+                                                           f'{rnd.randrange(24):02d}:{rnd.randrange(60):02d}')),
+                                username=rnd.choice(('', 'kiril@globaventure.com', 'ops@example.com')),
+                                serial_number=str(rnd.randrange(5)),
+                                status_display=rnd.choice(('Draft', 'Action required', '')),
+                                order_issues_count=rnd.randrange(3),
+                                errors_exist=rnd.random() < 0.3,
+                                event_raw_data=TextRawEventData(str(rnd.random())) if with_raw_data else None)
+
+
+def _assert_store_matches(store: EventMetaDataStore, expected: dict) -> None:
+    assert len(store) == len(expected)
+    assert list(store) == list(expected)
+    for event_id, e_metadata in expected.items():
+        row = store[event_id]
+        for field_name in _FIELDS:
+            assert getattr(row, field_name) == getattr(e_metadata, field_name)
+        raw_data = row.event_raw_data
+        assert (None if raw_data is None else raw_data.read()) == (None if e_metadata.event_raw_data is None
+                                                                   else e_metadata.event_raw_data.read())
+
+
+def _fill(event_ids: list, with_raw_data_after: int = None) -> tuple:
+    rnd = random.Random(len(event_ids))
+    store, expected = EventMetaDataStore(), {}
+    for index, event_id in enumerate(event_ids):
+        e_metadata = _get_event_metadata(rnd, with_raw_data_after is not None and index >= with_raw_data_after)
+        store[event_id] = e_metadata
+        expected[event_id] = e_metadata
+    return store, expected
+
+
+def test_ordered_and_shuffled_ids():
+    ascending_ids = list(range(100, 400, 3))
+    shuffled_ids = list(ascending_ids)
+    random.Random(1).shuffle(shuffled_ids)
+    for event_ids in (ascending_ids, list(reversed(ascending_ids)), shuffled_ids, ascending_ids + ascending_ids[::7]):
+        store, expected = _fill(event_ids, with_raw_data_after=len(event_ids) // 2)
+        _assert_store_matches(store, expected)
+        assert 10 ** 9 not in store
+
+
+def test_ids_fall_back_to_list():
+    event_ids = [1, 2, 3, 'a0f5c2', 2 ** 70, 4, -1, None, 'a0f5c2', 2]
+    store, expected = _fill(event_ids)
+    assert type(store.ids) is list
+    _assert_store_matches(store, expected)
+    assert '1' not in store
+
+
+def test_column_buffers_round_trip():
+    for event_ids in (list(range(50)), list(range(50, 0, -1)), [5, 3, 9, 1], [1, 'a', 2, 'b']):
+        store, expected = _fill(event_ids)
+        loaded_store = EventMetaDataStore.from_column_buffers(store.get_column_buffers(), store.get_ids_order())
+        _assert_store_matches(loaded_store, expected)
+        # A loaded store keeps taking events
+        loaded_store[10 ** 6] = expected[10 ** 6] = _get_event_metadata(random.Random(2))
+        loaded_store[event_ids[0]] = expected[event_ids[0]] = _get_event_metadata(random.Random(3))
+        _assert_store_matches(loaded_store, expected)
+
+
+def test_column_buffers_byte_order():
+    store, expected = _fill(list(range(20)))
+    column_buffers = store.get_column_buffers()
+    swapped_column_buffers = {}
+    for column_name, column_buffer in column_buffers.items():
+        column = getattr(store, column_name, None)
+        if column_name.endswith('.values') or column is None:
+            swapped_column_buffers[column_name] = column_buffer
+            continue
+        column = getattr(column, 'codes', column)
+        swapped_column = type(column)(column.typecode, column)
+        swapped_column.byteswap()
+        swapped_column_buffers[column_name] = swapped_column.tobytes()
+    other_byte_order = 'big' if sys.byteorder == 'little' else 'little'
+    loaded_store = EventMetaDataStore.from_column_buffers(swapped_column_buffers, store.get_ids_order(),
+                                                          other_byte_order)
+    _assert_store_matches(loaded_store, expected)
+
+
+def test_dictionary_encoded_column():
+    values = ['a', None, ['a'], '["a"]', {'b': 1, 'a': 2}, 'a', {'a': 2, 'b': 1}, ['a'], '']
+    column = DictionaryEncodedColumn()
+    for value in values:
+        column.append(value)
+    assert [column.get(row) for row in range(len(values))] == values
+    assert len(column.values) == 6
+    column.set(0, ['a'])
+    assert column.codes[0] == column.codes[2]
+
+    loaded_column = DictionaryEncodedColumn.from_buffers(*column.get_buffers())
+    loaded_column.append({'a': 2, 'b': 1})
+    assert list(loaded_column.codes) == list(column.codes) + [column.codes[4]]
@@ -0,0 +1,79 @@
+import os
+
+from modules.report_cache import ReportCache
+
+
+def _write(file_path: str, content: str, mtime_ns: int) -> None:
+    with open(file_path, 'w') as f:
+        f.write(content)
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+
+def _get_cache(tmp_path) -> ReportCache:
+    return ReportCache('test', cache_dir_path=str(tmp_path / 'cache'))
+
+
+def test_store_and_load(tmp_path):
+    file_path = str(tmp_path / 'events.json')
+    _write(file_path, '{"results": []}', 10 ** 18)
+    report = {'events': [1, 2, 3]}
+    cache = _get_cache(tmp_path)
+    assert not cache.contains(file_path)
+    cache.store(file_path, report)
+    cache.save()
+
+    cache = _get_cache(tmp_path)
+    assert cache.contains(file_path)
+    assert cache.load(file_path) == report
+    assert not ReportCache('other', cache_dir_path=str(tmp_path / 'cache')).contains(file_path)
+
+
+def test_touched_and_changed_file(tmp_path):
+    file_path = str(tmp_path / 'events.json')
+    _write(file_path, '{"results": []}', 10 ** 18)
+    cache = _get_cache(tmp_path)
+    cache.contains(file_path)
+    cache.store(file_path, {'events': []})
+
+    # Same content, another mtime: the content hash is checked
+    _write(file_path, '{"results": []}', 2 * 10 ** 18)
+    assert cache.contains(file_path)
+    # Another size, with the same mtime and without it
+    _write(file_path, '{"results": [1]}', 2 * 10 ** 18)
+    assert not cache.contains(file_path)
+    # Same size, another content
+    _write(file_path, '{"results": [2]}', 3 * 10 ** 18)
+    assert not cache.contains(file_path)
+
+
+def test_file_changed_while_building(tmp_path):
+    file_path = str(tmp_path / 'events.json')
+    _write(file_path, '{"results": []}', 10 ** 18)
+    cache = _get_cache(tmp_path)
+    assert not cache.contains(file_path)
+    # The report was built from the content the file had before it changed
+    _write(file_path, '{"results": [1]}', 2 * 10 ** 18)
+    cache.store(file_path, {'events': []})
+    assert not cache.contains(file_path)
+    cache.store(file_path, {'events': [1]})
+    assert cache.contains(file_path)
+    assert cache.load(file_path) == {'events': [1]}
+
+
+def test_file_changed_while_hashing(tmp_path, monkeypatch):
+    file_path = str(tmp_path / 'events.json')
+    _write(file_path, '{"results": []}', 10 ** 18)
+    cache = _get_cache(tmp_path)
+    cache.contains(file_path)
+    hash_file = ReportCache._hash_file
+
+    def hash_and_change_file(hashed_file_path: str) -> str:
+        content_hash = hash_file(hashed_file_path)
+        _write(file_path, '{"results": [1]}', 2 * 10 ** 18)
+        return content_hash
+
+    monkeypatch.setattr(ReportCache, '_hash_file', staticmethod(hash_and_change_file))
+    cache.store(file_path, {'events': []})
+    monkeypatch.undo()
+    assert not cache.contains(file_path)
+    assert cache.load(file_path) is None
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from modules.raw_data import close_mapped_files
+from modules.stream_reader import EventStreamReader
+
+_EVENTS = [{'id': 1, 'event_type': 'CREATION', 'model_data': {'reference': 'Ünïcödé ✓ 𝄞', 'items': [1, 2.5, None]}},
+           {'id': '2', 'event_type': 'UPDATE', 'model_data': {'note': 'quote " and \\ backslash\n', 'empty': {}}},
+           {'id': 3, 'event_type': 'TRANSITION', 'model_data': []}]
+_PAYLOAD = {'count': 3, 'next': None, 'results': _EVENTS, 'previous': 'https://example.com/?page=1'}
+
+
+@pytest.fixture(autouse=True)
+def _close_mapped_files():
+    yield
+    close_mapped_files()
+
+
+def _read(source: str, chunk_size: int, raw_data: bool = False) -> tuple:
+    payload = EventStreamReader(source, chunk_size=chunk_size).read(raw_data=raw_data)
+    results = list(payload.pop(EventStreamReader.RESULTS_WITH_RAW_DATA_KEY if raw_data
+                               else EventStreamReader.RESULTS_KEY))
+    return payload, results
+
+
+@pytest.mark.parametrize('chunk_size', (1, 2, 3, 5, 16, 4096))
+@pytest.mark.parametrize('indent', (None, 2))
+def test_json_chunks(tmp_path, chunk_size, indent):
+    file_path = str(tmp_path / 'events.json')
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(_PAYLOAD, f, indent=indent, ensure_ascii=False)
+    with open(file_path, encoding='utf-8') as f:
+        expected_payload = json.load(f)
+    expected_results = expected_payload.pop('results')
+
+    payload, results = _read(file_path, chunk_size)
+    assert results == expected_results
+    assert payload == expected_payload
+
+    payload, results_with_raw_data = _read(file_path, chunk_size, raw_data=True)
+    assert [event_data for event_data, _ in results_with_raw_data] == expected_results
+    assert [json.loads(event_raw_data.read()) for _, event_raw_data in results_with_raw_data] == expected_results
+    assert payload == expected_payload
+
+
+@pytest.mark.parametrize('chunk_size', (1, 3, 7, 4096))
+def test_ndjson_chunks(tmp_path, chunk_size):
+    file_path = str(tmp_path / 'events.ndjson')
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(json.dumps(event_data, ensure_ascii=False) for event_data in _EVENTS) + '\n\n')
+
+    _, results = _read(file_path, chunk_size)
+    assert results == _EVENTS
+    _, results_with_raw_data = _read(file_path, chunk_size, raw_data=True)
+    assert [event_data for event_data, _ in results_with_raw_data] == _EVENTS
+    assert [json.loads(event_raw_data.read()) for _, event_raw_data in results_with_raw_data] == _EVENTS
@@ -0,0 +1,66 @@
+import copy
+import random
+
+from modules.report import Report
+from modules.timeline import TimelineCollector
+
+
+def _get_order_events(rnd: random.Random, order_id: int, event_count: int) -> list:
+    model_data = {'id': order_id, 'reference': f'R{order_id}', 'state': 'draft', 'status': 'draft',
+                  'three_pl': {'company_name': 'Dallas'}, 'order_items': [{'id': 1, 'quantity': 1}]}
+    events = []
+    for index in range(event_count):
+        if index:
+            model_data['state'] = rnd.choice(('draft', 'action_required', 'fulfilling', 'fulfilled'))
+            model_data['status'] = model_data['state']
+            change = rnd.randrange(4)
+            if change == 0:
+                model_data['order_items'].append({'id': len(model_data['order_items']) + 1, 'quantity': 1})
+            elif change == 1 and model_data['order_items']:
+                model_data['order_items'].pop(rnd.randrange(len(model_data['order_items'])))
+            elif change == 2:
+                model_data['three_pl'] = None if model_data['three_pl'] else {'company_name': 'Dallas'}
+            else:
+                model_data.pop('note', None) if 'note' in model_data else model_data.update(note='')
+        events.append({'id': order_id * 1000 + index,
+                       'event_time': f'2020-07-28T{index // 60:02d}:{index % 60:02d}:00.000000',
+                       'model_data': copy.deepcopy(model_data)})
+    return events
+
+
+def _get_timelines(events: list) -> list:
+    collector = TimelineCollector()
+    for event_data in events:
+        event_metadata = Report.EventMetaData(event_type='UPDATE', event_time=event_data['event_time'],
+                                              username='ops@example.com')
+        collector.add(event_data, event_metadata)
+    return collector.get_timelines()
+
+
+def _get_events() -> list:
+    rnd = random.Random(1)
+    return [event_data for order_id in range(1, 6) for event_data in _get_order_events(rnd, order_id, 40)]
+
+
+def test_reversed_events():
+    events = _get_events()
+    # History pages list the newest event first
+    assert _get_timelines(list(reversed(events))) == _get_timelines(events)
+
+
+def test_shuffled_and_repeated_events():
+    events = _get_events()
+    shuffled_events = events + events[::5]
+    random.Random(2).shuffle(shuffled_events)
+    assert _get_timelines(shuffled_events) == _get_timelines(events)
+
+
+def test_initial_snapshot():
+    events = _get_events()
+    timelines = _get_timelines(list(reversed(events)))
+    assert [timeline['order_key'] for timeline in timelines] == [1, 2, 3, 4, 5]
+    for timeline in timelines:
+        first_entry = timeline['entries'][0]
+        assert first_entry['is_initial']
+        assert first_entry['changes'] == [{'field': 'state', 'old_value': '(absent)', 'new_value': '"draft"'},
+                                          {'field': 'status', 'old_value': '(absent)', 'new_value': '"draft"'}]
@@ -0,0 +1,91 @@
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import glob
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import natsort
+
+# Local stand-in for the order history API, which serves the input files as the pages of a single history.
+# Run from the project root: python -m tools.history_api_stub -f "input/sample*.json"
+# then: python cli.py print -u "http://127.0.0.1:8360/history/?limit=20&offset=0"
+
+
+class HistoryApiStubHandler(BaseHTTPRequestHandler):
+    """
+    Request handler that serves page number 'offset // limit' out of the server's page list,
+    with 'count', 'next' and 'previous' rewritten to point at the stub.
+    """
+
+    def do_GET(self) -> None:
+        url_parts = urlsplit(self.path)
+        query = parse_qs(url_parts.query)
+        try:
+            limit = int(query.get('limit', [self.server.page_size])[-1])
+            offset = int(query.get('offset', [0])[-1])
+        except ValueError:
+            self.send_error(400, 'Invalid limit/offset')
+            return
+        pages = self.server.pages
+        page_number = offset // max(limit, 1)
+        if not 0 <= page_number < len(pages):
+            self.send_error(404, 'Page not found')
+            return
+
+        time.sleep(self.server.delay)
+        page = dict(pages[page_number])
+        count = len(pages) * limit
+        page_url = f'http://{self.headers.get("Host")}{url_parts.path}?expand=user&limit={limit}&offset='
+        page['count'] = count
+        page['next'] = f'{page_url}{offset + limit}' if offset + limit < count else None
+        page['previous'] = f'{page_url}{offset - limit}' if offset > 0 else None
+        body = json.dumps(page).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def create_server(file_path_patterns: list[str],
+                  port: int = 0,
+                  delay: float = 0,
+                  quiet: bool = True) -> ThreadingHTTPServer:
+    """
+    Creates the stub server that serves the files matching passed patterns as history pages.
+    :param list[str] file_path_patterns: Page file path patterns
+    :param int port: Port to listen on, a free one is picked for 0
+    :param float delay: Response delay in seconds, to simulate a remote API
+    :param bool quiet: Whether to leave requests out of the log
+    :return ThreadingHTTPServer: Server, not yet serving
+    """
+    file_paths = natsort.natsorted({path for pattern in file_path_patterns for path in glob.glob(pattern)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), HistoryApiStubHandler)
+    server.pages = []
+    for file_path in file_paths:
+        with open(file_path, 'r') as f:
+            server.pages.append(json.loads(f.read()))
+    server.page_size = max((len(page.get('results', [])) for page in server.pages), default=1)
+    server.delay = delay
+    server.quiet = quiet
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--files', type=str, nargs='+', default=['input/sample*.json'],
+                        help='Page file path patterns, files are served in the natural sort order')
+    parser.add_argument('-p', '--port', type=int, default=8360, help='Port to listen on')
+    parser.add_argument('--delay', type=float, default=0, help='Response delay in seconds')
+    args = parser.parse_args()
+
+    stub_server = create_server(args.files, args.port, args.delay, quiet=False)
+    print(f'Serving {len(stub_server.pages)} pages at '
+          f'http://127.0.0.1:{stub_server.server_port}/history/?limit={stub_server.page_size}&offset=0')
+    stub_server.serve_forever()